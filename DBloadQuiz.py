@@ -1,103 +1,1010 @@
 """
 This module handles loading quiz data from CSV files into a SQLite database.
 
-NOTE: This module uses `sqlite3` and `pandas`, which is inconsistent with the
-rest of the application's database helpers that use `pymysql` for MySQL.
-This may be part of a legacy data loading process or a separate utility.
+NOTE: This module uses `sqlite3`, which is inconsistent with the rest of the
+application's database helpers that use `pymysql` for MySQL. This may be part
+of a legacy data loading process or a separate utility.
+
+CSVs are read with the stdlib `csv` module and streamed into the database in
+chunks (QUIZ_BANK_PARSER=csv, the default). The original `pandas` parser is
+still available with QUIZ_BANK_PARSER=pandas; pandas is only imported then.
+Compare both with `python -m tools.bench_bank_loader`.
+
+`compile_quiz_bank` (`flask compile-quiz-bank`) turns the loaded bank into a
+single read-only file of denormalized, pre-parsed questions, which
+`DBreadQuiz` serves instead of 'quiz.db' when it exists.
 """
+import csv
+import hashlib
+import json
+import os
 import sqlite3
-import pandas as pd
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from glob import glob
 from pathlib import Path
 
-def loadQcsvFiles (pattern,db_path,table):
+from DBreadQuiz import (
+    QUESTION_SELECT,
+    QUESTIONS_VIEW,
+    QUIZ_DB_PATH,
+    VIEW_QUESTION_SELECT,
+    bump_bank_generation,
+    compiled_bank_path,
+)
+
+# Source CSVs already loaded into quiz.db, per table: path, size, mtime, hash
+MANIFEST_TABLE = "bank_manifest"
+# Column added to every loaded table, naming the CSV each row came from
+SOURCE_COLUMN = "source_file"
+
+# Columns the app reads from each bank table; a rebuilt bank without them is rejected
+REQUIRED_COLUMNS = {
+    "responses": ("ano", "num_tema", "num_aula", "uuid", "possible_answers", "scoring_system"),
+    "links": ("uuid", "imagem"),
+    "temas": ("ano", "num_tema", "nome_tema"),
+    "aulas": ("ano", "num_tema", "num_aula", "aula_title"),
+}
+# A rebuilt table may not lose more than half of its rows (unless forced)
+MIN_ROW_RATIO = 0.5
+
+# CSV parser for the loaders: "csv" (streaming, stdlib) or "pandas"
+QUIZ_BANK_PARSER = os.getenv('QUIZ_BANK_PARSER', 'csv').lower()
+# Rows per executemany call when streaming
+STREAM_CHUNK_ROWS = 5000
+# SQLite type of the known bank columns; other columns are typed from their first value
+COLUMN_TYPES = {
+    "ano": "INTEGER",
+    "num_tema": "INTEGER",
+    "num_aula": "INTEGER",
+    "question_number": "INTEGER",
+    "is_multiple_choice": "INTEGER",
+    "uuid": "TEXT",
+    "titulo": "TEXT",
+    "nota": "TEXT",
+    "possible_answers": "TEXT",
+    "scoring_system": "TEXT",
+    "formatting": "TEXT",
+    "type_of_problem": "TEXT",
+    "imagem": "TEXT",
+    "nome_tema": "TEXT",
+    "aula_title": "TEXT",
+}
+_BOOLEANS = {"true": 1, "false": 0}
+
+# Lookup indexes of the materialized questions_view table
+VIEW_INDEXES = (("ano", "num_tema", "num_aula"), ("uuid",))
+
+# Below this many files, parsing in-process beats starting a pool
+PARALLEL_MIN_FILES = 8
+
+# Question IDs (responses rowids) are what quiz_history and anonymous results
+# store, so they must survive reloads: every question ever loaded keeps its ID
+# in this table, keyed by QUESTION_KEY_COLUMNS (plus an occurrence number for
+# duplicate keys), and reloaded rows are inserted under that ID
+QUESTIONS_TABLE = "responses"
+QUESTION_IDS_TABLE = "question_ids"
+QUESTION_KEY_COLUMNS = ("uuid", "question_number")
+
+# Lookup indexes per table, built after the data is loaded
+# (every table also gets one on SOURCE_COLUMN)
+TABLE_INDEXES = {
+    "responses": (("ano", "num_tema", "num_aula"), ("uuid",)),
+    "links": (("uuid",),),
+    "temas": (("ano", "num_tema"),),
+    "aulas": (("ano", "num_tema", "num_aula"),),
+}
+
+
+def _ensure_manifest(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} ("
+        " table_name TEXT NOT NULL,"
+        " path TEXT NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " mtime_ns INTEGER NOT NULL,"
+        " sha256 TEXT NOT NULL,"
+        " PRIMARY KEY (table_name, path))"
+    )
+
+
+def _ensure_question_ids(conn):
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {QUESTION_IDS_TABLE} ("
+        " qid INTEGER PRIMARY KEY AUTOINCREMENT,"
+        " question_key TEXT NOT NULL UNIQUE)"
+    )
+
+
+def _question_key(values, occurrence):
+    """Registry key of a question: its QUESTION_KEY_COLUMNS values and occurrence number."""
+    values = [int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
+    return json.dumps([*values, occurrence], ensure_ascii=False)
+
+
+def _seed_question_ids(conn):
     """
-    Loads data from multiple CSV files into a SQLite database table.
+    Registers the rowids of the questions already in the database.
 
-    This function finds all CSV files matching a specified glob pattern, then
-    loads them into a single database table using pandas. The schema for the
-    table is inferred from the columns of the first CSV file found. The data
-    from all subsequent files is appended.
+    Banks loaded before QUESTION_IDS_TABLE existed have IDs only as rowids;
+    they are recorded once (occurrences numbered in rowid order), so stored
+    results keep pointing at the same questions.
+    """
+    _ensure_question_ids(conn)
+    if conn.execute(f"SELECT 1 FROM {QUESTION_IDS_TABLE} LIMIT 1").fetchone():
+        return
+    columns = _table_columns(conn, QUESTIONS_TABLE)
+    if not columns:
+        return
+    key_columns = ", ".join(f'"{c}"' for c in QUESTION_KEY_COLUMNS if c in columns) or "NULL"
+    seen = {}
+    entries = []
+    for rowid, *values in conn.execute(f'SELECT rowid, {key_columns} FROM "{QUESTIONS_TABLE}" ORDER BY rowid'):
+        occurrence = seen.get(tuple(values), 0)
+        seen[tuple(values)] = occurrence + 1
+        entries.append((rowid, _question_key(values, occurrence)))
+    conn.executemany(f"INSERT INTO {QUESTION_IDS_TABLE} (qid, question_key) VALUES (?, ?)", entries)
+
+
+def _with_question_ids(conn, columns, batches):
+    """
+    Prefixes every `responses` row with its stable question ID.
+
+    Rows get the ID registered for their key; the first occurrence whose ID is
+    not held by a row still in the table is used, and unseen keys are
+    registered (AUTOINCREMENT, so an ID is never handed out twice). Runs
+    lazily, after the rows of changed files have been deleted.
+    """
+    key_indexes = [columns.index(c) for c in QUESTION_KEY_COLUMNS if c in columns]
+    registry = dict(conn.execute(f"SELECT question_key, qid FROM {QUESTION_IDS_TABLE}"))
+    used = {rowid for (rowid,) in conn.execute(f'SELECT rowid FROM "{QUESTIONS_TABLE}"')}
+    for rows in batches:
+        numbered = []
+        for row in rows:
+            values = [row[i] for i in key_indexes]
+            occurrence = 0
+            while True:
+                key = _question_key(values, occurrence)
+                qid = registry.get(key)
+                if qid is None:
+                    qid = conn.execute(
+                        f"INSERT INTO {QUESTION_IDS_TABLE} (question_key) VALUES (?)", (key,)
+                    ).lastrowid
+                    registry[key] = qid
+                if qid not in used:
+                    break
+                occurrence += 1
+            used.add(qid)
+            numbered.append((qid, *row))
+        yield numbered
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _table_columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _changed_files(conn, table, csv_files):
+    """
+    Compares `csv_files` with the manifest of `table`.
+
+    Size and mtime are checked first; a file is only hashed when they differ,
+    so an untouched bank costs one `stat` per file. A file whose content hash
+    still matches (e.g. after a fresh checkout) is not changed; its new
+    size/mtime are returned so the caller can record them.
+
+    Returns:
+        tuple: (changed, removed, entries, restat) where `changed` lists the
+        files to (re)load, `removed` the manifest paths that no longer exist,
+        `entries` the manifest row of every current file and `restat` the
+        unchanged files whose size/mtime differ from the manifest.
+    """
+    manifest = {
+        path: (size, mtime_ns, sha256)
+        for path, size, mtime_ns, sha256 in conn.execute(
+            f"SELECT path, size, mtime_ns, sha256 FROM {MANIFEST_TABLE} WHERE table_name = ?", (table,)
+        )
+    }
+    changed = []
+    restat = []
+    entries = {}
+    for path in csv_files:
+        st = os.stat(path)
+        old = manifest.get(path)
+        if old and old[:2] == (st.st_size, st.st_mtime_ns):
+            entries[path] = old
+            continue
+        sha256 = _file_hash(path)
+        entries[path] = (st.st_size, st.st_mtime_ns, sha256)
+        if not old or old[2] != sha256:
+            changed.append(path)
+        else:
+            restat.append(path)
+    removed = sorted(set(manifest) - set(entries))
+    return changed, removed, entries, restat
+
+
+def _record_stats(conn, table, entries, paths):
+    """Stores the current size/mtime of `paths` (unchanged files) in the manifest of `table`."""
+    conn.executemany(
+        f"UPDATE {MANIFEST_TABLE} SET size = ?, mtime_ns = ? WHERE table_name = ? AND path = ?",
+        [(entries[path][0], entries[path][1], table, path) for path in paths],
+    )
+
+
+def _parse_csv(path, columns=None):
+    """
+    Parses one CSV into plain rows, tagged with the source path (pandas parser).
+
+    Runs in the worker processes of `_parse_files`, so it only returns
+    picklable builtins.
+
+    Args:
+        path (str): The CSV file.
+        columns (list[str] | None): Schema to align to (without `SOURCE_COLUMN`).
+            Extra columns are dropped; if any is missing, rows is None.
+
+    Returns:
+        tuple: (path, columns, sql_types, rows) where rows is a list of tuples
+        ending with the source path, or None on a column mismatch.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(path)
+    if columns is not None:
+        if not set(columns) <= set(df.columns):
+            return path, list(df.columns), None, None
+        # Align columns in case of ordering differences
+        df = df[columns]
+    sql_types = [_sql_type(dtype) for dtype in df.dtypes]
+    values = df.astype(object).where(df.notna(), None).values.tolist()
+    return path, list(df.columns), sql_types, [(*row, path) for row in values]
+
+
+def _sql_type(dtype):
+    """SQLite column type for a pandas dtype, as `DataFrame.to_sql` would pick it."""
+    if dtype.kind in 'iub':
+        return 'INTEGER'
+    if dtype.kind == 'f':
+        return 'REAL'
+    return 'TEXT'
+
+
+def _to_real(value):
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _to_integer(value):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    boolean = _BOOLEANS.get(value.lower())
+    return boolean if boolean is not None else _to_real(value)
+
+
+# Converter per SQLite type; values that do not convert are stored as text
+_CONVERTERS = {"INTEGER": _to_integer, "REAL": _to_real, "TEXT": str}
+
+
+def _infer_sql_type(column, value):
+    """SQLite type of `column`: from COLUMN_TYPES, else from its first value."""
+    if column in COLUMN_TYPES:
+        return COLUMN_TYPES[column]
+    if not value:
+        return 'TEXT'
+    value = _to_integer(value)
+    if isinstance(value, int):
+        return 'INTEGER'
+    return 'REAL' if isinstance(value, float) else 'TEXT'
+
+
+def _csv_schema(path):
+    """
+    Reads the header (and first row) of a CSV.
+
+    Returns:
+        tuple: (columns, sql_types), with the types decided once for the whole load.
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        columns = next(reader, [])
+        first = next((record for record in reader if record), [])
+    first += [''] * (len(columns) - len(first))
+    return columns, [_infer_sql_type(c, v) for c, v in zip(columns, first)]
+
+
+def _csv_header(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return next(csv.reader(f), [])
+
+
+def _stream_rows(paths, columns, sql_types, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Streams the rows of `paths` aligned to `columns`, `chunk_rows` at a time.
+
+    Values are converted with the converter of their column type; empty fields
+    become NULL. Each row ends with its source path, and at most one chunk is
+    held in memory.
+
+    Yields:
+        list[tuple]: Rows ready for `executemany`.
+    """
+    converters = [_CONVERTERS[t] for t in sql_types]
+    for path in paths:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, [])
+            fields = list(zip([header.index(c) for c in columns], converters))
+            chunk = []
+            for record in reader:
+                if not record:
+                    continue
+                if len(record) < len(header):
+                    record += [''] * (len(header) - len(record))
+                chunk.append(tuple([convert(record[i]) if record[i] else None for i, convert in fields] + [path]))
+                if len(chunk) >= chunk_rows:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+
+def _parse_files(paths, columns, workers=None):
+    """
+    Parses `paths` aligned to `columns`, in a process pool when there are several.
+
+    Returns:
+        list[tuple]: `_parse_csv` results, in the order of `paths`.
+    """
+    if len(paths) < PARALLEL_MIN_FILES:
+        return [_parse_csv(p, columns) for p in paths]
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_parse_csv, paths, [columns] * len(paths), chunksize=4))
+    except (OSError, BrokenProcessPool) as e:
+        print(f"WARNING: Parallel CSV parsing unavailable ({e}); parsing serially", flush=True)
+        return [_parse_csv(p, columns) for p in paths]
+
+
+def _create_table(conn, table, columns, sql_types):
+    conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    column_defs = ", ".join(f'"{c}" {t}' for c, t in zip(columns, sql_types))
+    conn.execute(f'CREATE TABLE "{table}" ({column_defs}, "{SOURCE_COLUMN}" TEXT)')
+
+
+def _table_types(conn, table):
+    return [row[2] or 'TEXT' for row in conn.execute(f'PRAGMA table_info("{table}")') if row[1] != SOURCE_COLUMN]
+
+
+def _insert_rows(conn, table, columns, batches, with_rowid=False):
+    """
+    Inserts each batch of rows with one `executemany`; returns the row count.
+
+    With `with_rowid`, every row starts with the rowid to insert it under.
+    """
+    names = ["rowid"] * with_rowid + list(columns) + [SOURCE_COLUMN]
+    column_list = ", ".join(f'"{c}"' for c in names)
+    placeholders = ", ".join("?" * len(names))
+    sql = f'INSERT INTO "{table}" ({column_list}) VALUES ({placeholders})'
+    n_rows = 0
+    for rows in batches:
+        conn.executemany(sql, rows)
+        n_rows += len(rows)
+    return n_rows
+
+
+def _create_indexes(conn, table):
+    """Creates the lookup indexes of `table` (only for columns it actually has)."""
+    existing = set(_table_columns(conn, table))
+    for index_columns in TABLE_INDEXES.get(table, ()) + ((SOURCE_COLUMN,),):
+        if set(index_columns) <= existing:
+            name = f"idx_{table}_{'_'.join(index_columns)}"
+            cols = ", ".join(f'"{c}"' for c in index_columns)
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({cols})')
+
+
+def loadQcsvFiles (pattern,db_path,table,scratch=False):
+    """
+    Loads data from multiple CSV files into a SQLite database table, incrementally.
+
+    This function finds all CSV files matching a specified glob pattern and
+    compares them with the manifest of files already loaded into `table`
+    (path, size, mtime and SHA-256, kept in the `bank_manifest` table of the
+    same database):
+
+    - Nothing changed: the table is left alone and no CSV is read.
+    - Some files changed, were added or removed: only their rows are deleted
+      (by the `source_file` column) and re-inserted.
+    - The table is missing, predates `source_file`, or a changed file lacks
+      some of the table's columns: the table is rebuilt from all files,
+      with the schema inferred from the first CSV file found.
+
+    `responses` rows are inserted under their stable question ID (see
+    QUESTION_IDS_TABLE), so editing, reloading or rebuilding a file never
+    changes the ID of a question that stored results refer to.
+
+    Files are checked against the first file's (or the table's) columns. With
+    the default csv parser, rows are then streamed from the files straight into
+    `executemany`, STREAM_CHUNK_ROWS at a time, with column types decided once
+    (see `_csv_schema`), so memory stays flat however large the bank is. With
+    QUIZ_BANK_PARSER=pandas, files are parsed up front in a process pool.
+    A single writer inserts all rows in one transaction and builds the indexes
+    once the data is in. Only on a scratch copy (`scratch`, as
+    `rebuild_quiz_bank` loads '<db_path>.new') are journaling and fsync
+    turned off for the load; a live database keeps its rollback journal.
+    Per-phase timings are printed (with the csv parser, 'write' includes
+    reading the rows).
+
+    When anything was written, the in-process question cache is invalidated
+    via `bump_bank_generation`.
 
     Args:
         pattern (str): A glob pattern to match the CSV files to be loaded.
         db_path (str): The file path for the SQLite database.
         table (str): The name of the table to create and/or append data to.
+        scratch (bool): `db_path` is a private copy that is thrown away if
+            the load fails, so it is written without journal or fsync.
+
+    Returns:
+        bool: True if the table was modified, False if it was already up to date.
 
     Raises:
-        SystemExit: If no CSV files are found matching the pattern.
+        SystemExit: If no CSV files are found matching the pattern, or a file
+        lacks columns of the first one.
+        ValueError: If QUIZ_BANK_PARSER is neither "csv" nor "pandas".
     """
-    csv_files = sorted(glob(pattern))
+    timings = {}
+    t0 = time.perf_counter()
+    csv_files = [os.path.relpath(p) for p in sorted(glob(pattern))]
 
     if not csv_files:
         raise SystemExit("No CSV files matched the pattern")
 
-    with sqlite3.connect(db_path) as conn:
-        # Create table from the first file (or skip if table already exists)
-        df0 = pd.read_csv(csv_files[0])
-        df0.to_sql(table, conn, if_exists="replace", index=False)  # creates schema
-        # Append the rest
-        for p in csv_files[1:]:
-            dfi = pd.read_csv(p)
-            # Optionally align columns in case of ordering differences
-            dfi = dfi[df0.columns]
-            dfi.to_sql(table, conn, if_exists="append", index=False)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        _ensure_manifest(conn)
+        changed, removed, entries, restat = _changed_files(conn, table, csv_files)
+        columns = _table_columns(conn, table)
+        full_rebuild = not columns or SOURCE_COLUMN not in columns
+        timings['scan'] = time.perf_counter() - t0
+
+        if not full_rebuild and not changed and not removed:
+            # Refresh size/mtime of files whose content hash still matched
+            _record_stats(conn, table, entries, restat)
+            return False
+
+        # Parse (pandas), or just check headers (csv: rows are streamed while writing)
+        t = time.perf_counter()
+        if QUIZ_BANK_PARSER == 'pandas':
+            if not full_rebuild:
+                columns = [c for c in columns if c != SOURCE_COLUMN]
+                parsed = _parse_files(changed, columns)
+                missing = [path for path, _, _, rows in parsed if rows is None]
+                if missing:
+                    print(f"WARNING: {missing[0]} is missing columns of table {table}; rebuilding it", flush=True)
+                    full_rebuild = True
+            if full_rebuild:
+                first = _parse_csv(csv_files[0])
+                columns, sql_types = first[1], first[2]
+                parsed = [first] + _parse_files(csv_files[1:], columns)
+                missing = [path for path, _, _, rows in parsed if rows is None]
+                if missing:
+                    raise SystemExit(f"{missing[0]} is missing columns of {csv_files[0]}")
+            batches = [rows for _, _, _, rows in parsed]
+        elif QUIZ_BANK_PARSER == 'csv':
+            if not full_rebuild:
+                columns = [c for c in columns if c != SOURCE_COLUMN]
+                sql_types = _table_types(conn, table)
+                missing = [path for path in changed if not set(columns) <= set(_csv_header(path))]
+                if missing:
+                    print(f"WARNING: {missing[0]} is missing columns of table {table}; rebuilding it", flush=True)
+                    full_rebuild = True
+                batches = _stream_rows(changed, columns, sql_types)
+            if full_rebuild:
+                columns, sql_types = _csv_schema(csv_files[0])
+                missing = [path for path in csv_files[1:] if not set(columns) <= set(_csv_header(path))]
+                if missing:
+                    raise SystemExit(f"{missing[0]} is missing columns of {csv_files[0]}")
+                batches = _stream_rows(csv_files, columns, sql_types)
+        else:
+            raise ValueError(f"Unknown QUIZ_BANK_PARSER: {QUIZ_BANK_PARSER}")
+        timings['parse'] = time.perf_counter() - t
+
+        # Write: one transaction (no journal or fsync on a scratch copy)
+        t = time.perf_counter()
+        if scratch:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+        conn.execute("BEGIN")
+        try:
+            if table == QUESTIONS_TABLE:
+                _seed_question_ids(conn)
+                batches = _with_question_ids(conn, columns, batches)
+            if full_rebuild:
+                _create_table(conn, table, columns, sql_types)
+                conn.execute(f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = ?", (table,))
+            else:
+                conn.executemany(
+                    f'DELETE FROM "{table}" WHERE {SOURCE_COLUMN} = ?',
+                    [(p,) for p in removed + changed],
+                )
+                conn.executemany(
+                    f"DELETE FROM {MANIFEST_TABLE} WHERE table_name = ? AND path = ?",
+                    [(table, p) for p in removed],
+                )
+            n_rows = _insert_rows(conn, table, columns, batches, with_rowid=table == QUESTIONS_TABLE)
+            timings['write'] = time.perf_counter() - t
+
+            # Indexes after the data is in
+            t = time.perf_counter()
+            _create_indexes(conn, table)
+            timings['index'] = time.perf_counter() - t
 
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {MANIFEST_TABLE} (table_name, path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+                [(table, path, *entry) for path, entry in entries.items()],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            if scratch:
+                conn.execute("PRAGMA synchronous=FULL")
+                conn.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        conn.close()
 
-def loadQanswers():
+    timings['total'] = time.perf_counter() - t0
+    print(
+        f"Quiz bank: {table} {'rebuilt' if full_rebuild else 'updated'} "
+        f"({len(changed)} changed, {len(removed)} removed of {len(csv_files)} files, {n_rows} rows) "
+        + " ".join(f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in timings.items()),
+        flush=True,
+    )
+
+    bump_bank_generation()
+    return True
+
+
+def build_questions_view(conn):
     """
-    Loads quiz answers from CSV files into the 'responses' table in 'quiz.db'.
-    
-    This function defines a specific pattern to find all answer-related CSV files
-    and calls the generic `loadQcsvFiles` utility to load them.
+    Materializes the joined question records into the `questions_view` table.
+
+    Every `responses` row joined with its tema name, aula title and image
+    (`DBreadQuiz.QUESTION_SELECT`) is stored under its responses rowid (the
+    'qid' INTEGER PRIMARY KEY), with indexes on (ano, num_tema, num_aula) and
+    uuid, so question lookups are a primary-key search instead of four-way
+    joins. Rebuilt whenever a bank table changes.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the quiz database.
+
+    Returns:
+        int: Number of questions in the view.
     """
-    # Expand your pattern into file paths
+    types = {row[1]: row[2] or 'TEXT' for row in conn.execute('PRAGMA table_info("responses")')}
+    cursor = conn.execute(f"{QUESTION_SELECT} LIMIT 0")
+    columns = [c for c in (d[0] for d in cursor.description) if c not in ("rowid", SOURCE_COLUMN)]
+    column_defs = ", ".join(f'"{c}" {types.get(c, "TEXT")}' for c in columns)
+    column_list = ", ".join(f'"{c}"' for c in columns)
+    with conn:
+        conn.execute(f'DROP TABLE IF EXISTS "{QUESTIONS_VIEW}"')
+        conn.execute(f'CREATE TABLE "{QUESTIONS_VIEW}" (qid INTEGER PRIMARY KEY, {column_defs})')
+        # A uuid with several links rows keeps one of them, as the joined query did
+        conn.execute(
+            f'INSERT OR REPLACE INTO "{QUESTIONS_VIEW}" (qid, {column_list}) '
+            f"SELECT rowid, {column_list} FROM ({QUESTION_SELECT})"
+        )
+        for index_columns in VIEW_INDEXES:
+            name = f"idx_{QUESTIONS_VIEW}_{'_'.join(index_columns)}"
+            cols = ", ".join(f'"{c}"' for c in index_columns)
+            conn.execute(f'CREATE INDEX "{name}" ON "{QUESTIONS_VIEW}" ({cols})')
+    return conn.execute(f'SELECT COUNT(*) FROM "{QUESTIONS_VIEW}"').fetchone()[0]
+
+
+def _refresh_questions_view(db_path):
+    """Rebuilds `questions_view` if every table it joins has been loaded."""
+    conn = sqlite3.connect(db_path)
+    try:
+        if all(_table_columns(conn, table) for table in REQUIRED_COLUMNS):
+            build_questions_view(conn)
+            return True
+        return False
+    finally:
+        conn.close()
+
+
+def _bank_sources():
+    """Glob pattern of the source CSVs of each bank table."""
     base = Path().resolve()  # equivalent to $PWD
-    pattern = str(base / "quiz-time" / "anos" / "ano*" / "*" / "*" / "an*.csv")
-    db_path = "quiz.db"
-    table = "responses"
+    return {
+        "responses": str(base / "quiz-time" / "anos" / "ano*" / "*" / "*" / "an*.csv"),
+        "links": str(base / "quiz-time" / "links.csv"),
+        "temas": str(base / "quiz-time" / "temas.csv"),
+        "aulas": str(base / "quiz-time" / "aulas.csv"),
+    }
 
-    loadQcsvFiles(pattern,db_path,table)
 
-def loadQlinks():
+def _matches_sources(conn):
     """
-    Loads quiz-related links from 'links.csv' into the 'links' table in 'quiz.db'.
-    
-    This function calls the generic `loadQcsvFiles` utility to load the main
-    links file for the quiz.
+    True if the manifest in `conn` lists exactly the current source CSVs of every bank table.
+
+    When it does, the size/mtime of files that were only touched (same
+    content hash) are recorded and committed, so the next check does not
+    hash them again.
     """
-    # Expand your pattern into file paths
-    base = Path().resolve()  # equivalent to $PWD
-    pattern = str(base / "quiz-time" / "links.csv")
-    db_path = "quiz.db"
-    table = "links"
-    loadQcsvFiles(pattern,db_path,table)
+    restats = []
+    for table, pattern in _bank_sources().items():
+        csv_files = [os.path.relpath(p) for p in sorted(glob(pattern))]
+        changed, removed, entries, restat = _changed_files(conn, table, csv_files)
+        if changed or removed:
+            return False
+        restats.append((table, entries, restat))
+    if any(restat for _, _, restat in restats):
+        for table, entries, restat in restats:
+            _record_stats(conn, table, entries, restat)
+        conn.commit()
+    return True
+
+
+def _bank_up_to_date(db_path):
+    """True if every bank table in `db_path` matches its source CSVs (only manifest stats are written)."""
+    if not os.path.exists(db_path):
+        return False
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if MANIFEST_TABLE not in tables or QUESTIONS_VIEW not in tables:
+            return False
+        for table in _bank_sources():
+            if table not in tables or SOURCE_COLUMN not in _table_columns(conn, table):
+                return False
+        return _matches_sources(conn)
+    finally:
+        conn.close()
+
 
-def loadQtemas():
+def _manifest_hashes(path):
+    """(table_name, path, sha256) of every source recorded in the manifest of the bank at `path`."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        if not _table_columns(conn, MANIFEST_TABLE):
+            return None
+        return set(conn.execute(f"SELECT table_name, path, sha256 FROM {MANIFEST_TABLE}"))
+    finally:
+        conn.close()
+
+
+def compiled_bank_up_to_date(db_path=QUIZ_DB_PATH):
     """
-    Loads quiz themes from 'temas.csv' into the 'temas' table in 'quiz.db'.
-    
-    This function calls the generic `loadQcsvFiles` utility to load the main
-    themes file for the quiz.
+    True if the compiled bank of `db_path` was compiled from the current source CSVs.
+
+    `compile_quiz_bank` copies the manifest of the sources into the compiled
+    bank. So the compiled bank is current if `db_path` matches the CSVs
+    (`_bank_up_to_date`) and both manifests record the same content hashes.
+    The compiled bank is only read, never written: the server maps it as an
+    immutable file.
     """
-    # Expand your pattern into file paths
-    base = Path().resolve()  # equivalent to $PWD
-    pattern = str(base / "quiz-time" / "temas.csv")
-    db_path = "quiz.db"
-    table = "temas"
-    loadQcsvFiles(pattern,db_path,table)
+    path = compiled_bank_path(db_path)
+    if not os.path.exists(path) or not _bank_up_to_date(db_path):
+        return False
+    compiled = _manifest_hashes(path)
+    return compiled is not None and compiled == _manifest_hashes(db_path)
 
 
-def loadQaulas():
+def validate_quiz_bank(db_path, reference_path=None, min_row_ratio=MIN_ROW_RATIO):
     """
-    Loads quiz class/lesson data from 'aulas.csv' into the 'aulas' table in 'quiz.db'.
-    
-    This function calls the generic `loadQcsvFiles` utility to load the main
-    'aulas' file for the quiz.
+    Checks that a bank file is complete enough to serve.
+
+    Every table in REQUIRED_COLUMNS must exist, have its required columns and
+    at least one row, `questions_view` must hold every response, and the file
+    must pass `PRAGMA quick_check`. With `reference_path`
+    (the live bank), no table may shrink below `min_row_ratio` of its rows there.
+
+    Args:
+        db_path (str): The bank file to check.
+        reference_path (str | None): The bank currently being served, if any.
+        min_row_ratio (float): Smallest accepted row count relative to the reference.
+
+    Returns:
+        dict: Table name -> row count.
+
+    Raises:
+        ValueError: Listing every problem found.
     """
-    # Expand your pattern into file paths
-    base = Path().resolve()  # equivalent to $PWD
-    pattern = str(base / "quiz-time" / "aulas.csv")
-    db_path = "quiz.db"
-    table = "aulas"
-    loadQcsvFiles(pattern,db_path,table)
\ No newline at end of file
+    problems = []
+    counts = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        for table, required in REQUIRED_COLUMNS.items():
+            columns = _table_columns(conn, table)
+            if not columns:
+                problems.append(f"table {table} is missing")
+                continue
+            missing = [c for c in required if c not in columns]
+            if missing:
+                problems.append(f"{table} lacks columns {', '.join(missing)}")
+            counts[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            if counts[table] == 0:
+                problems.append(f"{table} is empty")
+        view_rows = conn.execute(f'SELECT COUNT(*) FROM "{QUESTIONS_VIEW}"').fetchone()[0] if _table_columns(conn, QUESTIONS_VIEW) else None
+        if view_rows != counts.get("responses"):
+            problems.append(f"{QUESTIONS_VIEW} has {view_rows} rows for {counts.get('responses')} responses")
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            problems.append(f"quick_check: {check}")
+    finally:
+        conn.close()
+
+    if reference_path and os.path.exists(reference_path) and min_row_ratio:
+        ref = sqlite3.connect(f"file:{reference_path}?mode=ro", uri=True)
+        try:
+            for table, count in counts.items():
+                if not _table_columns(ref, table):
+                    continue
+                ref_count = ref.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                if count < ref_count * min_row_ratio:
+                    problems.append(f"{table} would shrink from {ref_count} to {count} rows")
+        finally:
+            ref.close()
+
+    if problems:
+        raise ValueError("; ".join(problems))
+    return counts
+
+
+def _drop_bank_tables(conn):
+    """Empties a bank copy for a full rebuild, keeping its question ID registry."""
+    with conn:
+        _seed_question_ids(conn)
+        for table in (*REQUIRED_COLUMNS, QUESTIONS_VIEW, MANIFEST_TABLE):
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+
+
+def rebuild_quiz_bank(db_path=QUIZ_DB_PATH, force=False, refresh_compiled=True):
+    """
+    Rebuilds the question bank next to the live file and swaps it in atomically.
+
+    The new bank is built in '<db_path>.new' (starting from a copy of the live
+    bank, so the load stays incremental and question IDs stay stable),
+    validated with `validate_quiz_bank` and then renamed over `db_path`. Readers open a new connection per query,
+    so they move to the new file on their next request; readers in other
+    processes notice the swap through `DBreadQuiz.check_bank_file`.
+
+    Args:
+        db_path (str): The live bank file.
+        force (bool): Rebuild every table from scratch and skip the
+            shrinkage check, even if the sources look unchanged. Question
+            IDs are still kept.
+        refresh_compiled (bool): If a compiled bank (quiz.bank) exists, which
+            the server reads instead of `db_path`, recompile it when it is
+            out of date with the sources (or when forced).
+
+    Returns:
+        bool: True if a new bank was swapped in, False if it was already current.
+
+    Raises:
+        ValueError: If the new bank fails validation (the live bank is kept).
+    """
+    if not force and _bank_up_to_date(db_path):
+        print("Quiz bank: up to date", flush=True)
+        if refresh_compiled:
+            _refresh_compiled_bank(db_path)
+        return False
+
+    new_path = db_path + ".new"
+    if os.path.exists(new_path):
+        os.remove(new_path)
+
+    try:
+        if os.path.exists(db_path):
+            src = sqlite3.connect(db_path)
+            dst = sqlite3.connect(new_path)
+            try:
+                src.backup(dst)
+                if force:
+                    _drop_bank_tables(dst)
+            finally:
+                dst.close()
+                src.close()
+        for table, pattern in _bank_sources().items():
+            loadQcsvFiles(pattern, new_path, table, scratch=True)
+        _refresh_questions_view(new_path)
+        counts = validate_quiz_bank(new_path, db_path, min_row_ratio=0 if force else MIN_ROW_RATIO)
+        # Loaded without fsync: make it durable before it replaces the live bank
+        with open(new_path, 'rb') as f:
+            os.fsync(f.fileno())
+    except BaseException:
+        if os.path.exists(new_path):
+            os.remove(new_path)
+        raise
+
+    os.replace(new_path, db_path)
+    bump_bank_generation()
+    print(
+        "Quiz bank: swapped in new bank (" + ", ".join(f"{t}={n}" for t, n in counts.items()) + ")",
+        flush=True,
+    )
+    if refresh_compiled:
+        _refresh_compiled_bank(db_path, force=force)
+    return True
+
+
+def _refresh_compiled_bank(db_path, force=False):
+    """Recompiles an existing compiled bank if it no longer matches the sources (or if forced)."""
+    if not os.path.exists(compiled_bank_path(db_path)):
+        return False
+    if not force and compiled_bank_up_to_date(db_path):
+        return False
+    _write_compiled_bank(db_path, compiled_bank_path(db_path))
+    return True
+
+
+def ensure_quiz_bank(db_path=QUIZ_DB_PATH):
+    """
+    Brings the bank up to date at boot.
+
+    Runs `rebuild_quiz_bank`, which also recompiles a stale compiled bank.
+    A compiled bank deployed without its source CSVs cannot be checked and
+    is served as is (with a warning).
+
+    Returns:
+        bool: True if a new bank was swapped in.
+    """
+    if os.path.exists(compiled_bank_path(db_path)) and not any(glob(p) for p in _bank_sources().values()):
+        print(
+            f"WARNING: No quiz-time CSVs found; serving {compiled_bank_path(db_path)} without checking it",
+            flush=True,
+        )
+        return False
+    return rebuild_quiz_bank(db_path)
+
+
+def compile_quiz_bank(db_path=QUIZ_DB_PATH, output=None):
+    """
+    Compiles the question bank into one read-only file for the server.
+
+    Brings `db_path` up to date with `rebuild_quiz_bank` (so question rowids
+    stay what stored results refer to), then writes a single `questions` table
+    of denormalized records: every `questions_view` column (responses plus the
+    joined 'nome_tema', 'aula_title' and 'imagem'), the options and scoring already
+    parsed ('options_json', 'scoring_json', as `CompiledQuestion` needs them)
+    and 'max_points'. Rows are stored by year/tema/aula, indexed on
+    (ano, num_tema, num_aula) and uuid, and the file is vacuumed.
+
+    The result replaces `output` atomically. `DBreadQuiz` reads it instead of
+    `db_path` whenever it exists, as an immutable memory-mapped file.
+
+    Args:
+        db_path (str): The quiz database built from the CSVs.
+        output (str | None): Where to write the compiled bank. Defaults to
+            `DBreadQuiz.compiled_bank_path(db_path)` ('quiz.bank').
+
+    Returns:
+        int: Number of questions compiled.
+
+    Raises:
+        ValueError: If the bank has no questions.
+    """
+    rebuild_quiz_bank(db_path, refresh_compiled=False)
+    return _write_compiled_bank(db_path, output or compiled_bank_path(db_path))
+
+
+def _write_compiled_bank(db_path, output):
+    """Writes the compiled bank of `db_path` to `output` (see `compile_quiz_bank`)."""
+    from Funhelpers.quiz_helpers import CompiledQuestion
+
+    t0 = time.perf_counter()
+
+    new_path = output + ".new"
+    if os.path.exists(new_path):
+        os.remove(new_path)
+
+    src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    src.row_factory = sqlite3.Row
+    dst = sqlite3.connect(new_path)
+    try:
+        types = {row[1]: row[2] or 'TEXT' for row in src.execute(f'PRAGMA table_info("{QUESTIONS_VIEW}")')}
+        rows = src.execute(f"{VIEW_QUESTION_SELECT} ORDER BY r.ano, r.num_tema, r.num_aula, r.qid")
+        columns = [c for c in (d[0] for d in rows.description) if c not in ("rowid", "qid", SOURCE_COLUMN)]
+        extra = ("options_json", "scoring_json", "max_points")
+        column_defs = ", ".join(f'"{c}" {types.get(c, "TEXT")}' for c in columns)
+        dst.execute(
+            f'CREATE TABLE questions (qid INTEGER PRIMARY KEY, {column_defs}, '
+            'options_json TEXT, scoring_json TEXT, max_points REAL)'
+        )
+        placeholders = ", ".join("?" * (len(columns) + len(extra) + 1))
+        sql = f"INSERT INTO questions VALUES ({placeholders})"
+        n_questions = 0
+        while True:
+            chunk = rows.fetchmany(STREAM_CHUNK_ROWS)
+            if not chunk:
+                break
+            records = []
+            for row in chunk:
+                question = CompiledQuestion.from_row(row)
+                records.append((
+                    row["rowid"],
+                    *(row[c] for c in columns),
+                    json.dumps(list(question.options)),
+                    json.dumps(list(question.scoring)),
+                    question.max_points,
+                ))
+            dst.executemany(sql, records)
+            n_questions += len(records)
+        if not n_questions:
+            raise ValueError(f"{db_path} has no questions to compile")
+
+        dst.execute('CREATE INDEX idx_questions_ano_num_tema_num_aula ON questions (ano, num_tema, num_aula)')
+        dst.execute('CREATE INDEX idx_questions_uuid ON questions (uuid)')
+        _ensure_manifest(dst)
+        dst.executemany(
+            f"INSERT INTO {MANIFEST_TABLE} (table_name, path, size, mtime_ns, sha256) VALUES (?, ?, ?, ?, ?)",
+            src.execute(f"SELECT table_name, path, size, mtime_ns, sha256 FROM {MANIFEST_TABLE}"),
+        )
+        dst.execute("CREATE TABLE bank_info (key TEXT PRIMARY KEY, value TEXT)")
+        dst.executemany("INSERT INTO bank_info VALUES (?, ?)", [
+            ("format_version", "1"),
+            ("compiled_at", time.strftime("%Y-%m-%d %H:%M:%S")),
+            ("questions", str(n_questions)),
+        ])
+        dst.commit()
+        dst.execute("VACUUM")
+    except BaseException:
+        dst.close()
+        os.remove(new_path)
+        raise
+    finally:
+        src.close()
+        dst.close()
+
+    os.replace(new_path, output)
+    bump_bank_generation()
+    print(
+        f"Quiz bank: compiled {n_questions} questions into {output} "
+        f"({os.path.getsize(output) / 1024:.0f} KiB, {(time.perf_counter() - t0) * 1000:.0f}ms)",
+        flush=True,
+    )
+    return n_questions
+
+
+def loadQanswers(db_path=QUIZ_DB_PATH):
+    """
+    Loads quiz answers from CSV files into the 'responses' table in 'quiz.db'.
+
+    Kept for older scripts: the bank tables are no longer loaded one by one
+    into the live file, so this runs `rebuild_quiz_bank`, which brings every
+    table up to date (incrementally) and swaps the result in.
+    """
+    return rebuild_quiz_bank(db_path)
+
+
+def loadQlinks(db_path=QUIZ_DB_PATH):
+    """Loads 'links.csv' into the 'links' table; runs `rebuild_quiz_bank` (see `loadQanswers`)."""
+    return rebuild_quiz_bank(db_path)
+
+
+def loadQtemas(db_path=QUIZ_DB_PATH):
+    """Loads 'temas.csv' into the 'temas' table; runs `rebuild_quiz_bank` (see `loadQanswers`)."""
+    return rebuild_quiz_bank(db_path)
+
+
+def loadQaulas(db_path=QUIZ_DB_PATH):
+    """Loads 'aulas.csv' into the 'aulas' table; runs `rebuild_quiz_bank` (see `loadQanswers`)."""
+    return rebuild_quiz_bank(db_path)
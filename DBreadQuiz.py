@@ -0,0 +1,551 @@
+"""
+This module handles reading quiz questions from the SQLite question bank.
+
+It is the read-side counterpart of `DBloadQuiz`: the loaders write the
+`responses`, `temas`, `aulas` and `links` tables into 'quiz.db', and the
+helpers here fetch fully joined question records from them.
+
+Because the bank only changes when the `DBloadQuiz` loaders rerun, joined
+question records are kept in bounded, in-process LRU caches. The loaders call
+`bump_bank_generation()` after writing, which drops every cached entry.
+A bank swapped in by another process (`flask reload-quiz-bank`) is noticed by
+`check_bank_file()`, which stats 'quiz.db' at most once a second; every query
+opens a fresh connection, so readers move to the new file on their next call.
+The question-ID index used to pick questions for a new quiz is kept in memory
+as well and is rebuilt on the next quiz start after a reload. The caches'
+hit/miss/eviction counters are logged by the maintenance scheduler
+(`log_question_cache_stats`).
+
+If a compiled bank ('quiz.bank', see `DBloadQuiz.compile_quiz_bank`) sits next
+to 'quiz.db', it is read instead: an immutable SQLite file of denormalized,
+pre-parsed question records, opened read-only with `mmap_size` so every worker
+process reads the same pages from the OS page cache.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+from array import array
+from urllib.parse import quote
+
+from cachetools import LRUCache
+
+QUIZ_DB_PATH = "quiz.db"
+QUESTION_CACHE_SIZE = int(os.getenv("QUIZ_QUESTION_CACHE_SIZE", "4096"))
+
+# How often (seconds) readers stat quiz.db to notice a swapped-in bank
+BANK_CHECK_INTERVAL = 1.0
+
+# Compiled bank read instead of quiz.db when present (see DBloadQuiz.compile_quiz_bank)
+COMPILED_BANK_SUFFIX = ".bank"
+# Bytes of a compiled bank SQLite may read through mmap
+BANK_MMAP_SIZE = int(os.getenv("QUIZ_BANK_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# SQLite builds older than 3.32 cap host parameters at 999 per statement.
+MAX_QIDS_PER_QUERY = 900
+
+QUESTION_SELECT = """
+    SELECT r.rowid AS rowid, r.*, t.nome_tema, a.aula_title, l.imagem
+    FROM responses r
+    LEFT JOIN temas t ON t.ano = r.ano AND t.num_tema = r.num_tema
+    LEFT JOIN aulas a ON a.ano = r.ano AND a.num_tema = r.num_tema AND a.num_aula = r.num_aula
+    LEFT JOIN links l ON l.uuid = r.uuid
+"""
+
+# Same record from the table DBloadQuiz materializes it into at load time
+QUESTIONS_VIEW = "questions_view"
+VIEW_QUESTION_SELECT = f"""
+    SELECT r.qid AS rowid, r.*
+    FROM {QUESTIONS_VIEW} r
+"""
+
+# Same record, already joined and parsed, from a compiled bank
+COMPILED_QUESTION_SELECT = """
+    SELECT r.rowid AS rowid, r.*
+    FROM questions r
+"""
+
+
+def compiled_bank_path(db_path=QUIZ_DB_PATH):
+    """Path of the compiled bank that replaces `db_path` when it exists ('quiz.db' -> 'quiz.bank')."""
+    return os.path.splitext(db_path)[0] + COMPILED_BANK_SUFFIX
+
+
+def connect_bank(db_path=QUIZ_DB_PATH):
+    """
+    Opens the question bank for reading.
+
+    Uses the compiled bank next to `db_path` if there is one (as an immutable,
+    memory-mapped SQLite file), otherwise `db_path` itself.
+
+    Args:
+        db_path (str, optional): Path to the quiz SQLite database.
+
+    Returns:
+        tuple[sqlite3.Connection, bool]: The connection, and whether it is a
+        compiled bank (which has a `questions` table instead of `responses`).
+    """
+    path, compiled = bank_source(db_path)
+    if not compiled:
+        return sqlite3.connect(path), False
+    conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?immutable=1", uri=True)
+    conn.execute(f"PRAGMA mmap_size={BANK_MMAP_SIZE}")
+    return conn, True
+
+
+def _flatten_qid(qid):
+    """
+    Normalizes a question ID to a plain integer.
+
+    Question IDs kept in the session come back from `getQuestionIDsForYear` as
+    one-element rows (`(id,)`, or `[id]` once they round-trip through the
+    session cookie), while stored results use plain integers or strings.
+
+    Args:
+        qid (int | str | tuple | list): The question ID in any of those forms.
+
+    Returns:
+        int: The question rowid.
+    """
+    if isinstance(qid, (tuple, list)):
+        qid = qid[0]
+    return int(qid)
+
+
+def getQuestionsFromQids(qids, db_path=QUIZ_DB_PATH):
+    """
+    Fetches many fully joined questions from the quiz bank in a single query.
+
+    This is the bulk version of `getQuestionFromQid`. Instead of issuing one
+    query per question, it selects every requested rowid with one `IN (...)`
+    query and then puts the rows back in the order the IDs were given, so the
+    result lines up with the quiz order. Records are read from the
+    `questions_view` table the loaders materialize (already joined with
+    temas/aulas/links); banks loaded before it existed are joined on the fly.
+
+    Args:
+        qids (list): Question IDs, either plain integers/strings or the
+            one-element rows stored in `session['question_ids']`.
+        db_path (str, optional): Path to the quiz SQLite database.
+            Defaults to 'quiz.db' (or the compiled bank next to it).
+
+    Returns:
+        tuple[list[sqlite3.Row], list[int]]: The question rows in the same order
+        as `qids`, and the list of IDs that were not found in the bank (also in
+        quiz order). Missing questions are left out of the rows list.
+    """
+    flat_qids = [_flatten_qid(qid) for qid in qids]
+    if not flat_qids:
+        return [], []
+
+    unique_qids = list(dict.fromkeys(flat_qids))
+    rows_by_id = {}
+
+    conn, compiled = connect_bank(db_path)
+    try:
+        conn.row_factory = sqlite3.Row
+        if compiled:
+            select = COMPILED_QUESTION_SELECT
+        elif conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (QUESTIONS_VIEW,)).fetchone():
+            select = VIEW_QUESTION_SELECT
+        else:
+            # Bank loaded before questions_view existed: join on the fly
+            select = QUESTION_SELECT
+        for start in range(0, len(unique_qids), MAX_QIDS_PER_QUERY):
+            chunk = unique_qids[start:start + MAX_QIDS_PER_QUERY]
+            placeholders = ",".join("?" * len(chunk))
+            query = f"{select} WHERE r.rowid IN ({placeholders})"
+            for row in conn.execute(query, chunk):
+                rows_by_id[row["rowid"]] = row
+    finally:
+        conn.close()
+
+    questions = []
+    missing = []
+    for qid in flat_qids:
+        row = rows_by_id.get(qid)
+        if row is None:
+            missing.append(qid)
+        else:
+            questions.append(row)
+
+    return questions, missing
+
+
+class _CountingLRUCache(LRUCache):
+    """An `LRUCache` that counts how many entries it had to evict."""
+
+    def __init__(self, maxsize):
+        super().__init__(maxsize=maxsize)
+        self.evictions = 0
+
+    def popitem(self):
+        key, value = super().popitem()
+        self.evictions += 1
+        return key, value
+
+    def clear(self):
+        # MutableMapping.clear() empties the cache through popitem(); a reload
+        # is not an eviction, so keep the counter as it was.
+        evictions = self.evictions
+        super().clear()
+        self.evictions = evictions
+
+
+# Every QuestionCache registers itself here so a bank reload reaches all of them.
+_question_caches = weakref.WeakSet()
+
+
+class QuestionCache:
+    """
+    A thread-safe, bounded LRU cache of fully joined question records.
+
+    Entries are keyed by question rowid. By default the cached value is the
+    `sqlite3.Row` itself; passing `build` stores `build(row)` instead, so
+    derived objects (e.g. compiled questions) are computed once per load.
+
+    The cache carries a generation stamp: `bump_generation()` increments it and
+    drops every entry, and rows fetched while a bump happened are not stored,
+    so a reload never leaves stale questions behind.
+    """
+
+    def __init__(self, name="questions", maxsize=QUESTION_CACHE_SIZE, db_path=QUIZ_DB_PATH, build=None):
+        self.name = name
+        self.db_path = db_path
+        self.build = build
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = _CountingLRUCache(maxsize)
+        self._lock = threading.Lock()
+        _question_caches.add(self)
+
+    def get_many(self, qids):
+        """
+        Returns the questions for `qids`, fetching only the uncached ones.
+
+        All cache misses are loaded with a single `getQuestionsFromQids` query.
+        A bank swapped in since the last call is picked up first (`check_bank_file`).
+
+        Args:
+            qids (list): Question IDs in any form accepted by `_flatten_qid`.
+
+        Returns:
+            tuple[list, list[int]]: The cached questions (rows, or whatever
+            `build` returns) in quiz order, and the IDs that were not found in
+            the bank.
+        """
+        check_bank_file(self.db_path)
+        flat_qids = [_flatten_qid(qid) for qid in qids]
+        found = {}
+        to_fetch = {}
+
+        with self._lock:
+            generation = self.generation
+            for qid in flat_qids:
+                row = self._entries.get(qid)
+                if row is not None:
+                    self.hits += 1
+                    found[qid] = row
+                else:
+                    self.misses += 1
+                    to_fetch[qid] = None
+
+        if to_fetch:
+            rows, _ = getQuestionsFromQids(list(to_fetch), db_path=self.db_path)
+            with self._lock:
+                for row in rows:
+                    value = self.build(row) if self.build else row
+                    found[row["rowid"]] = value
+                    if self.generation == generation:
+                        self._entries[row["rowid"]] = value
+
+        questions = []
+        missing = []
+        for qid in flat_qids:
+            row = found.get(qid)
+            if row is None:
+                missing.append(qid)
+            else:
+                questions.append(row)
+        return questions, missing
+
+    def get(self, qid):
+        """
+        Returns a single cached question, or None if it is not in the bank.
+
+        Args:
+            qid (int | str | tuple | list): The question ID.
+
+        Returns:
+            sqlite3.Row | object | None: The fully joined question record (or
+            its `build` result).
+        """
+        questions, _ = self.get_many([qid])
+        return questions[0] if questions else None
+
+    def bump_generation(self):
+        """
+        Invalidates the cache after the question bank has been reloaded.
+
+        Returns:
+            int: The new generation stamp.
+        """
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            return self.generation
+
+    def stats(self):
+        """
+        Returns the cache counters.
+
+        Returns:
+            dict: hits, misses, evictions, current size, maxsize and generation.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self._entries.evictions,
+                "size": len(self._entries),
+                "maxsize": self._entries.maxsize,
+                "generation": self.generation,
+            }
+
+
+# Default row cache; its generation is the one `QuestionIndex` follows
+question_cache = QuestionCache()
+
+
+def bump_bank_generation():
+    """
+    Drops every cached question in every question cache.
+
+    Called by the `DBloadQuiz` loaders after they rewrite the bank.
+
+    Returns:
+        int: The new generation stamp of the default row cache.
+    """
+    for cache in list(_question_caches):
+        if cache is not question_cache:
+            cache.bump_generation()
+    return question_cache.bump_generation()
+
+
+_bank_files = {}  # db_path -> [last check (monotonic), (path, compiled, st_ino, st_mtime_ns)]
+_bank_files_lock = threading.Lock()
+
+
+def _bank_signature(db_path):
+    """The file the bank is read from (compiled bank first), with its identity."""
+    for path, compiled in ((compiled_bank_path(db_path), True), (db_path, False)):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        return (path, compiled, st.st_ino, st.st_mtime_ns)
+    return None
+
+
+def check_bank_file(db_path=QUIZ_DB_PATH):
+    """
+    Bumps the bank generation if the bank file was replaced since the last check.
+
+    `DBloadQuiz.rebuild_quiz_bank` and `DBloadQuiz.compile_quiz_bank` swap in
+    a new file with a rename, possibly from another process, so the file read
+    (compiled bank or `db_path`) and its inode/mtime are compared instead of
+    relying on the in-process `bump_bank_generation` call. Stats the files at
+    most once every BANK_CHECK_INTERVAL seconds.
+
+    Returns:
+        bool: True if a new bank was detected.
+    """
+    now = time.monotonic()
+    state = _bank_files.get(db_path)
+    if state is not None and now - state[0] < BANK_CHECK_INTERVAL:
+        return False
+    with _bank_files_lock:
+        state = _bank_files.setdefault(db_path, [float("-inf"), None])
+        if now - state[0] < BANK_CHECK_INTERVAL:
+            return False
+        state[0] = now
+        signature = _bank_signature(db_path)
+        previous, state[1] = state[1], signature
+    if previous is not None and signature != previous:
+        bump_bank_generation()
+        return True
+    return False
+
+
+def bank_source(db_path=QUIZ_DB_PATH):
+    """
+    Returns which file the bank behind `db_path` is read from.
+
+    Returns:
+        tuple[str, bool]: The path, and whether it is a compiled bank.
+    """
+    check_bank_file(db_path)
+    signature = _bank_files[db_path][1]
+    if signature is None:
+        return db_path, False
+    return signature[0], signature[1]
+
+
+def question_cache_stats():
+    """
+    Returns the hit/miss/eviction counters of every question cache.
+
+    Returns:
+        dict: Cache name -> counters (see `QuestionCache.stats`).
+    """
+    return {cache.name: cache.stats() for cache in list(_question_caches)}
+
+
+def log_question_cache_stats():
+    """
+    Prints one line of counters per question cache that has been used (a
+    maintenance job, run by every worker process).
+
+    Returns:
+        dict: The counters of every cache, as `question_cache_stats`.
+    """
+    stats = question_cache_stats()
+    for name, counters in sorted(stats.items()):
+        lookups = counters["hits"] + counters["misses"]
+        if not lookups:
+            continue
+        hit_rate = counters["hits"] / lookups * 100
+        print(
+            f"Question cache {name} (pid {os.getpid()}): {hit_rate:.1f}% hits, "
+            + ", ".join(f"{key} {value}" for key, value in counters.items()),
+            flush=True,
+        )
+    return stats
+
+
+class QuestionIndex:
+    """
+    In-memory index of question rowids by year, tema and aula.
+
+    `tree` is `ano -> num_tema -> num_aula -> array('i') of rowids`. The same
+    rowids are also kept in one flat `array('i')` ordered by year, so every
+    year (and every "years before N" range) is a contiguous slice that
+    `random.sample` can draw from through a memoryview without copying.
+
+    The index is built from the bank on first use and rebuilt lazily whenever
+    the bank generation changes (see `bump_bank_generation`).
+    """
+
+    def __init__(self, db_path=QUIZ_DB_PATH):
+        self.db_path = db_path
+        self.tree = {}
+        self.generation = None
+        self._flat = array('i')
+        self._year_bounds = {}
+        self._lock = threading.Lock()
+
+    def _build(self):
+        conn, compiled = connect_bank(self.db_path)
+        try:
+            rows = conn.execute(
+                f"SELECT rowid, ano, num_tema, num_aula FROM {'questions' if compiled else 'responses'}"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        tree = {}
+        for rowid, ano, num_tema, num_aula in rows:
+            try:
+                ano = int(ano)
+            except (TypeError, ValueError):
+                continue
+            aulas = tree.setdefault(ano, {}).setdefault(num_tema, {})
+            aulas.setdefault(num_aula, array('i')).append(rowid)
+
+        flat = array('i')
+        year_bounds = {}
+        for ano in sorted(tree):
+            start = len(flat)
+            for num_tema in tree[ano]:
+                for rowids in tree[ano][num_tema].values():
+                    flat.extend(rowids)
+            year_bounds[ano] = (start, len(flat))
+
+        self.tree = tree
+        self._flat = flat
+        self._year_bounds = year_bounds
+
+    def refresh(self):
+        """Builds the index if it is missing or older than the current bank generation."""
+        check_bank_file(self.db_path)
+        generation = question_cache.generation
+        if self.generation != generation:
+            with self._lock:
+                if self.generation != generation:
+                    self._build()
+                    self.generation = generation
+
+    def year_pool(self, year):
+        """All rowids of `year`, as a read-only sequence."""
+        self.refresh()
+        start, end = self._year_bounds.get(year, (0, 0))
+        return memoryview(self._flat)[start:end]
+
+    def previous_years_pool(self, year):
+        """All rowids of the years before `year`, as a read-only sequence."""
+        self.refresh()
+        ends = [end for ano, (_, end) in self._year_bounds.items() if ano < year]
+        return memoryview(self._flat)[0:max(ends, default=0)]
+
+    def sample(self, year, num_exercises, current_year_percent):
+        """
+        Picks random question IDs for a quiz.
+
+        `current_year_percent` of the questions come from `year` and the rest
+        from all previous years. If either pool is too small, the other one
+        fills the gap. Sampling is O(num_exercises), whatever the bank size.
+
+        Args:
+            year (int): The school year of the quiz.
+            num_exercises (int): Number of questions to pick.
+            current_year_percent (int): Share (0-100) taken from `year`.
+
+        Returns:
+            list[int]: Distinct rowids in random order.
+        """
+        current = self.year_pool(year)
+        previous = self.previous_years_pool(year)
+
+        n_current = min(len(current), int(round(num_exercises * current_year_percent / 100)))
+        n_previous = min(len(previous), num_exercises - n_current)
+        n_current = min(len(current), num_exercises - n_previous)
+
+        qids = random.sample(current, n_current) + random.sample(previous, n_previous)
+        random.shuffle(qids)
+        return qids
+
+
+question_index = QuestionIndex()
+
+
+def getQuestionIDsForYear(year, num_exercises=20, current_year_percent=50):
+    """
+    Picks the question IDs for a new quiz from the in-memory question index.
+
+    Drop-in replacement for `DBhelpers.getQuestionIDsForYear`: it returns the
+    IDs as one-element rows, which is the shape `session['question_ids']` and
+    the rest of the quiz code expect.
+
+    Args:
+        year (int): The school year of the quiz.
+        num_exercises (int, optional): Number of questions. Defaults to 20.
+        current_year_percent (int, optional): Share taken from `year`; the
+            rest comes from previous years. Defaults to 50.
+
+    Returns:
+        list[tuple[int]]: The selected question IDs, e.g. [(12,), (873,), ...].
+    """
+    return [(qid,) for qid in question_index.sample(year, num_exercises, current_year_percent)]
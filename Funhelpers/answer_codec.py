@@ -0,0 +1,174 @@
+"""
+Compact, versioned encoding for stored quiz answers.
+
+Stored answers map question rowids to selected option indexes, e.g.
+`{"1234": ["0"], "1235": ["2", "3"]}`. As JSON text that is ~15 bytes per
+question; the binary format below needs 2-3.
+
+Format version 1 (all integers are unsigned LEB128 varints):
+
+    0x01                       version
+    count                      number of questions
+    count x (delta, mask)      qid - previous qid (first: qid itself), and the
+                               bitmask of selected option indexes (bit i = option i)
+
+Questions are stored in ascending qid order, so decoding also yields answers
+sorted by qid. Option order and duplicates are not kept (an option is either
+selected or not), which is all the scoring needs.
+
+Where only text can be stored (CSV, JSON lines), `encode_answers_text` wraps
+the bytes as '~' + URL-safe base64. `decode_answers` reads every form,
+including the legacy JSON text, so old rows keep working.
+"""
+import base64
+import json
+
+FORMAT_VERSION = 1
+TEXT_PREFIX = '~'
+# Highest option index a mask can hold; questions have a handful of options,
+# and an unbounded index would make `1 << idx` (and the stored mask) huge
+MAX_OPTION_INDEX = 63
+# Longest varint accepted when decoding (enough for 64-bit values)
+_MAX_VARINT_SHIFT = 63
+
+
+def _write_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+        if shift > _MAX_VARINT_SHIFT:
+            raise ValueError("Varint too long")
+
+
+def _option_mask(answer):
+    """Bitmask of an answer (list of option indexes, or a bare legacy string)."""
+    if isinstance(answer, (str, int)):
+        answer = [answer]
+    mask = 0
+    for idx in answer:
+        idx = int(idx)
+        if not 0 <= idx <= MAX_OPTION_INDEX:
+            raise ValueError(f"Option index out of range: {idx}")
+        mask |= 1 << idx
+    return mask
+
+
+def _mask_options(mask):
+    options = []
+    idx = 0
+    while mask:
+        if mask & 1:
+            options.append(str(idx))
+        mask >>= 1
+        idx += 1
+    return options
+
+
+def encode_answers(answers):
+    """
+    Encodes answers by question rowid in the binary format.
+
+    Args:
+        answers (dict): qid -> selected option indexes, e.g. {"1234": ["0"]}.
+
+    Returns:
+        bytes: The encoded answers.
+
+    Raises:
+        ValueError: If a qid is not a non-negative integer, or an option
+            index is not an integer in 0..MAX_OPTION_INDEX.
+    """
+    entries = sorted((int(qid), _option_mask(answer)) for qid, answer in answers.items())
+    out = bytearray([FORMAT_VERSION])
+    _write_varint(out, len(entries))
+    previous = 0
+    for qid, mask in entries:
+        if qid < previous:
+            raise ValueError(f"Negative question id: {qid}")
+        _write_varint(out, qid - previous)
+        _write_varint(out, mask)
+        previous = qid
+    return bytes(out)
+
+
+def encode_answers_text(answers):
+    """
+    Encodes answers for text columns: '~' + URL-safe base64 of `encode_answers`.
+
+    Answers that the binary format cannot hold (non-integer ids or options,
+    option indexes above MAX_OPTION_INDEX) are stored as JSON instead, which `decode_answers` reads as well.
+    """
+    try:
+        data = encode_answers(answers)
+    except (TypeError, ValueError):
+        return json.dumps(answers)
+    return TEXT_PREFIX + base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _decode_binary(data):
+    if not data or data[0] != FORMAT_VERSION:
+        raise ValueError(f"Unknown answers format version: {data[:1]!r}")
+    count, pos = _read_varint(data, 1)
+    answers = {}
+    qid = 0
+    for _ in range(count):
+        delta, pos = _read_varint(data, pos)
+        mask, pos = _read_varint(data, pos)
+        qid += delta
+        answers[str(qid)] = _mask_options(mask)
+    return answers
+
+
+def _normalize_legacy(answers):
+    """Legacy JSON answers -> {qid: [option, ...]} in ascending qid order."""
+    def qid_order(qid):
+        qid = str(qid)
+        return (0, int(qid), '') if qid.isdigit() else (1, 0, qid)
+
+    normalized = {}
+    for qid in sorted(answers, key=qid_order):
+        answer = answers[qid]
+        if isinstance(answer, (str, int)):
+            answer = [answer]
+        normalized[str(qid)] = [str(a) for a in answer]
+    return normalized
+
+
+def decode_answers(value):
+    """
+    Decodes stored answers in any of the supported forms.
+
+    Args:
+        value (bytes | str | dict | None): Binary (`encode_answers`), text
+            ('~...' from `encode_answers_text`), legacy JSON text, or an
+            already-decoded dict.
+
+    Returns:
+        dict: qid (str) -> list of option indexes (str), in ascending qid order.
+    """
+    if value is None:
+        return {}
+    if isinstance(value, dict):
+        return _normalize_legacy(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        if data[:1] == bytes([FORMAT_VERSION]):
+            return _decode_binary(data)
+        value = data.decode('utf-8')
+    if value.startswith(TEXT_PREFIX):
+        encoded = value[len(TEXT_PREFIX):]
+        return _decode_binary(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+    return _normalize_legacy(json.loads(value or '{}'))
@@ -0,0 +1,218 @@
+"""
+Content-hash manifest of the quiz-time assets.
+
+Question images are requested on every quiz, so they should come from the
+browser cache. `build_asset_manifest` records, for every file under
+'quiz-time/', its size, mtime, SHA-256 and (for images) width and height,
+in 'quiz-assets-manifest.json'. Rebuilding it is incremental: files whose
+size and mtime did not change keep their hash.
+
+With the manifest, asset URLs carry the content hash
+('/quiz-time/<hash>/<path>', see `fingerprinted_path`) and can be cached
+forever, since a changed file gets a new URL. Bare '/quiz-time/<path>' URLs
+still work and are revalidated with the content hash as a strong ETag.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSETS_ROOT = os.path.join(PROJECT_ROOT, 'quiz-time')
+MANIFEST_PATH = os.path.join(PROJECT_ROOT, 'quiz-assets-manifest.json')
+MANIFEST_VERSION = 1
+
+# Length of the hash prefix used in fingerprinted URLs
+HASH_LENGTH = 12
+# Files that are not served as assets
+SKIPPED_EXTENSIONS = ('.csv',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# How often (seconds) the app stats the manifest to pick up a rebuilt one
+MANIFEST_CHECK_INTERVAL = 1.0
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _image_size(path):
+    """(width, height) of an image, or (None, None) if Pillow cannot read it."""
+    try:
+        from PIL import Image
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def load_manifest(manifest_path=MANIFEST_PATH):
+    """
+    Reads a manifest written by `build_asset_manifest`.
+
+    Returns:
+        dict: Asset path (relative to quiz-time, '/'-separated) -> entry, or
+        an empty dict if the manifest is missing or unreadable.
+    """
+    try:
+        with open(manifest_path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('assets', {})
+
+
+def build_asset_manifest(root=ASSETS_ROOT, manifest_path=MANIFEST_PATH):
+    """
+    Builds (or updates) the asset manifest of `root`.
+
+    Every file except the bank CSVs gets an entry with 'hash' (the first
+    HASH_LENGTH hex digits of its SHA-256), 'sha256', 'size', 'mtime_ns' and,
+    for images, 'width' and 'height'. Unchanged files (same size and mtime)
+    are not read again. The manifest is written to a temporary file and
+    renamed into place.
+
+    Args:
+        root (str): The quiz-time directory.
+        manifest_path (str): Where to write the manifest.
+
+    Returns:
+        tuple[int, int]: (number of assets, number of files hashed).
+    """
+    previous = load_manifest(manifest_path)
+    assets = {}
+    hashed = 0
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if name.startswith('.') or name.lower().endswith(SKIPPED_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            key = os.path.relpath(path, root).replace(os.sep, '/')
+            st = os.stat(path)
+            entry = previous.get(key)
+            if not entry or (entry['size'], entry['mtime_ns']) != (st.st_size, st.st_mtime_ns):
+                sha256 = _file_sha256(path)
+                hashed += 1
+                entry = {'hash': sha256[:HASH_LENGTH], 'sha256': sha256, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    entry['width'], entry['height'] = _image_size(path)
+            assets[key] = entry
+
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'assets': assets}, f, separators=(',', ':'))
+    os.replace(tmp_path, manifest_path)
+    return len(assets), hashed
+
+
+def asset_key(rel):
+    """
+    Manifest key of an asset reference ('quiz-time/anos/x.png', '/anos/x.png', ...).
+
+    Returns:
+        str | None: The path relative to quiz-time, or None for absolute URLs
+        and paths that leave the quiz-time directory.
+    """
+    if not rel or '://' in rel or rel.startswith('//'):
+        return None
+    key = rel.lstrip('/')
+    if key.startswith('quiz-time/'):
+        key = key[len('quiz-time/'):]
+    key = os.path.normpath(key).replace(os.sep, '/')
+    if key.startswith('..') or key.startswith('/'):
+        return None
+    return key
+
+
+class AssetManifest:
+    """
+    The manifest as the app sees it: loaded on first use and reloaded when
+    the file is rebuilt (checked at most every MANIFEST_CHECK_INTERVAL seconds).
+    """
+
+    def __init__(self, manifest_path=MANIFEST_PATH, root=ASSETS_ROOT):
+        self.manifest_path = manifest_path
+        self.root = root
+        self._assets = {}
+        self._signature = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked < MANIFEST_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked < MANIFEST_CHECK_INTERVAL:
+                return
+            self._checked = now
+            try:
+                st = os.stat(self.manifest_path)
+                signature = (st.st_ino, st.st_mtime_ns)
+            except FileNotFoundError:
+                signature = None
+            if signature != self._signature:
+                self._assets = load_manifest(self.manifest_path) if signature else {}
+                self._signature = signature
+
+    def get(self, key):
+        """The manifest entry of `key` (see `asset_key`), or None."""
+        if key is None:
+            return None
+        self._refresh()
+        return self._assets.get(key)
+
+    def current(self, key):
+        """
+        The entry of `key` if it still describes the file on disk.
+
+        A file edited after the manifest was built must not be served under
+        its old hash or ETag, so size and mtime are checked against `os.stat`.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return None
+        try:
+            st = os.stat(os.path.join(self.root, key))
+        except OSError:
+            return None
+        if (entry['size'], entry['mtime_ns']) != (st.st_size, st.st_mtime_ns):
+            return None
+        return entry
+
+
+asset_manifest = AssetManifest()
+
+
+def fingerprinted_path(rel):
+    """
+    Path of an asset with its content hash ('quiz-time/<hash>/<path>').
+
+    Args:
+        rel (str): Asset reference as stored in the bank ('quiz-time/...' or
+            a path relative to quiz-time).
+
+    Returns:
+        str: The fingerprinted path (no leading '/'), or `rel` without its
+        leading '/' if the asset is not in the manifest.
+    """
+    key = asset_key(rel)
+    entry = asset_manifest.get(key)
+    if entry is None:
+        return rel.lstrip('/')
+    return f"quiz-time/{entry['hash']}/{key}"
+
+
+def asset_dimensions(rel):
+    """(width, height) of an image asset from the manifest, or (None, None)."""
+    entry = asset_manifest.get(asset_key(rel))
+    if entry is None:
+        return None, None
+    return entry.get('width'), entry.get('height')
@@ -2,12 +2,9 @@
 This module handles the logic for an authenticated user to claim a quiz
 that they completed anonymously.
 """
-import os
-import json
-import csv
-from DBhelpers import getQuestionFromQid, save_quiz_history
-from Funhelpers.quiz_storage import get_quiz_result
-from Funhelpers.quiz_helpers import calculate_score
+from DBhelpers import save_quiz_history
+from Funhelpers.quiz_storage import delete_quiz_result, get_quiz_result
+from Funhelpers.quiz_helpers import calculate_score, get_compiled_questions
 
 def claim_anonymous_quiz(email, quiz_uuid, quiz_config, question_ids_raw, user_answers):
     """
@@ -15,7 +12,7 @@ def claim_anonymous_quiz(email, quiz_uuid, quiz_config, question_ids_raw, user_a
 
     1. Uses quiz data from session to rebuild the result.
     2. Saves this quiz data to the user's permanent history in the database.
-    3. Deletes the claimed quiz from the CSV file.
+    3. Deletes the claimed quiz from the anonymous results store.
 
     Args:
         email (str): The email of the user claiming the quiz.
@@ -31,27 +28,25 @@ def claim_anonymous_quiz(email, quiz_uuid, quiz_config, question_ids_raw, user_a
     # Convert question_ids from list of tuples to list of ints
     qids_flat = [q[0] for q in question_ids_raw]
 
-    raw_questions = []
-    for qid in qids_flat:
-        q_row = getQuestionFromQid(qid)
-        if q_row:
-            raw_questions.append(dict(q_row))
-            
-    if not raw_questions:
+    questions, missing_qids = get_compiled_questions(qids_flat)
+    if missing_qids:
+        print(f"WARNING: Claimed quiz {quiz_uuid} references missing question IDs: {missing_qids}", flush=True)
+
+    if not questions:
         return False
 
     # Re-create answers in the format calculate_score expects ({index: [options]})
     answers_by_index = {}
-    for idx, q in enumerate(raw_questions):
+    for idx, q in enumerate(questions):
         # The key in user_answers is the question's index in the quiz flow
         # Ensure it's correct for calculate_score
         if str(idx) in user_answers:
             answers_by_index[str(idx)] = user_answers[str(idx)]
 
     # 2. Recalculate the score.
-    quiz_results = calculate_score(raw_questions, answers_by_index)
+    quiz_results = calculate_score(questions, answers_by_index)
 
-    # Get the original timestamp from the anonymous quiz CSV
+    # Get the original timestamp from the anonymous quiz result
     anonymous_quiz_data = get_quiz_result(quiz_uuid)
     start_ts = None
     if anonymous_quiz_data and 'timestamp' in anonymous_quiz_data:
@@ -77,32 +72,7 @@ def claim_anonymous_quiz(email, quiz_uuid, quiz_config, question_ids_raw, user_a
     retrieved_quiz = get_quiz_history_by_uuid(email, quiz_uuid)
     # print(f"DEBUG: Immediately retrieved quiz from DB: {retrieved_quiz}")
 
-    # 4. Delete the claimed quiz from the CSV file.
-    QUIZ_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'quiz_results')
-    csv_filepath = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
-    
-    if not os.path.exists(csv_filepath):
-        return True # Nothing to delete if file doesn't exist
-
-    rows_to_keep = []
-    deleted = False
-    
-    with open(csv_filepath, 'r', newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames: # Handle empty file case
-            return True
-        
-        header = reader.fieldnames
-        for row in reader:
-            if row.get('quiz_uuid') == quiz_uuid:
-                deleted = True
-            else:
-                rows_to_keep.append(row)
-
-    if deleted:
-        with open(csv_filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(rows_to_keep)
+    # 4. Delete the claimed quiz from the anonymous results store.
+    delete_quiz_result(quiz_uuid)
 
-    return True
\ No newline at end of file
+    return True
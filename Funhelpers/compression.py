@@ -0,0 +1,278 @@
+"""
+Response compression.
+
+Nothing between Waitress and the browser compresses responses, so the CSS
+and the large quiz pages (quiz_results.html renders up to 100 questions) went
+out as-is. Two mechanisms:
+
+- Static files: `precompress_static` writes '.gz' (and '.br', if the brotli
+  package is installed) siblings of the text files under static/ once, at
+  maximum level. The static endpoint then picks the best sibling the client
+  accepts (`Accept-Encoding`) and sends it as-is: no compression at runtime.
+  A sibling older than its source is ignored.
+- Dynamic responses: `CompressionMiddleware` gzips HTML/JSON/text responses
+  of at least COMPRESSION_MIN_SIZE bytes on the fly, chunk by chunk, at
+  COMPRESSION_LEVEL. Responses that already carry a Content-Encoding
+  (/quiz/bundle) are left alone, and so are files: views that send one
+  (static files, /quiz-time assets) call `skip_runtime_compression`. A strong
+  ETag of a compressed response is made weak, since the gzipped body is not
+  byte-identical to the one it was computed for.
+
+Installed in `create_app` by `init_compression`.
+"""
+import gzip
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_from_directory
+from werkzeug.http import parse_accept_header
+from werkzeug.security import safe_join
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+
+# Static files worth compressing
+PRECOMPRESS_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.html', '.txt', '.map')
+# Smaller files are not precompressed (headers would outweigh the saving)
+PRECOMPRESS_MIN_SIZE = 256
+# Sibling suffix -> Content-Encoding, in order of preference
+PRECOMPRESSED_ENCODINGS = (('.br', 'br'), ('.gz', 'gzip'))
+
+# WSGI environ key set by `skip_runtime_compression`
+SKIP_COMPRESSION_KEY = 'explicolivais.skip_compression'
+
+# Content types the middleware compresses
+COMPRESSIBLE_TYPES = (
+    'text/html',
+    'text/plain',
+    'text/css',
+    'text/javascript',
+    'application/javascript',
+    'application/json',
+    'image/svg+xml',
+)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def precompress_static(static_dir=STATIC_DIR, extensions=PRECOMPRESS_EXTENSIONS, min_size=PRECOMPRESS_MIN_SIZE):
+    """
+    Writes '.gz' and '.br' siblings of the compressible files in `static_dir`.
+
+    Only files whose sibling is missing or older than the file are compressed.
+    Siblings whose source file is gone are deleted. Brotli siblings are
+    skipped (with a warning) if the brotli package is not installed.
+
+    Args:
+        static_dir (str): The static folder.
+        extensions (tuple[str]): File extensions to compress.
+        min_size (int): Files smaller than this (bytes) are skipped.
+
+    Returns:
+        tuple[int, int]: (number of files with siblings, number of siblings written).
+    """
+    brotli = _brotli()
+    if brotli is None:
+        print("WARNING: brotli is not installed; writing .gz siblings only", flush=True)
+    n_files = 0
+    n_written = 0
+    for dirpath, _, filenames in os.walk(static_dir):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if name.endswith(tuple(suffix for suffix, _ in PRECOMPRESSED_ENCODINGS)):
+                if not os.path.exists(path.rsplit('.', 1)[0]):
+                    os.remove(path)
+                continue
+            if not name.lower().endswith(extensions) or os.path.getsize(path) < min_size:
+                continue
+            n_files += 1
+            mtime = os.path.getmtime(path)
+            data = None
+            for suffix, encoding in PRECOMPRESSED_ENCODINGS:
+                target = path + suffix
+                if encoding == 'br' and brotli is None:
+                    continue
+                if os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                    continue
+                if data is None:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                if encoding == 'br':
+                    compressed = brotli.compress(data, quality=11)
+                else:
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                tmp = target + '.tmp'
+                with open(tmp, 'wb') as f:
+                    f.write(compressed)
+                os.replace(tmp, target)
+                n_written += 1
+    return n_files, n_written
+
+
+def _precompressed_sibling(directory, filename, accept_encoding):
+    """(sibling filename, encoding) of the best fresh sibling the client accepts, or (None, None)."""
+    accepted = parse_accept_header(accept_encoding)
+    path = safe_join(directory, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None, None
+    for suffix, encoding in PRECOMPRESSED_ENCODINGS:
+        if not accepted[encoding]:
+            continue
+        try:
+            if os.path.getmtime(path + suffix) >= mtime:
+                return filename + suffix, encoding
+        except OSError:
+            continue
+    return None, None
+
+
+def skip_runtime_compression():
+    """Tells `CompressionMiddleware` to send the current request's response as it is."""
+    request.environ[SKIP_COMPRESSION_KEY] = True
+
+
+def send_precompressed(directory, filename):
+    """
+    `send_from_directory`, but sends a precompressed sibling when the client accepts one.
+
+    The response keeps the original file's Content-Type and gets
+    'Content-Encoding' and 'Vary: Accept-Encoding'. Files without a sibling
+    are sent uncompressed (see `skip_runtime_compression`).
+    """
+    skip_runtime_compression()
+    if not filename.lower().endswith(PRECOMPRESS_EXTENSIONS):
+        return send_from_directory(directory, filename)
+    sibling, encoding = _precompressed_sibling(directory, filename, request.headers.get('Accept-Encoding', ''))
+    if sibling is None:
+        response = send_from_directory(directory, filename)
+    else:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(directory, sibling, mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware that gzips dynamic responses while they are sent.
+
+    A response is compressed if the client accepts gzip, it is a 200 to a
+    non-HEAD request whose view did not call `skip_runtime_compression`, its
+    Content-Type is in COMPRESSIBLE_TYPES, it has no Content-Encoding yet, it
+    does not say 'Cache-Control: no-transform', and its Content-Length (when
+    known) is at least `min_size`. A strong ETag becomes weak ('W/'). Chunks are
+    compressed as they come; responses of unknown length are flushed after
+    each chunk, so streamed pages still arrive progressively.
+
+    Args:
+        app: The WSGI application to wrap.
+        min_size (int): Smallest response (bytes) worth compressing.
+        level (int): zlib compression level (1-9).
+    """
+
+    def __init__(self, app, min_size=1024, level=6):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+
+    def _should_compress(self, status, headers):
+        if not status.startswith('200'):
+            return False
+        content_length = None
+        for name, value in headers:
+            name = name.lower()
+            if name == 'content-encoding':
+                return False
+            if name == 'content-type' and value.split(';')[0].strip().lower() not in COMPRESSIBLE_TYPES:
+                return False
+            if name == 'cache-control' and 'no-transform' in value.lower():
+                return False
+            if name == 'content-length':
+                content_length = int(value)
+        if not any(name.lower() == 'content-type' for name, _ in headers):
+            return False
+        return content_length is None or content_length >= self.min_size
+
+    def __call__(self, environ, start_response):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING'))['gzip']:
+            return self.app(environ, start_response)
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return written.append
+
+        body = self.app(environ, capture)
+        status, headers = captured['status'], captured['headers']
+        if environ.get(SKIP_COMPRESSION_KEY) or not self._should_compress(status, headers):
+            write = start_response(status, headers, captured['exc_info'])
+            for data in written:
+                write(data)
+            return body
+
+        streaming = not any(name.lower() == 'content-length' for name, _ in headers)
+        vary = [value for name, value in headers if name.lower() == 'vary']
+        if 'accept-encoding' not in ', '.join(vary).lower():
+            vary.append('Accept-Encoding')
+        headers = [
+            (name, _weak_etag(value) if name.lower() == 'etag' else value)
+            for name, value in headers if name.lower() not in ('content-length', 'vary')
+        ]
+        headers += [('Content-Encoding', 'gzip'), ('Vary', ', '.join(vary))]
+        start_response(status, headers, captured['exc_info'])
+        return self._compress(written, body, streaming)
+
+    def _compress(self, written, body, streaming):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        try:
+            for chunk in _chain(written, body):
+                data = compressor.compress(chunk)
+                if streaming:
+                    data += compressor.flush(zlib.Z_SYNC_FLUSH)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+
+def _weak_etag(etag):
+    return etag if etag.startswith('W/') else f'W/{etag}'
+
+
+def _chain(written, body):
+    yield from written
+    yield from body
+
+
+def init_compression(app):
+    """
+    Installs precompressed static serving and, unless COMPRESS_RESPONSES is
+    off, `CompressionMiddleware` with COMPRESSION_MIN_SIZE and COMPRESSION_LEVEL.
+    """
+    static_folder = app.static_folder
+
+    def static(filename):
+        return send_precompressed(static_folder, filename)
+
+    app.view_functions['static'] = static
+    if app.config.get('COMPRESS_RESPONSES', True):
+        app.wsgi_app = CompressionMiddleware(
+            app.wsgi_app,
+            min_size=app.config.get('COMPRESSION_MIN_SIZE', 1024),
+            level=app.config.get('COMPRESSION_LEVEL', 6),
+        )
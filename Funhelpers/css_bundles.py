@@ -0,0 +1,273 @@
+"""
+Bundled, minified and content-hashed stylesheets.
+
+'styles/style.css' only '@import's the real stylesheets (base, layout,
+components, utilities, the light and dark themes, quiz), so the browser
+discovers them one round trip after the page and fetches seven small files.
+`build_css_bundles` resolves the '@import' graph of every entry stylesheet
+(CSS_ENTRIES), inlines the imports (keeping their 'layer(...)' and media
+conditions), minifies the result and writes it to
+'static/dist/<name>.<hash>.css'. 'static/dist/manifest.json' maps each entry
+to its bundle.
+
+`init_css_bundles` makes `url_for('static', filename='styles/style.css')`
+resolve to the bundle, which is sent with a one-year, immutable
+Cache-Control. In debug mode, with USE_CSS_BUNDLES off, or while no bundle
+is built, the unbundled files are served as before.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from flask import request
+
+from Funhelpers.asset_manifest import HASH_LENGTH
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+BUNDLE_DIR_NAME = 'dist'
+BUNDLE_MANIFEST_NAME = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# Stylesheets linked from the templates, relative to the static folder. The
+# light and dark themes are switched at runtime (data-theme, prefers-color-scheme),
+# so both stay in the bundle of 'styles/style.css'.
+CSS_ENTRIES = ('styles/style.css', 'styles/theme-switcher.css')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# How often (seconds) the app stats the manifest to pick up rebuilt bundles
+MANIFEST_CHECK_INTERVAL = 1.0
+
+_IMPORT_RE = re.compile(
+    r'@import\s+(?:url\(\s*)?(["\']?)([^"\')\s]+)\1\s*\)?\s*([^;]*);',
+    re.IGNORECASE,
+)
+_URL_RE = re.compile(r'url\(\s*(["\']?)([^"\')]+)\1\s*\)', re.IGNORECASE)
+_LAYER_RE = re.compile(r'^layer(?:\(\s*([^)]*?)\s*\))?\s*', re.IGNORECASE)
+_TOKEN_RE = re.compile(r'/\*.*?\*/|"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'', re.DOTALL)
+
+
+def _is_external(url):
+    return url.startswith(('data:', '#', '/')) or '://' in url
+
+
+def _rebase_urls(css, source_dir, output_dir):
+    """Rewrites relative url(...) references of a file in `source_dir` for a file in `output_dir`."""
+    def rebase(match):
+        quote, url = match.groups()
+        if _is_external(url):
+            return match.group(0)
+        path = os.path.normpath(os.path.join(source_dir, url))
+        return f'url({quote}{os.path.relpath(path, output_dir).replace(os.sep, "/")}{quote})'
+    return _URL_RE.sub(rebase, css)
+
+
+def resolve_imports(path, output_dir, _stack=()):
+    """
+    Contents of a stylesheet with its local '@import's inlined, recursively.
+
+    An import with 'layer(name)' becomes '@layer name { ... }', one with a
+    media query becomes '@media ... { ... }'. Remote imports are kept as
+    '@import' rules (and so must stay at the top of the entry stylesheet).
+
+    Args:
+        path (str): The stylesheet.
+        output_dir (str): Directory of the bundle, to rebase relative url(...)s.
+
+    Returns:
+        tuple[str, list[str]]: (CSS, paths of all the files it was built from).
+
+    Raises:
+        ValueError: On an import cycle.
+        FileNotFoundError: On an import of a missing file.
+    """
+    path = os.path.normpath(path)
+    if path in _stack:
+        raise ValueError(f"@import cycle: {' -> '.join(_stack + (path,))}")
+    with open(path, encoding='utf-8') as f:
+        css = f.read()
+    source_dir = os.path.dirname(path)
+    sources = [path]
+
+    def inline(match):
+        _, url, condition = match.groups()
+        if _is_external(url):
+            return match.group(0)
+        imported, imported_sources = resolve_imports(
+            os.path.join(source_dir, url), output_dir, _stack + (path,)
+        )
+        sources.extend(imported_sources)
+        condition = condition.strip()
+        layer = _LAYER_RE.match(condition)
+        if layer:
+            condition = condition[layer.end():].strip()
+            imported = f'@layer {layer.group(1) or ""} {{\n{imported}\n}}'
+        if condition:
+            imported = f'@media {condition} {{\n{imported}\n}}'
+        return imported
+
+    # Inlined files are rebased by their own call, so they are swapped in
+    # only after this file's url(...)s are rebased
+    inlined = []
+
+    def placeholder(match):
+        inlined.append(inline(match))
+        return f'\0{len(inlined) - 1}\0'
+
+    css = _TOKEN_RE.sub(lambda token: '' if token.group(0).startswith('/*') else token.group(0), css)
+    css = _rebase_urls(_IMPORT_RE.sub(placeholder, css), source_dir, output_dir)
+    return re.sub(r'\0(\d+)\0', lambda match: inlined[int(match.group(1))], css), sources
+
+
+def minify_css(css):
+    """
+    Removes comments and insignificant whitespace from a stylesheet.
+
+    Strings are left untouched. Whitespace is only removed next to
+    '{', '}', ';', ',' and '>' and after ':', so descendant selectors
+    ('.menu a', 'a :hover') and calc() expressions keep their meaning.
+    """
+    parts = []
+    position = 0
+    for token in _TOKEN_RE.finditer(css):
+        parts.append(_minify_chunk(css[position:token.start()]))
+        if not token.group(0).startswith('/*'):
+            parts.append(token.group(0))
+        position = token.end()
+    parts.append(_minify_chunk(css[position:]))
+    return ''.join(parts).replace(';}', '}').strip()
+
+
+def _minify_chunk(css):
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return re.sub(r':\s+', ':', css)
+
+
+def load_bundle_manifest(static_dir=STATIC_DIR):
+    """
+    Reads the manifest written by `build_css_bundles`.
+
+    Returns:
+        dict: Entry stylesheet -> bundle path, both relative to the static
+        folder, or an empty dict if the manifest is missing or unreadable.
+    """
+    try:
+        with open(os.path.join(static_dir, BUNDLE_DIR_NAME, BUNDLE_MANIFEST_NAME), encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data.get('bundles', {})
+
+
+def build_css_bundles(static_dir=STATIC_DIR, entries=CSS_ENTRIES):
+    """
+    Builds one minified, content-hashed bundle per entry stylesheet.
+
+    Bundles are written to 'static/dist/' and the manifest is replaced
+    atomically; bundles no longer in the manifest are deleted.
+
+    Args:
+        static_dir (str): The static folder.
+        entries (tuple[str]): Entry stylesheets, relative to `static_dir`.
+
+    Returns:
+        dict: Entry -> bundle path (relative to `static_dir`).
+    """
+    output_dir = os.path.join(static_dir, BUNDLE_DIR_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+    bundles = {}
+    sources = {}
+    for entry in entries:
+        css, files = resolve_imports(os.path.join(static_dir, entry), output_dir)
+        data = minify_css(css).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        name = f"{os.path.splitext(os.path.basename(entry))[0]}.{digest}.css"
+        target = os.path.join(output_dir, name)
+        if not os.path.exists(target):
+            with open(target + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(target + '.tmp', target)
+        bundles[entry] = f'{BUNDLE_DIR_NAME}/{name}'
+        sources[entry] = sorted(os.path.relpath(path, static_dir).replace(os.sep, '/') for path in set(files))
+
+    manifest_path = os.path.join(output_dir, BUNDLE_MANIFEST_NAME)
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'bundles': bundles, 'sources': sources}, f, indent=2)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    live = {os.path.basename(path) for path in bundles.values()}
+    for name in os.listdir(output_dir):
+        if name.endswith('.css') and name not in live:
+            os.remove(os.path.join(output_dir, name))
+    return bundles
+
+
+class CSSBundles:
+    """
+    The bundle manifest as the app sees it: loaded on first use and reloaded
+    when rebuilt (checked at most every MANIFEST_CHECK_INTERVAL seconds).
+    """
+
+    def __init__(self, static_dir=STATIC_DIR):
+        self.static_dir = static_dir
+        self.manifest_path = os.path.join(static_dir, BUNDLE_DIR_NAME, BUNDLE_MANIFEST_NAME)
+        self._bundles = {}
+        self._signature = None
+        self._checked = float('-inf')
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if now - self._checked < MANIFEST_CHECK_INTERVAL:
+            return
+        with self._lock:
+            if now - self._checked < MANIFEST_CHECK_INTERVAL:
+                return
+            self._checked = now
+            try:
+                st = os.stat(self.manifest_path)
+                signature = (st.st_ino, st.st_mtime_ns)
+            except FileNotFoundError:
+                signature = None
+            if signature != self._signature:
+                bundles = load_bundle_manifest(self.static_dir) if signature else {}
+                self._bundles = {
+                    entry: bundle for entry, bundle in bundles.items()
+                    if os.path.exists(os.path.join(self.static_dir, bundle))
+                }
+                self._signature = signature
+
+    def get(self, filename):
+        """The bundle of the entry stylesheet `filename`, or None."""
+        self._refresh()
+        return self._bundles.get(filename)
+
+
+def init_css_bundles(app):
+    """
+    Points `url_for('static', ...)` of the entry stylesheets at their bundles.
+
+    Does nothing in debug mode or with USE_CSS_BUNDLES off, so the unbundled
+    files (and their '@import's) are served and edits show up on reload.
+    """
+    if app.debug or not app.config.get('USE_CSS_BUNDLES', True):
+        return
+    bundles = CSSBundles(app.static_folder)
+    app.extensions['css_bundles'] = bundles
+
+    @app.url_defaults
+    def bundled_stylesheet(endpoint, values):
+        if endpoint == 'static' and values.get('filename', '').endswith('.css'):
+            values['filename'] = bundles.get(values['filename']) or values['filename']
+
+    @app.after_request
+    def cache_bundles(response):
+        filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+        if response.status_code == 200 and filename.startswith(BUNDLE_DIR_NAME + '/') and filename.endswith('.css'):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
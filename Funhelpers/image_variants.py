@@ -0,0 +1,228 @@
+"""
+Pre-generated, downscaled variants of the quiz images.
+
+Question images are drawn for a 1032px-wide stage, but are stored at whatever
+size they were exported, as PNG. `build_image_variants` writes each image at
+VARIANT_WIDTHS (never upscaled) as WebP and as a PNG fallback into
+'image-cache/<hash>/<width>.<format>', and records the variants in
+'image-cache/index.json'. Templates use `responsive_image` to emit a
+`<picture>` with `srcset` and explicit width/height.
+
+Variants are content-addressed (by the hash from the asset manifest), so
+only new or changed images are processed, the files can be cached forever,
+and variants of images that no longer exist are removed. Images are
+processed in a process pool. With QUIZ_ASSETS_SOURCE=prod the variant URLs
+point at QUIZ_ASSETS_PROD_URL, like the other quiz assets, so 'image-cache/'
+has to be published there next to 'quiz-time/'.
+"""
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urljoin
+
+from flask import current_app, has_app_context
+
+from Funhelpers.asset_manifest import (
+    ASSETS_ROOT,
+    IMAGE_EXTENSIONS,
+    PROJECT_ROOT,
+    asset_key,
+    load_manifest,
+)
+
+VARIANTS_DIR = os.path.join(PROJECT_ROOT, 'image-cache')
+VARIANTS_INDEX = os.path.join(VARIANTS_DIR, 'index.json')
+INDEX_VERSION = 1
+
+# Phone, the quiz stage at 1x, and the quiz stage at 2x
+VARIANT_WIDTHS = (480, 1032, 2064)
+VARIANT_FORMATS = ('webp', 'png')
+WEBP_QUALITY = 80
+# Rendered width of the images, for the `sizes` attribute (see .quiz-image in quiz.css)
+DISPLAY_SIZES = '(max-width: 1032px) 100vw, 1032px'
+
+# Below this many images, resizing in-process beats starting a pool
+PARALLEL_MIN_IMAGES = 4
+
+
+def variant_widths(width):
+    """Widths to generate for an image `width` pixels wide (never wider than the original)."""
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    widths.append(min(width, VARIANT_WIDTHS[-1]))
+    return widths
+
+
+def _render_variants(path, out_dir, widths):
+    """
+    Writes the WebP and PNG variants of one image.
+
+    Runs in the worker processes of `build_image_variants`.
+
+    Returns:
+        list[list[int]]: [width, height] of each variant, in `widths` order.
+    """
+    from PIL import Image
+
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = []
+    with Image.open(path) as image:
+        image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+        for width in widths:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in VARIANT_FORMATS:
+                target = os.path.join(out_dir, f'{width}.{fmt}')
+                tmp = f'{target}.tmp'
+                if fmt == 'webp':
+                    resized.save(tmp, 'WEBP', quality=WEBP_QUALITY, method=4)
+                else:
+                    resized.save(tmp, 'PNG', optimize=True)
+                os.replace(tmp, target)
+            sizes.append([width, height])
+    return sizes
+
+
+def _render_all(jobs, workers=None):
+    """Runs `_render_variants` for every (key, path, out_dir, widths) job; returns key -> sizes."""
+    if len(jobs) < PARALLEL_MIN_IMAGES:
+        return {key: _render_variants(path, out_dir, widths) for key, path, out_dir, widths in jobs}
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    keys, paths, out_dirs, widths = zip(*jobs)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(keys, pool.map(_render_variants, paths, out_dirs, widths)))
+    except (OSError, BrokenProcessPool) as e:
+        print(f"WARNING: Parallel image processing unavailable ({e}); processing serially", flush=True)
+        return {key: _render_variants(path, out_dir, widths) for key, path, out_dir, widths in jobs}
+
+
+def load_variants_index(index_path=VARIANTS_INDEX):
+    """
+    Reads the index written by `build_image_variants`.
+
+    Returns:
+        dict: Image key ('quiz-time/...') -> {'hash', 'width',
+        'height', 'variants': [[width, height], ...]}, or an empty dict.
+    """
+    try:
+        with open(index_path, encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get('version') != INDEX_VERSION:
+        return {}
+    return data.get('images', {})
+
+
+def _image_sources():
+    """(key, path, asset entry) of every image that gets variants."""
+    sources = []
+    for key, entry in load_manifest().items():
+        if key.lower().endswith(IMAGE_EXTENSIONS):
+            sources.append((f'quiz-time/{key}', os.path.join(ASSETS_ROOT, key), entry))
+    return sources
+
+
+def build_image_variants(variants_dir=VARIANTS_DIR, index_path=VARIANTS_INDEX):
+    """
+    Generates the missing image variants and rewrites the index.
+
+    Quiz-time images come from the asset manifest (build it first with
+    `build_asset_manifest`). An image is processed only if
+    one of its variant files is missing; cache directories of images that are
+    gone (or changed, hence have a new hash) are deleted.
+
+    Returns:
+        tuple[int, int]: (number of images, number processed now).
+    """
+    previous = load_variants_index(index_path)
+    images = {}
+    jobs = []
+    for key, path, entry in _image_sources():
+        if not entry.get('width'):
+            continue
+        widths = variant_widths(entry['width'])
+        out_dir = os.path.join(variants_dir, entry['hash'])
+        known = previous.get(key)
+        files = [os.path.join(out_dir, f'{w}.{fmt}') for w in widths for fmt in VARIANT_FORMATS]
+        images[key] = {'hash': entry['hash'], 'width': entry['width'], 'height': entry['height']}
+        if known and known['hash'] == entry['hash'] and all(map(os.path.exists, files)):
+            images[key]['variants'] = known['variants']
+        else:
+            jobs.append((key, path, out_dir, widths))
+
+    for key, sizes in _render_all(jobs).items():
+        images[key]['variants'] = sizes
+
+    os.makedirs(variants_dir, exist_ok=True)
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': INDEX_VERSION, 'images': images}, f, separators=(',', ':'))
+    os.replace(tmp_path, index_path)
+
+    live = {image['hash'] for image in images.values()}
+    for name in os.listdir(variants_dir):
+        if os.path.isdir(os.path.join(variants_dir, name)) and name not in live:
+            shutil.rmtree(os.path.join(variants_dir, name), ignore_errors=True)
+    return len(images), len(jobs)
+
+
+_index = {'signature': None, 'images': {}}
+
+
+def _variants_for(key):
+    try:
+        st = os.stat(VARIANTS_INDEX)
+        signature = (st.st_ino, st.st_mtime_ns)
+    except FileNotFoundError:
+        signature = None
+    if signature != _index['signature']:
+        _index['images'] = load_variants_index() if signature else {}
+        _index['signature'] = signature
+    return _index['images'].get(key)
+
+
+def variant_url(path):
+    """URL of a file under 'image-cache/': on QUIZ_ASSETS_PROD_URL when serving assets from prod."""
+    if has_app_context() and current_app.config.get('QUIZ_ASSETS_SOURCE', 'dev').lower() == 'prod':
+        prod_base = current_app.config.get('QUIZ_ASSETS_PROD_URL', '')
+        if prod_base:
+            return urljoin(prod_base, path)
+    return f'/{path}'
+
+
+def responsive_image(rel):
+    """
+    What a template needs to render an image through its variants.
+
+    Args:
+        rel (str): The image as stored in the bank ('quiz-time/...').
+
+    Returns:
+        dict | None: 'src' (PNG fallback at the stage width), 'webp_srcset',
+        'png_srcset', 'sizes', 'width' and 'height' (of the original, for the
+        aspect ratio), or None if the image has no variants.
+    """
+    key = asset_key(rel)
+    key = key and f'quiz-time/{key}'
+    image = _variants_for(key) if key else None
+    if not image or not image.get('variants'):
+        return None
+
+    def url(width, fmt):
+        return variant_url(f"image-cache/{image['hash']}/{width}.{fmt}")
+
+    widths = [w for w, _ in image['variants']]
+    fallback = max((w for w in widths if w <= VARIANT_WIDTHS[1]), default=widths[0])
+    return {
+        'src': url(fallback, 'png'),
+        'webp_srcset': ', '.join(f"{url(w, 'webp')} {w}w" for w in widths),
+        'png_srcset': ', '.join(f"{url(w, 'png')} {w}w" for w in widths),
+        'sizes': DISPLAY_SIZES,
+        'width': image['width'],
+        'height': image['height'],
+    }
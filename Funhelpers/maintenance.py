@@ -0,0 +1,264 @@
+"""
+In-process scheduler for housekeeping jobs.
+
+Expiry of anonymous quiz results and of registration tokens used to run on
+the request path (`/quiz`, `/register`). `MaintenanceScheduler` runs them on
+fixed intervals in a daemon thread instead:
+
+- Each job runs every `interval` seconds, +/- a random `jitter` fraction, so
+  jobs (and several processes) don't fire in lockstep.
+- A job never runs twice at once: a per-job thread lock, plus a non-blocking
+  `flock` on a lock file so only one process runs it when several workers
+  share the host. A run that finds the job busy is skipped. Jobs that report
+  on their own process (`process_lock=False`) skip the file lock.
+- Every run is timed into a per-job histogram (`stats()`).
+
+`init_maintenance(app)` registers the default jobs and starts the scheduler
+on the app's first request (so it runs under server.py, `flask run` and
+`python explicolivais.py` alike, but not in CLI commands or in the reloader's
+watcher process). `start()` is idempotent. `flask run-maintenance` triggers
+jobs by hand.
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+
+try:
+    import fcntl
+except ImportError:  # Windows: thread lock only
+    fcntl = None
+
+# Upper bounds (seconds) of the run-time histogram buckets; the last is +inf
+RUN_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+
+class JobStats:
+    """Run-time histogram and outcome counters of one job."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(RUN_TIME_BUCKETS) + 1)
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+
+    def observe(self, seconds):
+        self.buckets[bisect_left(RUN_TIME_BUCKETS, seconds)] += 1
+        self.runs += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def as_dict(self):
+        labels = [f"<={bound}s" for bound in RUN_TIME_BUCKETS] + [f">{RUN_TIME_BUCKETS[-1]}s"]
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'failures': self.failures,
+            'mean_seconds': self.total_seconds / self.runs if self.runs else 0.0,
+            'max_seconds': self.max_seconds,
+            'histogram': dict(zip(labels, self.buckets)),
+            'last_run': self.last_run,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
+
+
+class MaintenanceJob:
+    """One scheduled job: its callable, interval, run lock and stats."""
+
+    def __init__(self, name, func, interval, jitter, process_lock=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.process_lock = process_lock
+        self.lock = threading.Lock()
+        self.stats = JobStats()
+        self.next_run = 0.0
+
+    def schedule_next(self, now):
+        spread = self.interval * self.jitter
+        self.next_run = now + self.interval + random.uniform(-spread, spread)
+
+
+class MaintenanceScheduler:
+    """
+    Runs registered jobs on fixed intervals in a daemon thread.
+
+    Args:
+        app (Flask | None): Jobs run inside this app's context, if given.
+        lock_dir (str | None): Directory for the cross-process lock files
+            (defaults to the system temp dir).
+    """
+
+    def __init__(self, app=None, lock_dir=None):
+        self.app = app
+        self.lock_dir = lock_dir or tempfile.gettempdir()
+        self.jobs = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def add_job(self, name, func, interval, jitter=0.1, process_lock=True):
+        """
+        Registers a job.
+
+        Args:
+            name (str): Unique job name (also used by `flask run-maintenance`).
+            func (callable): Called with no arguments; its return value is kept
+                as 'last_result' (e.g. the number of rows deleted).
+            interval (float): Seconds between runs.
+            jitter (float): Random +/- fraction of `interval` added to each wait.
+            process_lock (bool): Run in one process at a time (cross-process
+                lock file). Off for jobs about the process itself, which every
+                worker runs.
+        """
+        job = MaintenanceJob(name, func, interval, jitter, process_lock)
+        # First run lands somewhere in the first interval, not at startup
+        job.next_run = time.monotonic() + random.uniform(0, interval)
+        self.jobs[name] = job
+        return job
+
+    def run_job(self, name):
+        """
+        Runs one job now, unless it is already running here or in another process.
+
+        Returns:
+            bool: True if the job ran (successfully or not), False if it was skipped.
+        """
+        job = self.jobs[name]
+        if not job.lock.acquire(blocking=False):
+            job.stats.skipped += 1
+            return False
+        try:
+            lock_file = self._acquire_process_lock(name) if job.process_lock else None
+            if lock_file is False:
+                job.stats.skipped += 1
+                return False
+            try:
+                self._timed_run(job)
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+            return True
+        finally:
+            job.lock.release()
+
+    def _acquire_process_lock(self, name):
+        """Returns the open lock file, None without fcntl, or False if another process holds it."""
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.lock_dir, f"explicolivais-maintenance-{name}.lock"), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        return lock_file
+
+    def _timed_run(self, job):
+        stats = job.stats
+        start = time.perf_counter()
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = job.func()
+            else:
+                result = job.func()
+            stats.last_result = result
+            stats.last_error = None
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = str(e)
+            print(f"WARNING: Maintenance job {job.name} failed: {e}", flush=True)
+        finally:
+            stats.observe(time.perf_counter() - start)
+            stats.last_run = time.time()
+
+    def start(self):
+        """Starts the daemon thread (no-op if it is already running)."""
+        if self.running:
+            return
+        with self._start_lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="maintenance-scheduler", daemon=True)
+            self._thread.start()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for job in list(self.jobs.values()):
+                if job.next_run <= now:
+                    self.run_job(job.name)
+                    job.schedule_next(time.monotonic())
+            next_run = min((job.next_run for job in self.jobs.values()), default=now + 60)
+            self._stop.wait(max(0.5, next_run - time.monotonic()))
+
+    def stats(self):
+        """Return {job name: stats dict} for every job."""
+        return {name: job.stats.as_dict() for name, job in self.jobs.items()}
+
+
+def init_maintenance(app):
+    """
+    Creates the app's maintenance scheduler with the default jobs.
+
+    Stored in `app.extensions['maintenance']`. Intervals come from
+    MAINTENANCE_RESULTS_INTERVAL, MAINTENANCE_TOKENS_INTERVAL,
+    MAINTENANCE_SPOOL_INTERVAL and MAINTENANCE_CACHE_STATS_INTERVAL (seconds).
+    Unless MAINTENANCE_AUTOSTART is off, the scheduler is started by the
+    first request the app serves.
+    """
+    from DBhelpers import deleteExpiredRegistrationTokens
+    from DBreadQuiz import log_question_cache_stats
+    from Funhelpers.quiz_storage import cleanup_expired_results, replay_spooled_writes
+
+    scheduler = MaintenanceScheduler(app, lock_dir=app.config.get('MAINTENANCE_LOCK_DIR'))
+    scheduler.add_job(
+        'cleanup_expired_results',
+        cleanup_expired_results,
+        interval=app.config.get('MAINTENANCE_RESULTS_INTERVAL', 300),
+    )
+    scheduler.add_job(
+        'delete_expired_registration_tokens',
+        deleteExpiredRegistrationTokens,
+        interval=app.config.get('MAINTENANCE_TOKENS_INTERVAL', 900),
+    )
+    scheduler.add_job(
+        'replay_spooled_writes',
+        replay_spooled_writes,
+        interval=app.config.get('MAINTENANCE_SPOOL_INTERVAL', 60),
+    )
+    scheduler.add_job(
+        'log_question_cache_stats',
+        log_question_cache_stats,
+        interval=app.config.get('MAINTENANCE_CACHE_STATS_INTERVAL', 3600),
+        process_lock=False,
+    )
+    app.extensions['maintenance'] = scheduler
+
+    if app.config.get('MAINTENANCE_AUTOSTART', True):
+        @app.before_request
+        def start_maintenance():
+            if not scheduler.running:
+                scheduler.start()
+
+    return scheduler
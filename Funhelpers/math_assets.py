@@ -0,0 +1,139 @@
+"""
+Self-hosted, on-demand math rendering (KaTeX).
+
+Only the quiz question and results pages show LaTeX, but index.html loaded
+KaTeX and MathJax from jsDelivr on every page. Now:
+
+- `install_math_assets` (`flask install-math-assets`) downloads the pinned
+  KaTeX release from the npm registry, checks its integrity hash and unpacks
+  the scripts, stylesheet and fonts into 'static/vendor/katex-<version>/'.
+  The directory is versioned, so its files are sent with a one-year,
+  immutable Cache-Control.
+- Templates that contain math call `{{ use_math() }}`; index.html then
+  includes 'content/math.html', which loads KaTeX and defines
+  `renderMath(element)` for the quiz player. Other pages load nothing.
+- If the files are not installed, `math_asset_url` falls back to jsDelivr.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import urllib.request
+
+from flask import g, request, url_for
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+KATEX_VERSION = '0.16.11'
+MATH_ASSETS_NAME = f'vendor/katex-{KATEX_VERSION}'
+MATH_ASSETS_DIR = os.path.join(STATIC_DIR, *MATH_ASSETS_NAME.split('/'))
+KATEX_REGISTRY_URL = f'https://registry.npmjs.org/katex/{KATEX_VERSION}'
+KATEX_CDN_URL = f'https://cdn.jsdelivr.net/npm/katex@{KATEX_VERSION}/dist'
+
+# Files of the package's dist/ folder that are served (plus fonts/)
+KATEX_FILES = ('katex.min.css', 'katex.min.js', 'contrib/auto-render.min.js')
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _check_integrity(data, integrity):
+    """Raises ValueError unless `data` matches an npm 'sha512-<base64>' integrity string."""
+    algorithm, _, expected = integrity.partition('-')
+    if algorithm not in ('sha512', 'sha384', 'sha256'):
+        raise ValueError(f"Unsupported integrity algorithm: {algorithm}")
+    actual = base64.b64encode(hashlib.new(algorithm, data).digest()).decode('ascii')
+    if actual != expected:
+        raise ValueError(f"KaTeX {KATEX_VERSION} tarball does not match its integrity hash")
+
+
+def _download_katex(timeout=30):
+    with urllib.request.urlopen(KATEX_REGISTRY_URL, timeout=timeout) as response:
+        dist = json.load(response)['dist']
+    with urllib.request.urlopen(dist['tarball'], timeout=timeout) as response:
+        data = response.read()
+    _check_integrity(data, dist['integrity'])
+    return data
+
+
+def install_math_assets(tarball=None, target=MATH_ASSETS_DIR):
+    """
+    Unpacks KaTeX's scripts, stylesheet and fonts into `target`.
+
+    Args:
+        tarball (str | None): A local copy of the npm package ('katex-<version>.tgz',
+            e.g. from `npm pack katex@<version>`), for hosts without access to
+            the registry. If None, the package is downloaded and verified.
+        target (str): Where to put the files; replaced atomically.
+
+    Returns:
+        int: Number of files installed.
+
+    Raises:
+        ValueError: If the download does not match its integrity hash, or the
+            package lacks one of KATEX_FILES.
+    """
+    if tarball is None:
+        data = _download_katex()
+    else:
+        with open(tarball, 'rb') as f:
+            data = f.read()
+
+    tmp = target + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    installed = 0
+    with tarfile.open(fileobj=io.BytesIO(data), mode='r:gz') as archive:
+        for member in archive.getmembers():
+            name = member.name.split('/', 1)[-1]
+            if not name.startswith('dist/') or not member.isfile():
+                continue
+            rel = name[len('dist/'):]
+            if rel not in KATEX_FILES and not (rel.startswith('fonts/') and '/' not in rel[len('fonts/'):]):
+                continue
+            path = os.path.join(tmp, *rel.split('/'))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with archive.extractfile(member) as src, open(path, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            installed += 1
+
+    missing = [rel for rel in KATEX_FILES if not os.path.exists(os.path.join(tmp, *rel.split('/')))]
+    if missing:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise ValueError(f"KaTeX package is missing {', '.join(missing)}")
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return installed
+
+
+def math_assets_installed(target=MATH_ASSETS_DIR):
+    """True if every file in KATEX_FILES is in `target`."""
+    return all(os.path.exists(os.path.join(target, *rel.split('/'))) for rel in KATEX_FILES)
+
+
+def math_asset_url(rel):
+    """URL of a KaTeX file (see KATEX_FILES): self-hosted if installed, jsDelivr otherwise."""
+    if math_assets_installed():
+        return url_for('static', filename=f'{MATH_ASSETS_NAME}/{rel}')
+    return f'{KATEX_CDN_URL}/{rel}'
+
+
+def use_math():
+    """Jinja global: marks the page as containing math, so index.html loads KaTeX."""
+    g.uses_math = True
+    return ''
+
+
+def init_math(app):
+    """Registers the `use_math` and `math_asset_url` template globals and the cache headers."""
+    app.add_template_global(use_math)
+    app.add_template_global(math_asset_url)
+    if not math_assets_installed():
+        print("WARNING: KaTeX is not installed (flask install-math-assets); math pages load it from jsDelivr", flush=True)
+
+    @app.after_request
+    def cache_math_assets(response):
+        filename = (request.view_args or {}).get('filename', '') if request.endpoint == 'static' else ''
+        if response.status_code == 200 and filename.startswith(MATH_ASSETS_NAME + '/'):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        return response
@@ -0,0 +1,129 @@
+"""
+Tokenizer for the comma-separated option fields of the quiz bank.
+
+The 'possible_answers' column holds a list of options separated by top-level
+commas. Commas inside single quotes or inside `{ }` groups (LaTeX such as
+`\\frac{1,2}`) belong to the option and must not split it.
+
+Instead of walking the field one character at a time, each option is matched
+whole by a precompiled regex (quoted strings, flat `{ }` groups and plain runs),
+so the Python loop only runs once per option. Fields the regex cannot take in
+one piece (nested or unbalanced braces, stray quotes) fall back to a scan that
+jumps between delimiter positions. Fields without any quote or brace take a
+plain `str.split` path.
+"""
+import re
+
+_QUOTED_OPTION = re.compile(r"(?:'[^']*'|\{[^{}']*\}|[^,'{}]+)*")
+_BRACE_OPTION = re.compile(r"(?:\{[^{}]*\}|[^,{}]+)*")
+_QUOTED_DELIMITERS = re.compile(r"[',{}]")
+_BRACE_DELIMITERS = re.compile(r"[,{}]")
+
+
+def split_top_level_commas_with_quotes(s: str):
+    """
+    Splits a string by top-level commas, ignoring commas within curly braces and single quotes.
+
+    Args:
+        s (str): The string to be split.
+
+    Returns:
+        list[str]: The stripped parts. A trailing comma does not produce an empty
+        final part, and an empty string yields an empty list.
+    """
+    return _split_top_level(s, _QUOTED_OPTION, _QUOTED_DELIMITERS, "'" in s or '{' in s or '}' in s)
+
+
+def split_top_level_commas(s: str):
+    """
+    Splits a string by top-level commas, ignoring commas within curly braces.
+
+    Args:
+        s (str): The string to be split.
+
+    Returns:
+        list[str]: The stripped parts, with the same edge cases as
+        `split_top_level_commas_with_quotes`.
+    """
+    return _split_top_level(s, _BRACE_OPTION, _BRACE_DELIMITERS, '{' in s or '}' in s)
+
+
+def _split_top_level(s, option, delimiters, needs_scan):
+    if not s:
+        return []
+
+    if not needs_scan:
+        parts = [part.strip() for part in s.split(',')]
+        if s[-1] == ',':
+            parts.pop()
+        return parts
+
+    parts = _match_options(s, option)
+    if parts is None:
+        parts = _scan_delimiters(s, delimiters)
+    return parts
+
+
+def _match_options(s, option):
+    """Split `s` option by option; return None if the regex cannot cover it."""
+    parts = []
+    match = option.match
+    pos = 0
+    n = len(s)
+    while True:
+        end = match(s, pos).end()
+        parts.append(s[pos:end].strip())
+        if end == n:
+            return parts
+        if s[end] != ',':
+            return None
+        pos = end + 1
+        if pos == n:
+            return parts
+
+
+def _scan_delimiters(s, delimiters):
+    """Split `s` by visiting only quote, brace and comma positions."""
+    parts = []
+    start = 0
+    depth = 0          # { } nesting
+    in_quote = False   # single quotes '
+    for match in delimiters.finditer(s):
+        ch = match.group()
+        if ch == "'":
+            in_quote = not in_quote
+        elif in_quote:
+            continue
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            if depth:
+                depth -= 1
+        elif depth == 0:
+            pos = match.start()
+            parts.append(s[start:pos].strip())
+            start = pos + 1
+    if start < len(s):
+        parts.append(s[start:].strip())
+    return parts
+
+
+def parse_possible_answers(field: str):
+    """
+    Parses a string of comma-separated possible answers for a quiz question.
+
+    Splits the field with `split_top_level_commas_with_quotes`, then strips
+    whitespace and any surrounding single quotes from each answer.
+
+    Args:
+        field (str): The raw string containing the possible answers.
+
+    Returns:
+        list[str]: A list of cleaned answer strings.
+    """
+    cleaned = []
+    for x in split_top_level_commas_with_quotes(field):
+        if len(x) >= 2 and x[0] == "'" and x[-1] == "'":
+            x = x[1:-1].strip()
+        cleaned.append(x)
+    return cleaned
@@ -6,6 +6,15 @@ Works with the new dictionary-based question structure
 from typing import Dict, List, Union
 import json
 
+from Funhelpers.quiz_scoring import score_quiz, to_scoring
+
+
+def _score(answers, questions):
+    """Run the shared scoring kernel over question dicts with a 'scoring' list."""
+    answers = {str(k): v for k, v in answers.items()}
+    return score_quiz([to_scoring(q.get('scoring', [])) for q in questions], answers)
+
+
 def score_points_total(
     answers: Dict[Union[str, int], List],
     questions: List[Dict]
@@ -20,42 +29,13 @@ def score_points_total(
     Returns:
         dict with total_points and per_question_points
     """
-    total_points = 0
-    per_question = {}
-    
-    for i, question in enumerate(questions):
-        question_idx = str(i)
-        user_answer = answers.get(question_idx, [])
-        
-        # Get scoring for this question
-        scoring = question.get('scoring', [])
-        options = question.get('options', [])
-        
-        # Skip if no answer or only "Não sei" (index 0)
-        is_skipped = (
-            not user_answer or 
-            (len(user_answer) == 1 and user_answer == '0')
-        )
-        
-        if is_skipped:
-            per_question[question_idx] = 0
-            continue
-        
-        # Calculate points for selected options
-        question_points = 0
-        for answer_idx in user_answer:
-            try:
-                idx = int(answer_idx)
-                if 0 <= idx < len(scoring):
-                    question_points += float(scoring[idx])
-            except (ValueError, IndexError):
-                continue
-        
-        per_question[question_idx] = question_points
-        total_points += question_points
+    scored = _score(answers, questions)
+    per_question = {
+        str(i): points for i, (points, _) in enumerate(scored['outcomes'])
+    }
     
     return {
-        "total_points": total_points,
+        "total_points": scored['total_points'],
         "per_question_points": per_question
     }
 
@@ -78,49 +58,13 @@ def score_counts(
     Returns:
         dict with total, correct, wrong, skip counts
     """
-    correct = 0
-    wrong = 0
-    skip = 0
-    total = len(questions)
-    
-    for i, question in enumerate(questions):
-        question_idx = str(i)
-        user_answer = answers.get(question_idx, [])
-        
-        scoring = question.get('scoring', [])
-        options = question.get('options', [])
-        
-        # Check if skipped
-        is_skipped = (
-            not user_answer or 
-            (len(user_answer) == 1 and user_answer == '0')
-        )
-        
-        if is_skipped:
-            skip += 1
-            continue
-        
-        # Calculate points
-        question_points = 0
-        for answer_idx in user_answer:
-            try:
-                idx = int(answer_idx)
-                if 0 <= idx < len(scoring):
-                    question_points += float(scoring[idx])
-            except (ValueError, IndexError):
-                continue
-        
-        # Count as correct or wrong
-        if question_points > 0:
-            correct += 1
-        else:
-            wrong += 1
+    scored = _score(answers, questions)
     
     return {
-        "total": total,
-        "correct": correct,
-        "wrong": wrong,
-        "skip": skip
+        "total": scored['total_questions'],
+        "correct": scored['n_correct'],
+        "wrong": scored['n_wrong'],
+        "skip": scored['n_skip']
     }
 
 def format_score_summary(score_result: Dict) -> Dict:
@@ -5,61 +5,30 @@ import json
 import random
 import os
 
-def split_top_level_commas_with_quotes(s: str):
-    parts = []
-    buf = []
-    depth = 0          # { } nesting
-    in_quote = False   # single quotes '
-    i = 0
-    while i < len(s):
-        ch = s[i]
-        if ch == "'" and not in_quote:
-            in_quote = True
-            buf.append(ch)
-        elif ch == "'" and in_quote:
-            in_quote = False
-            buf.append(ch)
-        elif ch == '{' and not in_quote:
-            depth += 1
-            buf.append(ch)
-        elif ch == '}' and not in_quote:
-            depth = max(0, depth - 1)
-            buf.append(ch)
-        elif ch == ',' and not in_quote and depth == 0:
-            parts.append(''.join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-        i += 1
-    if buf:
-        parts.append(''.join(buf).strip())
-    return parts
-
-def parse_possible_answers(field: str):
-    items = split_top_level_commas_with_quotes(field)
-    # strip outer single quotes if present
-    cleaned = []
-    for x in items:
-        x = x.strip()
-        if len(x) >= 2 and x[0] == "'" and x[-1] == "'":
-            x = x[1:-1]
-        cleaned.append(x.strip())
-    return cleaned
+from Funhelpers.answer_codec import decode_answers
+from Funhelpers.asset_manifest import asset_key, fingerprinted_path
+from Funhelpers.image_variants import responsive_image
+from Funhelpers.option_tokenizer import parse_possible_answers
+from Funhelpers.quiz_scoring import ScoringTable, max_points_for, score_quiz, score_quizzes, to_scoring
 
 def make_url_dev(rel: str) -> str:
-    """Development URL - serve from local quiz-time folder"""
+    """Development URL - serve from local quiz-time folder (fingerprinted if in the asset manifest)"""
     if not rel:
         return ""
+    if asset_key(rel) is None and '://' in rel:
+        return rel
     # url = f"/quiz-time/{rel}"
-    url = f"/{rel}"
+    url = f"/{fingerprinted_path(rel)}"
     return url
 
 def make_url_prod(rel: str) -> str:
-    """Production URL - serve from remote CDN/web server"""
+    """Production URL - serve from remote CDN/web server (fingerprinted if in the asset manifest)"""
     prod_base = current_app.config.get('QUIZ_ASSETS_PROD_URL', '')
     if not prod_base:
         return make_url_dev(rel)
-    return urljoin(prod_base, rel.lstrip('/'))
+    if asset_key(rel) is None and '://' in rel:
+        return rel
+    return urljoin(prod_base, fingerprinted_path(rel))
 
 def make_url(rel: str) -> str:
     """Environment-aware URL builder"""
@@ -68,22 +37,205 @@ def make_url(rel: str) -> str:
     source = current_app.config.get('QUIZ_ASSETS_SOURCE', 'dev').lower()
     return make_url_prod(rel) if source == 'prod' else make_url_dev(rel)
 
-from DBhelpers import getQuestionIDsForYear, getQuestionFromQid
+from DBreadQuiz import QuestionCache, getQuestionIDsForYear
 
-def getListOfQuestionIDs(year=5):
+
+def _row_field(row, key, default=None):
+    """Read `key` from a sqlite3.Row or dict, returning `default` if absent."""
+    try:
+        return row[key]
+    except (KeyError, IndexError):
+        return default
+
+
+# Notes ending in one of these are shown as an image (see quiz_question.html)
+NOTE_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+
+
+class CompiledQuestion:
     """
-    Get list of question IDs only - keeps session cookie tiny.
-    Wrapper around DBhelpers.getQuestionIDsForYear()
+    Immutable, pre-parsed view of one question from the quiz bank.
+
+    Built once per question (and cached by `compiled_question_cache`) so the
+    quiz routes and `calculate_score` never re-split option strings, re-parse
+    scoring or re-apply the LaTeX unescape on each request. Attributes can also
+    be read dict-style (`q['options']`, `q.get('note')`) for older callers.
     """
-    return getQuestionIDsForYear(year)
 
+    __slots__ = (
+        'db_id',
+        'uuid',
+        'ano',
+        'nome_tema',
+        'aula_title',
+        'num_aula',
+        'question_path',
+        'image_url',
+        'note',
+        'title',
+        'is_multiple_choice',
+        'type_of_answer',
+        'options',
+        'scoring',
+        'max_points',
+        'type_of_problem',
+        'question_number',
+        'composed_instruction',
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Compiles a fully joined question record.
+
+        Rows from a compiled bank carry the options and scoring already parsed
+        ('options_json', 'scoring_json'); those are used as they are.
+
+        Args:
+            row (sqlite3.Row | dict): A row from `getQuestionsFromQids`.
+
+        Returns:
+            CompiledQuestion: The parsed question.
+        """
+        formatting = _row_field(row, 'formatting')
+        options_json = _row_field(row, 'options_json')
+        if options_json is not None:
+            # Compiled bank: parsed and unescaped by compile_quiz_bank
+            options = json.loads(options_json)
+        else:
+            options_str = _row_field(row, 'possible_answers')
+            options = [s.strip() for s in parse_possible_answers(options_str)] if options_str else []
+            # Unescape double backslashes for LaTeX
+            if formatting == 'latex':
+                options = [opt.replace('\\\\', '\\') for opt in options]
+
+        scoring_json = _row_field(row, 'scoring_json')
+        scoring = to_scoring(json.loads(scoring_json) if scoring_json is not None else _row_field(row, 'scoring_system'))
+
+        composed_instruction = None
+        if _row_field(row, 'type_of_problem') == 'composed':
+            composed_instruction = f"Responder apenas à {_row_field(row, 'question_number')}ª pergunta"
+            if _row_field(row, 'titulo'):
+                composed_instruction += _row_field(row, 'titulo')
+
+        ano = _row_field(row, 'ano')
+        nome_tema = _row_field(row, 'nome_tema')
+        aula_title = _row_field(row, 'aula_title')
+        num_aula = _row_field(row, 'num_aula')
+        uuid = _row_field(row, 'uuid')
 
-def getQuestionFromRowID(qid):
+        return cls(
+            db_id=_row_field(row, 'rowid'),
+            uuid=uuid,
+            ano=ano,
+            nome_tema=nome_tema,
+            aula_title=aula_title,
+            num_aula=num_aula,
+            question_path=f"{ano}/{nome_tema}/{aula_title}/{num_aula}/{uuid}",
+            image_url=_row_field(row, 'imagem') or '',
+            note=_row_field(row, 'nota'),
+            title=_row_field(row, 'titulo'),
+            is_multiple_choice=bool(_row_field(row, 'is_multiple_choice')),
+            type_of_answer=formatting,
+            options=tuple(options),
+            scoring=scoring,
+            max_points=max_points_for(scoring),
+            type_of_problem=_row_field(row, 'type_of_problem'),
+            question_number=_row_field(row, 'question_number'),
+            composed_instruction=composed_instruction,
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledQuestion is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledQuestion is immutable")
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def as_dict(self):
+        """
+        Return the question as a plain, JSON-serializable dict.
+
+        Besides every attribute, it has the keys of the question dicts that
+        `calculate_score` built before questions were compiled ('img_url',
+        'options' and 'scoring' as lists of strings), which stored quiz
+        histories and `DBhelpers.save_quiz_history` expect.
+        """
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data['options'] = list(self.options)
+        data['scoring'] = ['%g' % score for score in self.scoring]
+        data['img_url'] = self.image_url
+        return data
+
+    def as_client_dict(self):
+        """
+        Return what the quiz player needs to render the question, without
+        the scoring ('scoring', 'max_points'), so it can be sent to the browser
+        before the quiz is finished. Image URLs are fingerprinted (`make_url`), and
+        'image' holds the srcset/dimensions of the pre-generated variants, if any.
+        """
+        note = str(self.note) if self.note else ''
+        note_is_image = note.endswith(NOTE_IMAGE_EXTENSIONS)
+        return {
+            'id': self.db_id,
+            'ano': self.ano,
+            'nome_tema': self.nome_tema,
+            'aula_title': self.aula_title,
+            'num_aula': self.num_aula,
+            'image_url': make_url(self.image_url),
+            'image': responsive_image(self.image_url),
+            'note': make_url(note) if note_is_image else note,
+            'note_is_image': note_is_image,
+            'note_is_html': '<a ' in note and '</a>' in note,
+            'is_multiple_choice': bool(self.is_multiple_choice),
+            'type_of_answer': self.type_of_answer,
+            'options': list(self.options),
+            'composed_instruction': self.composed_instruction,
+        }
+
+    def __repr__(self):
+        return f"CompiledQuestion(db_id={self.db_id!r}, uuid={self.uuid!r})"
+
+
+compiled_question_cache = QuestionCache(name="compiled_questions", build=CompiledQuestion.from_row)
+
+
+def get_compiled_question(qid):
     """
-    Fetch a single full question by ID.
-    Wrapper around DBhelpers.getQuestionFromQid()
+    Fetch a single compiled question by ID, through the compiled-question cache.
+
+    Returns:
+        CompiledQuestion or None if the ID is not in the bank.
     """
-    return getQuestionFromQid(qid)
+    return compiled_question_cache.get(qid)
+
+
+def get_compiled_questions(qids):
+    """
+    Fetch compiled questions for a whole quiz, in quiz order.
+
+    Returns:
+        (questions, missing_qids) as in `DBreadQuiz.getQuestionsFromQids`.
+    """
+    return compiled_question_cache.get_many(qids)
+
+def getListOfQuestionIDs(year=5):
+    """
+    Get list of question IDs only - keeps session cookie tiny.
+    Wrapper around DBreadQuiz.getQuestionIDsForYear()
+    """
+    return getQuestionIDsForYear(year)
 
 
 def calculate_score(questions, user_answers):
@@ -91,128 +243,112 @@ def calculate_score(questions, user_answers):
     Calculate quiz results
     Returns dictionary with results summary
     
-    Scoring logic:
+    Scoring logic (see Funhelpers.quiz_scoring):
     - "Não sei" (index 0, score 0) = skipped question (no points, doesn't count as wrong)
     - Any other answer = correct (positive score) or wrong (negative score)
     
     Args:
-        questions: list of sqlite3.Row objects from getQuestionFromQid()
+        questions: list of CompiledQuestion objects from get_compiled_questions()
+                   (raw sqlite3.Row/dict records are compiled on the fly)
         user_answers: dict like {'0': ['1'], '1': ['2'], ...} (index-based)
-    """
-    total_questions = len(questions)
-    n_correct = 0
-    n_wrong = 0
-    n_skip = 0
-    total_points = 0
-    max_possible_points = 0
-    question_results = []
-    
-    for i, question in enumerate(questions):
-        question_idx = str(i)
-        user_answer = user_answers.get(question_idx, [])
-        
-        # Parse scoring and options from sqlite3.Row or dict
-        if isinstance(question, dict):
-            scoring_str = question.get('scoring_system', '')
-            options_str = question.get('possible_answers', '')
-        else:
-            # sqlite3.Row object
-            scoring_str = question['scoring_system']
-            options_str = question['possible_answers']
-        
-
-        
-        # Parse CSV fields
-        scoring = [s.strip() for s in scoring_str.split(',')] if scoring_str else []
-        options = [s.strip() for s in options_str.split(',')] if options_str else []
-        options = [s.strip() for s in parse_possible_answers(question['possible_answers'])] if question['possible_answers'] else []
-
-
-        # print("scoring_system",len(scoring),scoring)
-        # print("possible_answers",len(options),options)
-
-
-        # Calculate max possible points for this question
-        try:
-            max_points = sum([float(score) for score in scoring if float(score) > 0])
-        except ValueError:
-            max_points = 0
-        max_possible_points += max_points
-        
-        # Determine if answer was given
-        is_skipped = (
-            not user_answer or
-            (len(user_answer) == 1 and user_answer[0] == '0')
-        )
-        
-        if is_skipped:
-            n_skip += 1
-            question_points = 0
-            result_type = 'skipped'
-        else:
-            question_points = 0
-            for answer_idx in user_answer:
-                try:
-                    idx = int(answer_idx)
-                    if 0 <= idx < len(scoring):
-                        question_points += float(scoring[idx])
-                except (ValueError, IndexError):
-                    continue
-            
-            if question_points > 0:
-                n_correct += 1
-                result_type = 'correct'
-            else:
-                n_wrong += 1
-                result_type = 'wrong'
-        
-        total_points += question_points
-        
-
-        # print("--------------------",question)
 
+    Each entry of 'question_results' holds the question as a plain dict
+    (`CompiledQuestion.as_dict`), so the results can be stored as JSON
+    (`save_quiz_history`); templates render from the question objects.
+    """
+    questions = [
+        q if isinstance(q, CompiledQuestion) else CompiledQuestion.from_row(q)
+        for q in questions
+    ]
+    scored = score_quiz([q.scoring for q in questions], user_answers)
 
-        composed_instruction = None
-        if question['type_of_problem'] == 'composed':
-            composed_instruction = f"Responder apenas à {question['question_number']}ª pergunta"
-            if question['titulo']:
-                composed_instruction += question['titulo']
-
-
-        # Build question dict for results display
-        question_dict = {
-            'db_id': question['rowid'],
-            'uuid': question['uuid'],
-            'question_path': f"{question['ano']}/{question['nome_tema']}/{question['aula_title']}",
-            # 'title': question['titulo'],
-            'note': question['nota'],
-            'is_multiple_choice': bool(question['is_multiple_choice']),
-            'type_of_answer': question['formatting'],
-            'options': options,
-            'scoring': scoring,
-            'img_url': question['imagem'],
-            'type_of_problem': question['type_of_problem'],
-            'question_number': question['question_number'],
-            'composed_instruction': composed_instruction
-        }
-        
+    question_results = []
+    for i, (question, (points, result_type)) in enumerate(zip(questions, scored['outcomes'])):
         question_results.append({
-            'question': question_dict,
-            'user_answer': user_answer,
-            'points': question_points,
+            'question': question.as_dict(),
+            'user_answer': user_answers.get(str(i), []),
+            'points': points,
             'result_type': result_type
         })
     
-    # Calculate percentage
-    percentage = (total_points / max_possible_points * 100) if max_possible_points > 0 else 0
-    
     return {
-        'total_points': round(total_points, 1),
-        'percentage': round(percentage, 1),
-        'n_correct': n_correct,
-        'n_wrong': n_wrong,
-        'n_skip': n_skip,
-        'total_questions': total_questions,
-        'max_possible_points': max_possible_points,
+        'total_points': round(scored['total_points'], 1),
+        'percentage': round(scored['percentage'], 1),
+        'n_correct': scored['n_correct'],
+        'n_wrong': scored['n_wrong'],
+        'n_skip': scored['n_skip'],
+        'total_questions': scored['total_questions'],
+        'max_possible_points': scored['max_possible_points'],
         'question_results': question_results
     }
+
+
+def rescore_quiz_histories(histories):
+    """
+    Re-score stored quizzes in bulk against the current question bank.
+
+    Meant for maintenance after a `scoring_system` correction: every question
+    referenced by the histories is fetched once, packed into a ScoringTable,
+    and all quizzes are scored together with `score_quizzes`.
+
+    Args:
+        histories: list of stored quiz records (e.g. from get_quiz_history_for_user),
+                   each with 'q_uuid' and 'answers' ({rowid: [options]}, as a dict
+                   or in any form `decode_answers` reads).
+
+    Returns:
+        list of dicts (same order as `histories`) with q_uuid, total_points,
+        percentage, n_correct, n_wrong, n_skip, total_questions and
+        max_possible_points, rounded like calculate_score.
+    """
+    quizzes = []
+    for history in histories:
+        quizzes.append(decode_answers(history.get('answers')))
+
+    qids = sorted({int(qid) for answers in quizzes for qid in answers})
+    questions, _ = get_compiled_questions(qids)
+    scored = score_quizzes(quizzes, ScoringTable.from_questions(questions))
+
+    return [
+        {
+            'q_uuid': history.get('q_uuid'),
+            'total_points': round(float(scored['total_points'][i]), 1),
+            'percentage': round(float(scored['percentage'][i]), 1),
+            'n_correct': int(scored['n_correct'][i]),
+            'n_wrong': int(scored['n_wrong'][i]),
+            'n_skip': int(scored['n_skip'][i]),
+            'total_questions': int(scored['total_questions'][i]),
+            'max_possible_points': float(scored['max_possible_points'][i]),
+        }
+        for i, history in enumerate(histories)
+    ]
+
+
+def rescore_user_histories(emails, load_history):
+    """
+    Re-score the stored quizzes of many users in a single `rescore_quiz_histories` batch.
+
+    Args:
+        emails: iterable of user emails.
+        load_history: callable returning a user's stored quiz records
+                      (`DBhelpers.get_quiz_history_for_user`).
+
+    Returns:
+        list of dicts, one per stored quiz: email, stored_percentage (the
+        stored 'score_perc', or None) and the fields of `rescore_quiz_histories`.
+    """
+    owners = []
+    histories = []
+    for email in emails:
+        records = load_history(email)
+        for record in records if isinstance(records, list) else []:
+            if isinstance(record, dict):
+                owners.append(email)
+                histories.append(record)
+
+    rescored = rescore_quiz_histories(histories) if histories else []
+    return [
+        {'email': email, 'stored_percentage': history.get('score_perc'), **result}
+        for email, history, result in zip(owners, histories, rescored)
+    ]
+
@@ -0,0 +1,307 @@
+"""
+Storage backends for anonymous quiz results.
+
+`Funhelpers.quiz_storage` keeps the public API (`save_quiz_result`,
+`get_quiz_result`, `list_all_quiz_results`, ...) and delegates to one of the
+stores below, selected with the QUIZ_RESULTS_BACKEND setting (config.py).
+
+- `SQLiteResultStore` ("sqlite", default): one row per quiz in
+  `quiz_results/quiz_results.db` (WAL mode). `quiz_uuid` is the primary key and
+  `timestamp` is indexed, so lookups, claims and expiry touch only the rows
+  involved instead of scanning the whole history of anonymous traffic.
+
+- `SegmentLogResultStore` ("segments"): results are appended to hourly
+  segment files; expiry deletes whole segment files and lookups go through an
+  in-memory UUID -> (segment, offset) map rebuilt from the live segments at
+  startup. Nothing is ever rewritten. The map is per process, so this store
+  suits the single-process Waitress deployment.
+
+Every store implements `add`, `get`, `delete`, `list_live` and `delete_expired`.
+Timestamps are stored as 'YYYY-MM-DD HH:MM:SS' strings, which sort
+chronologically.
+"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class SQLiteResultStore:
+    """
+    Anonymous results in a local SQLite file in WAL mode.
+
+    WAL lets the Waitress threads read results while another thread writes.
+    Each thread keeps its own connection.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_results ("
+            " quiz_uuid TEXT PRIMARY KEY,"
+            " timestamp TEXT NOT NULL,"
+            " answers TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_timestamp ON quiz_results (timestamp)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, quiz_uuid, timestamp, answers):
+        """Store one result; `answers` is the serialized answers string."""
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO quiz_results (quiz_uuid, timestamp, answers) VALUES (?, ?, ?)",
+            (quiz_uuid, timestamp, answers),
+        )
+        conn.commit()
+
+    def add_many(self, rows):
+        """Store (quiz_uuid, timestamp, answers) rows in one transaction."""
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO quiz_results (quiz_uuid, timestamp, answers) VALUES (?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+
+    def get(self, quiz_uuid, newer_than):
+        """Return (quiz_uuid, timestamp, answers) if stored after `newer_than`, else None."""
+        return self._connection().execute(
+            "SELECT quiz_uuid, timestamp, answers FROM quiz_results WHERE quiz_uuid = ? AND timestamp > ?",
+            (quiz_uuid, newer_than),
+        ).fetchone()
+
+    def delete(self, quiz_uuid):
+        """Delete one result. Returns True if it existed."""
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM quiz_results WHERE quiz_uuid = ?", (quiz_uuid,)).rowcount
+        conn.commit()
+        return deleted > 0
+
+    def list_live(self, newer_than):
+        """Return (quiz_uuid, timestamp) for every result stored after `newer_than`."""
+        return self._connection().execute(
+            "SELECT quiz_uuid, timestamp FROM quiz_results WHERE timestamp > ? ORDER BY timestamp",
+            (newer_than,),
+        ).fetchall()
+
+    def delete_expired(self, older_than):
+        """Delete results stored at or before `older_than`. Returns the number deleted."""
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM quiz_results WHERE timestamp <= ?", (older_than,)).rowcount
+        conn.commit()
+        return deleted
+
+
+class SegmentLogResultStore:
+    """
+    Anonymous results in hourly append-only segment files.
+
+    Each segment ('YYYY-MM-DD_HH.log') holds one JSON line per result saved in
+    that hour, plus tombstone lines for results deleted by a claim. A segment is
+    removed as a whole once its newest possible entry has expired, so expiry
+    costs one unlink per hour of traffic and never rewrites anything.
+    """
+
+    SEGMENT_SUFFIX = '.log'
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}        # quiz_uuid -> (segment, offset, timestamp)
+        self._segments = {}     # segment -> set of quiz_uuids stored in it
+        self._writer = None     # (segment, file) of the segment being appended to
+        self._load()
+
+    @staticmethod
+    def _segment_for(timestamp):
+        # 'YYYY-MM-DD HH:MM:SS' -> 'YYYY-MM-DD_HH'
+        return timestamp[:10] + '_' + timestamp[11:13]
+
+    @staticmethod
+    def _segment_end(segment):
+        """Timestamp string of the first second after `segment`'s hour."""
+        start = datetime.strptime(segment, '%Y-%m-%d_%H')
+        return (start + timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+
+    def _path(self, segment):
+        return os.path.join(self.directory, segment + self.SEGMENT_SUFFIX)
+
+    def _load(self):
+        """Rebuild the in-memory map from the segment files on disk."""
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(self.SEGMENT_SUFFIX):
+                continue
+            segment = name[:-len(self.SEGMENT_SUFFIX)]
+            uuids = self._segments.setdefault(segment, set())
+            with open(self._path(segment), 'rb') as f:
+                offset = 0
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-append
+                        print(f"WARNING: Skipping unreadable record in {name} at {offset}", flush=True)
+                        offset += len(line)
+                        continue
+                    quiz_uuid = record['u']
+                    self._forget(quiz_uuid)
+                    if not record.get('deleted'):
+                        self._index[quiz_uuid] = (segment, offset, record['t'])
+                        uuids.add(quiz_uuid)
+                    offset += len(line)
+
+    def _forget(self, quiz_uuid):
+        entry = self._index.pop(quiz_uuid, None)
+        if entry is not None:
+            self._segments.get(entry[0], set()).discard(quiz_uuid)
+        return entry is not None
+
+    def _append(self, segment, record):
+        """Append one JSON line to `segment`; returns its offset. Caller holds the lock."""
+        if self._writer is None or self._writer[0] != segment:
+            if self._writer is not None:
+                self._writer[1].close()
+            self._writer = (segment, open(self._path(segment), 'ab'))
+            self._segments.setdefault(segment, set())
+            self._end_torn_line(self._writer[1])
+        f = self._writer[1]
+        # Every append is flushed, so the file size is where this line starts
+        offset = os.fstat(f.fileno()).st_size
+        f.write(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n')
+        f.flush()
+        return offset
+
+    @staticmethod
+    def _end_torn_line(f):
+        """Terminate a torn last line (crash mid-append), so the next record starts on its own line."""
+        size = os.fstat(f.fileno()).st_size
+        if size:
+            with open(f.name, 'rb') as tail:
+                tail.seek(size - 1)
+                if tail.read(1) != b'\n':
+                    f.write(b'\n')
+                    f.flush()
+
+    def add(self, quiz_uuid, timestamp, answers):
+        """Store one result; `answers` is the serialized answers string."""
+        self.add_many([(quiz_uuid, timestamp, answers)])
+
+    def add_many(self, rows):
+        """Store (quiz_uuid, timestamp, answers) rows."""
+        with self._lock:
+            for quiz_uuid, timestamp, answers in rows:
+                segment = self._segment_for(timestamp)
+                offset = self._append(segment, {'u': quiz_uuid, 't': timestamp, 'a': answers})
+                self._forget(quiz_uuid)
+                self._index[quiz_uuid] = (segment, offset, timestamp)
+                self._segments[segment].add(quiz_uuid)
+
+    def get(self, quiz_uuid, newer_than):
+        """Return (quiz_uuid, timestamp, answers) if stored after `newer_than`, else None."""
+        entry = self._index.get(quiz_uuid)
+        if entry is None or entry[2] <= newer_than:
+            return None
+        segment, offset, timestamp = entry
+        try:
+            with open(self._path(segment), 'rb') as f:
+                f.seek(offset)
+                record = json.loads(f.readline())
+        except (OSError, ValueError):
+            # Segment dropped by a concurrent expiry
+            return None
+        return quiz_uuid, timestamp, record['a']
+
+    def delete(self, quiz_uuid):
+        """Delete one result (by appending a tombstone). Returns True if it existed."""
+        with self._lock:
+            entry = self._index.get(quiz_uuid)
+            if entry is None:
+                return False
+            # The tombstone goes in the result's own segment so it expires with it
+            # and a restart never sees the result without its tombstone.
+            self._append(entry[0], {'u': quiz_uuid, 'deleted': True})
+            return self._forget(quiz_uuid)
+
+    def list_live(self, newer_than):
+        """Return (quiz_uuid, timestamp) for every result stored after `newer_than`."""
+        live = [(quiz_uuid, entry[2]) for quiz_uuid, entry in list(self._index.items()) if entry[2] > newer_than]
+        return sorted(live, key=lambda row: row[1])
+
+    def delete_expired(self, older_than):
+        """
+        Drop every segment whose whole hour is at or before `older_than`.
+
+        Results in the still-live oldest segment that are already past the TTL
+        are filtered out on read and go away with their segment.
+
+        Returns:
+            int: Number of results dropped.
+        """
+        dropped = 0
+        with self._lock:
+            for segment in sorted(self._segments):
+                if self._segment_end(segment) > older_than:
+                    break
+                if self._writer is not None and self._writer[0] == segment:
+                    self._writer[1].close()
+                    self._writer = None
+                for quiz_uuid in self._segments.pop(segment):
+                    self._index.pop(quiz_uuid, None)
+                    dropped += 1
+                try:
+                    os.remove(self._path(segment))
+                except FileNotFoundError:
+                    pass
+        return dropped
+
+
+def migrate_csv_results(csv_path, store):
+    """
+    One-shot import of the legacy `quiz_results.csv` into `store`.
+
+    The CSV is renamed to '<name>.migrated' afterwards so the import never runs
+    twice; rows with a malformed answers field are skipped with a warning.
+
+    Args:
+        csv_path (str): Path of the legacy CSV file.
+        store: The store to import into (must implement `add_many`).
+
+    Returns:
+        int: Number of results imported (0 if there was no CSV).
+    """
+    if not os.path.exists(csv_path):
+        return 0
+
+    rows = []
+    with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            quiz_uuid = row.get('quiz_uuid')
+            answers = row.get('answers') or '{}'
+            try:
+                json.loads(answers)
+            except ValueError:
+                print(f"WARNING: Skipping quiz result {quiz_uuid} with malformed answers", flush=True)
+                continue
+            if quiz_uuid and row.get('timestamp'):
+                rows.append((quiz_uuid, row['timestamp'], answers))
+
+    store.add_many(rows)
+    os.replace(csv_path, csv_path + '.migrated')
+    print(f"Migrated {len(rows)} anonymous quiz results from {csv_path}", flush=True)
+    return len(rows)
@@ -0,0 +1,253 @@
+"""
+Quiz scoring kernel, for a single quiz and for whole quiz histories.
+
+Scoring rules (shared by every caller):
+- Skip: no answer, or only "Não sei" (`['0']`). No points, not counted as wrong.
+- Otherwise the points of the selected options are summed, each option once
+  however often it is listed; indexes that are not integers or fall outside
+  the question's scoring are ignored.
+- Correct: points > 0. Wrong: points <= 0.
+- Max points of a question: sum of its positive option scores.
+
+`score_quiz` scores one quiz in a single pass and is what `calculate_score`,
+`score_points_total` and `score_counts` are built on.
+
+`ScoringTable` / `score_quizzes` are the batch mode used to re-score stored
+`quiz_history` answers (e.g. after a `scoring_system` correction): per-question
+scoring is held as one zero-padded NumPy matrix, every stored answer becomes a
+row of an option-index mask, and all quizzes are scored with a handful of
+array operations.
+"""
+
+
+def to_scoring(scoring):
+    """
+    Normalizes a question's scoring to a tuple of floats.
+
+    Args:
+        scoring (str | list | tuple): A raw 'scoring_system' string
+            ("0, 1, -0.5") or a sequence of numbers/strings.
+
+    Returns:
+        tuple[float, ...]: The option scores; malformed entries score 0.
+    """
+    if isinstance(scoring, str):
+        scoring = scoring.split(',') if scoring else []
+    values = []
+    for s in scoring or ():
+        try:
+            values.append(float(s))
+        except (TypeError, ValueError):
+            values.append(0.0)
+    return tuple(values)
+
+
+def max_points_for(scoring):
+    """Sum of the positive option scores of a question."""
+    return sum(score for score in scoring if score > 0)
+
+
+def is_skipped(user_answer):
+    """True for no answer or for "Não sei" (option 0) on its own."""
+    return not user_answer or (len(user_answer) == 1 and str(user_answer[0]) == '0')
+
+
+def score_question(scoring, user_answer):
+    """
+    Scores one answer.
+
+    Args:
+        scoring (tuple[float, ...]): The question's option scores.
+        user_answer (list): Selected option indexes, e.g. ['1', '3'];
+            repeated indexes count once.
+
+    Returns:
+        tuple[float, str]: Points and result type ('correct', 'wrong' or 'skipped').
+    """
+    if is_skipped(user_answer):
+        return 0, 'skipped'
+
+    selected = set()
+    for answer_idx in user_answer:
+        try:
+            selected.add(int(answer_idx))
+        except (TypeError, ValueError):
+            continue
+    n_options = len(scoring)
+    points = 0
+    for idx in sorted(selected):
+        if 0 <= idx < n_options:
+            points += scoring[idx]
+    return points, ('correct' if points > 0 else 'wrong')
+
+
+def score_quiz(scorings, user_answers):
+    """
+    Scores a whole quiz in one pass.
+
+    Args:
+        scorings (list[tuple[float, ...]]): Option scores per question, in quiz order.
+        user_answers (dict): Index-based answers, e.g. {'0': ['1'], '1': ['0', '2']}.
+
+    Returns:
+        dict: total_points, max_possible_points, percentage, n_correct, n_wrong,
+        n_skip, total_questions (unrounded) and 'outcomes', a list of
+        (points, result_type) per question.
+    """
+    n_correct = 0
+    n_wrong = 0
+    n_skip = 0
+    total_points = 0
+    max_possible_points = 0
+    outcomes = []
+
+    for i, scoring in enumerate(scorings):
+        points, result_type = score_question(scoring, user_answers.get(str(i), []))
+        max_possible_points += max_points_for(scoring)
+        total_points += points
+        if result_type == 'correct':
+            n_correct += 1
+        elif result_type == 'wrong':
+            n_wrong += 1
+        else:
+            n_skip += 1
+        outcomes.append((points, result_type))
+
+    percentage = (total_points / max_possible_points * 100) if max_possible_points > 0 else 0
+
+    return {
+        'total_points': total_points,
+        'max_possible_points': max_possible_points,
+        'percentage': percentage,
+        'n_correct': n_correct,
+        'n_wrong': n_wrong,
+        'n_skip': n_skip,
+        'total_questions': len(scorings),
+        'outcomes': outcomes,
+    }
+
+
+class ScoringTable:
+    """
+    Scoring of many questions packed into NumPy arrays for batch scoring.
+
+    Attributes:
+        index (dict[int, int]): Question rowid -> row in `scores`.
+        scores (numpy.ndarray): float64 matrix (n_questions, max_options),
+            zero-padded past each question's last option.
+        n_options (numpy.ndarray): Number of real options per row.
+        max_points (numpy.ndarray): Sum of positive scores per row.
+    """
+
+    def __init__(self, scorings_by_qid):
+        """
+        Args:
+            scorings_by_qid (dict[int, sequence]): Question rowid -> scoring
+                (anything `to_scoring` accepts).
+        """
+        import numpy as np
+
+        self.index = {}
+        scorings = []
+        for qid, scoring in scorings_by_qid.items():
+            self.index[int(qid)] = len(scorings)
+            scorings.append(to_scoring(scoring))
+
+        width = max((len(s) for s in scorings), default=0)
+        self.scores = np.zeros((len(scorings), width), dtype=np.float64)
+        self.n_options = np.zeros(len(scorings), dtype=np.int64)
+        for row, scoring in enumerate(scorings):
+            self.scores[row, :len(scoring)] = scoring
+            self.n_options[row] = len(scoring)
+        self.max_points = np.where(self.scores > 0, self.scores, 0).sum(axis=1)
+
+    @classmethod
+    def from_questions(cls, questions):
+        """
+        Builds the table from compiled questions (or anything with `db_id`/`scoring`).
+        """
+        return cls({q.db_id: q.scoring for q in questions})
+
+
+def score_quizzes(quizzes, table):
+    """
+    Scores many stored quizzes at once.
+
+    Each quiz is a dict of question rowid -> selected option indexes, the
+    format stored in `quiz_history.answers` and in anonymous results. Questions
+    that are not in `table` are left out of that quiz, as `view_quiz_result`
+    does. Each answer becomes one row of a boolean option mask, so an option
+    selected twice counts once, as in `score_question`.
+
+    Args:
+        quizzes (list[dict]): Answers by question rowid for each quiz.
+        table (ScoringTable): Scoring for every question the quizzes reference.
+
+    Returns:
+        dict[str, numpy.ndarray]: Per-quiz arrays (length len(quizzes)) for
+        total_points, max_possible_points, percentage, n_correct, n_wrong,
+        n_skip and total_questions.
+    """
+    import numpy as np
+
+    n_quizzes = len(quizzes)
+    width = table.scores.shape[1]
+    index = table.index
+
+    q_rows = []
+    q_quiz = []
+    skipped = []
+    mask_rows = []
+    mask_cols = []
+
+    for quiz_idx, answers in enumerate(quizzes):
+        for qid, user_answer in answers.items():
+            row = index.get(int(qid))
+            if row is None:
+                continue
+            answer_row = len(q_rows)
+            q_rows.append(row)
+            q_quiz.append(quiz_idx)
+            if is_skipped(user_answer):
+                skipped.append(True)
+                continue
+            skipped.append(False)
+            for answer_idx in user_answer:
+                try:
+                    idx = int(answer_idx)
+                except (TypeError, ValueError):
+                    continue
+                if 0 <= idx < width:
+                    mask_rows.append(answer_row)
+                    mask_cols.append(idx)
+
+    q_rows = np.asarray(q_rows, dtype=np.int64)
+    q_quiz = np.asarray(q_quiz, dtype=np.int64)
+    skipped = np.asarray(skipped, dtype=bool)
+
+    mask = np.zeros((len(q_rows), width), dtype=bool)
+    mask[np.asarray(mask_rows, dtype=np.int64), np.asarray(mask_cols, dtype=np.int64)] = True
+
+    points = (table.scores[q_rows] * mask).sum(axis=1)
+    points[skipped] = 0
+    correct = ~skipped & (points > 0)
+    wrong = ~skipped & ~(points > 0)
+
+    total_points = np.bincount(q_quiz, weights=points, minlength=n_quizzes)
+    max_possible = np.bincount(q_quiz, weights=table.max_points[q_rows], minlength=n_quizzes)
+    percentage = np.divide(
+        total_points * 100,
+        max_possible,
+        out=np.zeros(n_quizzes, dtype=np.float64),
+        where=max_possible > 0,
+    )
+
+    return {
+        'total_points': total_points,
+        'max_possible_points': max_possible,
+        'percentage': percentage,
+        'n_correct': np.bincount(q_quiz, weights=correct, minlength=n_quizzes).astype(np.int64),
+        'n_wrong': np.bincount(q_quiz, weights=wrong, minlength=n_quizzes).astype(np.int64),
+        'n_skip': np.bincount(q_quiz, weights=skipped, minlength=n_quizzes).astype(np.int64),
+        'total_questions': np.bincount(q_quiz, minlength=n_quizzes).astype(np.int64),
+    }
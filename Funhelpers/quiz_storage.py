@@ -1,27 +1,232 @@
 """
 Quiz results storage - Anonymous only
 - Authenticated users' history is saved to the main database.
-- Stores anonymous quiz results temporarily
-- 1-hour expiration checked lazily on /quiz access
+- Stores anonymous quiz results temporarily, in the store selected by
+  the QUIZ_RESULTS_BACKEND setting (see `Funhelpers.quiz_results_store`)
+- 1-hour expiration: expired results are never returned, and are deleted
+  by `cleanup_expired_results`
 - No TTL field needed, just check timestamp age
 - Registered users store results in their own area (database)
+- Saves (anonymous and authenticated) go through a write-behind queue and are
+  group-committed by a single writer thread (`Funhelpers.write_behind`);
+  set QUIZ_WRITE_BEHIND=False to write synchronously
+- Settings come from the app config (`config.Config`), read when the store
+  and the writer are first used; DEFAULT_SETTINGS applies outside an app
+- Queued saves that keep failing are appended to a spool file and written
+  again by `replay_spooled_writes` (a maintenance job), so a save the
+  caller was told succeeded is not dropped
 """
 
-import csv
 import json
 import os
+import threading
 from datetime import datetime, timedelta
 from uuid import uuid4
 from pathlib import Path
 
-from DBhelpers import save_quiz_history
+from flask import current_app, has_app_context
+
+from Funhelpers.write_behind import WriteBehindQueue
+from Funhelpers.answer_codec import decode_answers, encode_answers_text
+from Funhelpers.quiz_results_store import (
+    TIMESTAMP_FORMAT,
+    SegmentLogResultStore,
+    SQLiteResultStore,
+    migrate_csv_results,
+)
 
 QUIZ_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'quiz_results')
 Path(QUIZ_RESULTS_DIR).mkdir(exist_ok=True)
 
+QUIZ_RESULTS_TTL = timedelta(hours=1)
+
+# Legacy flat file, imported once into the store on first use
+LEGACY_CSV_PATH = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
+
+# Used when there is no app context (e.g. scripts)
+DEFAULT_SETTINGS = {
+    'QUIZ_RESULTS_BACKEND': 'sqlite',
+    'QUIZ_WRITE_BEHIND': True,
+    'QUIZ_WRITE_BEHIND_INTERVAL_MS': 5.0,
+    'QUIZ_WRITE_BEHIND_BATCH': 64,
+    'QUIZ_WRITE_BEHIND_RETRIES': 3,
+}
+
+# Queued saves that failed every retry, one JSON object per line
+SPOOL_PATH = os.path.join(QUIZ_RESULTS_DIR, 'write_behind_spool.jsonl')
+_spool_lock = threading.Lock()
+
+_store = None
+_writer = None
+_store_lock = threading.Lock()
+
+
+def _setting(name):
+    """A QUIZ_* setting from the current app's config, or its DEFAULT_SETTINGS value."""
+    if has_app_context():
+        return current_app.config.get(name, DEFAULT_SETTINGS[name])
+    return DEFAULT_SETTINGS[name]
+
+
+def get_results_store():
+    """
+    Returns the anonymous results store, creating it on first use.
+
+    The first call also migrates the legacy `quiz_results.csv`, if present.
+    The QUIZ_RESULTS_BACKEND setting selects "sqlite" (default) or "segments".
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                backend = str(_setting('QUIZ_RESULTS_BACKEND')).lower()
+                if backend == 'sqlite':
+                    store = SQLiteResultStore(os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.db'))
+                elif backend == 'segments':
+                    store = SegmentLogResultStore(os.path.join(QUIZ_RESULTS_DIR, 'segments'))
+                    store.delete_expired(_expiry_cutoff())
+                else:
+                    raise ValueError(f"Unknown QUIZ_RESULTS_BACKEND: {backend}")
+                migrate_csv_results(LEGACY_CSV_PATH, store)
+                _store = store
+    return _store
+
+
+def _write_anonymous_results(rows):
+    """Write-behind handler: (quiz_uuid, timestamp, encoded answers) rows in one transaction."""
+    get_results_store().add_many(rows)
+
+
+def _write_quiz_histories(entries):
+    """
+    Write-behind handler: one `save_quiz_history` call per (app, kwargs) entry.
+
+    Returns:
+        list: The entries that could not be saved (retried by the writer).
+    """
+    from DBhelpers import save_quiz_history
+
+    failed = []
+    for entry in entries:
+        app, kwargs = entry
+        try:
+            if app is not None:
+                with app.app_context():
+                    save_quiz_history(**kwargs)
+            else:
+                save_quiz_history(**kwargs)
+        except Exception as e:
+            print(f"ERROR: Could not save quiz history for {kwargs.get('email')}: {e}", flush=True)
+            failed.append(entry)
+    return failed
+
+
+def _spool_writes(kind, payloads):
+    """
+    Write-behind spool: appends saves that failed every retry to SPOOL_PATH.
+
+    Anonymous rows are stored as [quiz_uuid, timestamp, answers], histories
+    as their `save_quiz_history` keyword arguments (without the app).
+    """
+    with _spool_lock, open(SPOOL_PATH, 'a', encoding='utf-8') as f:
+        for payload in payloads:
+            record = list(payload) if kind == 'anonymous' else payload[1]
+            f.write(json.dumps({'kind': kind, 'payload': record}, default=str) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _read_spool(path):
+    records = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                print(f"WARNING: Skipping unreadable line in {path}", flush=True)
+    return records
+
+
+def replay_spooled_writes():
+    """
+    Writes the saves in the spool file again, synchronously.
+
+    Saves that fail again go back to the spool.
+
+    Returns:
+        int: Number of spooled saves written.
+    """
+    replaying = SPOOL_PATH + '.replaying'
+    with _spool_lock:
+        if not os.path.exists(replaying):
+            try:
+                os.replace(SPOOL_PATH, replaying)
+            except FileNotFoundError:
+                return 0
+        records = _read_spool(replaying)
+
+    rows = [tuple(r['payload']) for r in records if r.get('kind') == 'anonymous']
+    histories = [(None, r['payload']) for r in records if r.get('kind') == 'history']
+    written = 0
+    if rows:
+        try:
+            _write_anonymous_results(rows)
+            written += len(rows)
+        except Exception as e:
+            print(f"ERROR: Could not replay {len(rows)} spooled quiz results: {e}", flush=True)
+            _spool_writes('anonymous', rows)
+    if histories:
+        app = current_app._get_current_object() if has_app_context() else None
+        failed = _write_quiz_histories([(app, kwargs) for _, kwargs in histories])
+        written += len(histories) - len(failed)
+        if failed:
+            _spool_writes('history', failed)
+    os.remove(replaying)
+    return written
+
+
+def _spooled_result(quiz_uuid):
+    """The spooled (quiz_uuid, timestamp, answers) row of `quiz_uuid`, or None."""
+    with _spool_lock:
+        for path in (SPOOL_PATH + '.replaying', SPOOL_PATH):
+            if not os.path.exists(path):
+                continue
+            for record in _read_spool(path):
+                payload = record.get('payload')
+                if record.get('kind') == 'anonymous' and payload[0] == quiz_uuid:
+                    return tuple(payload)
+    return None
+
+
+def get_result_writer():
+    """
+    Returns the write-behind queue for quiz saves, creating it on first use.
+
+    Tuned by QUIZ_WRITE_BEHIND_INTERVAL_MS, QUIZ_WRITE_BEHIND_BATCH and
+    QUIZ_WRITE_BEHIND_RETRIES.
+    """
+    global _writer
+    if _writer is None:
+        with _store_lock:
+            if _writer is None:
+                _writer = WriteBehindQueue(
+                    {'anonymous': _write_anonymous_results, 'history': _write_quiz_histories},
+                    flush_interval=float(_setting('QUIZ_WRITE_BEHIND_INTERVAL_MS')) / 1000,
+                    max_batch=int(_setting('QUIZ_WRITE_BEHIND_BATCH')),
+                    name="quiz-results-writer",
+                    retries=int(_setting('QUIZ_WRITE_BEHIND_RETRIES')),
+                    spool=_spool_writes,
+                )
+    return _writer
+
+
+def _expiry_cutoff():
+    """Timestamp string at or before which results are expired."""
+    return (datetime.now() - QUIZ_RESULTS_TTL).strftime(TIMESTAMP_FORMAT)
+
 def save_quiz_result(user_answers, questions):
     """
-    Save anonymous quiz results to CSV
+    Save anonymous quiz results to the results store
     Registered users save to their own area instead
     
     Args:
@@ -29,14 +234,16 @@ def save_quiz_result(user_answers, questions):
         questions: list of question objects
     
     Returns:
-        quiz_uuid: unique identifier for this quiz (valid 1 hour)
+        quiz_uuid: unique identifier for this quiz (valid 1 hour),
+        readable with get_quiz_result right away even while still queued
     
-    CSV Format (compact and anonymous):
-    quiz_uuid,timestamp,answers
-    a1b2c3d4-...,2025-11-03 20:00:00,"{1: , 2: , ...}"
+    Stored record (compact and anonymous):
+    quiz_uuid, timestamp, answers
+    a1b2c3d4-..., 2025-11-03 20:00:00, '~AQUFAacC...'
+    (answers encoded with `encode_answers_text`; older rows hold JSON)
     """
     quiz_uuid = str(uuid4())
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
     
     # Convert index-based answers to question_number-based
     answers_by_question_number = {}
@@ -52,25 +259,12 @@ def save_quiz_result(user_answers, questions):
     else:
         answers_by_question_number = user_answers
     
-    answers_json = json.dumps(answers_by_question_number)
-    
-    csv_filepath = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
-    file_exists = os.path.exists(csv_filepath)
-    
-    with open(csv_filepath, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        
-        # Write header only if file is new
-        if not file_exists:
-            writer.writerow(['quiz_uuid', 'timestamp', 'answers'])
-        
-        # Write quiz result (anonymous, no email)
-        writer.writerow([quiz_uuid, timestamp, answers_json])
-    
-    # print(f"DEBUG: Saved anonymous quiz result")
-    # print(f"  UUID: {quiz_uuid}")
-    # print(f"  Timestamp: {timestamp}")
-    
+    row = (quiz_uuid, timestamp, encode_answers_text(answers_by_question_number))
+    if _setting('QUIZ_WRITE_BEHIND'):
+        get_result_writer().submit('anonymous', row, key=quiz_uuid)
+    else:
+        _write_anonymous_results([row])
+
     return quiz_uuid
 
 def save_quiz_history_for_user(email, quiz_results, quiz_config):
@@ -83,19 +277,26 @@ def save_quiz_history_for_user(email, quiz_results, quiz_config):
         quiz_config (dict): The quiz configuration dictionary from the session.
 
     Returns:
-        bool: True if saving was successful, False otherwise.
+        bool: True if saving was successful (or the save was queued), False otherwise.
     """
     if not email or not isinstance(quiz_results, dict):
         return False
 
-    quiz_uuid = str(uuid4())
+    kwargs = {
+        'email': email,
+        'results': quiz_results,
+        'quiz_config': quiz_config,
+    }
 
+    if _setting('QUIZ_WRITE_BEHIND'):
+        # Keep the app so the writer thread can push its context
+        app = current_app._get_current_object() if has_app_context() else None
+        get_result_writer().submit('history', (app, kwargs))
+        return True
+
+    from DBhelpers import save_quiz_history
     try:
-        save_quiz_history(
-            email=email,
-            results=quiz_results,
-            quiz_config=quiz_config,
-        )
+        save_quiz_history(**kwargs)
         return True
     except Exception as e:
         print(f"ERROR: Could not save quiz history for {email}: {e}")
@@ -104,52 +305,18 @@ def save_quiz_history_for_user(email, quiz_results, quiz_config):
 def cleanup_expired_results():
     """
     Remove quiz results older than 1 hour
-    Called at start of /quiz (lazy cleanup)
+    Only touches the expired rows (timestamp index), or drops whole
+    expired hourly segments with the "segments" backend
     
     Returns:
         Number of rows deleted
     """
-    csv_filepath = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
-    
-    if not os.path.exists(csv_filepath):
-        return 0
-    
-    current_time = datetime.now()
-    one_hour_ago = current_time - timedelta(hours=1)
-    rows_to_keep = []
-    rows_deleted = 0
-    
-    with open(csv_filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        if not reader.fieldnames:
-            return 0
-        
-        header = reader.fieldnames
-        
-        for row in reader:
-            try:
-                row_time = datetime.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S')
-                
-                # Keep if less than 1 hour old
-                if row_time > one_hour_ago:
-                    rows_to_keep.append(row)
-                else:
-                    rows_deleted += 1
-                    # print(f"DEBUG: Deleted expired quiz {row['quiz_uuid']}")
-            except ValueError:
-                # Keep rows with invalid timestamp (safety)
-                rows_to_keep.append(row)
-    
-    # Write back only valid rows
-    if rows_deleted > 0:
-        with open(csv_filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(rows_to_keep)
-        
-        # print(f"DEBUG: Cleanup removed {rows_deleted} expired quiz results")
-    
-    return rows_deleted
+    return get_results_store().delete_expired(_expiry_cutoff())
+
+def _flush_writes():
+    """Waits for queued saves, if the write-behind writer was ever started."""
+    if _writer is not None:
+        _writer.flush()
 
 def get_quiz_result(quiz_uuid):
     """
@@ -161,31 +328,36 @@ def get_quiz_result(quiz_uuid):
     Returns:
         dict with quiz data, or None if not found/expired
     """
-    # First cleanup expired results
-    cleanup_expired_results()
-    
-    csv_filepath = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
-    
-    if not os.path.exists(csv_filepath):
+    # Read-your-writes: a result still waiting in the write-behind queue
+    row = _writer.get_pending(quiz_uuid) if _writer is not None else None
+    if row is None:
+        row = get_results_store().get(quiz_uuid, _expiry_cutoff())
+    if row is None:
+        # Not written yet: failed every retry and waits in the spool file
+        row = _spooled_result(quiz_uuid)
+    if row is None:
+        # print(f"DEBUG: Quiz UUID not found or expired: {quiz_uuid}")
         return None
+
+    quiz_uuid, timestamp, answers = row
+    return {
+        'quiz_uuid': quiz_uuid,
+        'timestamp': timestamp,
+        'answers_by_question_number': decode_answers(answers)
+    }
+
+def delete_quiz_result(quiz_uuid):
+    """
+    Delete one anonymous quiz result (e.g. once it has been claimed)
     
-    with open(csv_filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            if row['quiz_uuid'] == quiz_uuid:
-                answers_by_question_number = json.loads(row.get('answers', '{}'))
-                
-                result = {
-                    'quiz_uuid': row['quiz_uuid'],
-                    'timestamp': row['timestamp'],
-                    'answers_by_question_number': answers_by_question_number
-                }
-                
-                # print(f"DEBUG: Retrieved quiz result: {quiz_uuid}")
-                return result
+    Args:
+        quiz_uuid: unique identifier for the quiz
     
-    # print(f"DEBUG: Quiz UUID not found or expired: {quiz_uuid}")
-    return None
+    Returns:
+        True if the result existed
+    """
+    _flush_writes()
+    return get_results_store().delete(quiz_uuid)
 
 def list_all_quiz_results():
     """
@@ -194,22 +366,8 @@ def list_all_quiz_results():
     Returns:
         list of quiz summaries
     """
-    # First cleanup expired results
-    cleanup_expired_results()
-    
-    csv_filepath = os.path.join(QUIZ_RESULTS_DIR, 'quiz_results.csv')
-    
-    if not os.path.exists(csv_filepath):
-        return []
-    
-    results = []
-    
-    with open(csv_filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            results.append({
-                'quiz_uuid': row['quiz_uuid'],
-                'timestamp': row['timestamp']
-            })
-    
-    return results
+    _flush_writes()
+    return [
+        {'quiz_uuid': quiz_uuid, 'timestamp': timestamp}
+        for quiz_uuid, timestamp in get_results_store().list_live(_expiry_cutoff())
+    ]
@@ -0,0 +1,302 @@
+"""
+Server-side Flask sessions.
+
+With Flask's default session the whole session (quiz question IDs, answers,
+quiz config, the tier-2 profile in 'metadata') is serialized into the signed
+cookie and re-signed and re-sent on every request. `ServerSideSessionInterface`
+keeps the session data in a local store instead; the cookie only carries a
+signed, opaque session ID.
+
+- Stores: `SQLiteSessionStore` (WAL mode, default) and `MemorySessionStore`
+  (for tests).
+- Entries expire after `PERMANENT_SESSION_LIFETIME`; the expiry slides forward
+  when less than half of it is left.
+- Writes are lazy: the session is only written back when its serialized
+  content actually changed.
+- `regenerate_session()` moves the session to a new ID (and drops the old
+  one from the store); the auth blueprints call it on login and logout, so
+  an ID planted before login (session fixation) is never authenticated.
+
+Selected in `create_app` with the SESSION_BACKEND setting
+("sqlite", "memory" or "cookie" for Flask's built-in cookie session).
+"""
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SecureCookieSession, SessionInterface
+from itsdangerous import BadSignature, Signer
+
+
+class ServerSession(SecureCookieSession):
+    """A session dict that remembers its store ID and the data it was loaded with."""
+
+    def __init__(self, initial=None, sid=None, loaded_data=None, expires_at=0):
+        super().__init__(initial)
+        self.sid = sid
+        self.loaded_data = loaded_data
+        self.expires_at = expires_at
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Keeps the data but moves it to a new session ID when the response is saved."""
+        if self.sid is not None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.loaded_data = None
+        self.modified = True
+
+
+def regenerate_session():
+    """
+    Gives the current session a new ID, keeping its data.
+
+    Call it whenever the session's privilege changes (login, logout). With
+    the "cookie" backend there is no server-side ID to rotate, so it does
+    nothing.
+    """
+    from flask import session
+
+    regenerate = getattr(session, "regenerate", None)
+    if regenerate is not None:
+        regenerate()
+
+
+class MemorySessionStore:
+    """Process-local session store. Meant for tests and single-process dev runs."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, sid):
+        """Return (data, expires_at) for a live session, or None."""
+        with self._lock:
+            entry = self._data.get(sid)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[sid]
+                return None
+            return entry
+
+    def set(self, sid, data, expires_at):
+        with self._lock:
+            self._data[sid] = (data, expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._data.pop(sid, None)
+
+    def cleanup_expired(self):
+        """Remove expired sessions. Returns the number of sessions removed."""
+        now = time.time()
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._data.items() if expires_at <= now]
+            for sid in expired:
+                del self._data[sid]
+        return len(expired)
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a local SQLite file in WAL mode.
+
+    WAL lets the Waitress threads read sessions while another thread writes.
+    Each thread keeps its own connection.
+    """
+
+    def __init__(self, db_path="sessions.db"):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " sid TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid):
+        """Return (data, expires_at) for a live session, or None."""
+        return self._connection().execute(
+            "SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+            (sid, time.time()),
+        ).fetchone()
+
+    def set(self, sid, data, expires_at):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, data, expires_at),
+        )
+        conn.commit()
+
+    def delete(self, sid):
+        conn = self._connection()
+        conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        conn.commit()
+
+    def cleanup_expired(self):
+        """Remove expired sessions. Returns the number of sessions removed."""
+        conn = self._connection()
+        deleted = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+        conn.commit()
+        return deleted
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface that keeps session data in a `*SessionStore`.
+
+    The cookie value is the session ID signed with SECRET_KEY, so forged or
+    stale IDs are rejected without touching the store.
+    """
+
+    session_class = ServerSession
+    serializer = TaggedJSONSerializer()
+    salt = "server-session"
+
+    # Expired rows are swept every this many writes.
+    cleanup_every = 1000
+
+    def __init__(self, store):
+        self.store = store
+        self._writes = 0
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _ttl(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if not cookie:
+            return self.session_class()
+        try:
+            sid = self._signer(app).unsign(cookie).decode()
+        except BadSignature:
+            return self.session_class()
+
+        entry = self.store.get(sid)
+        if entry is None:
+            return self.session_class()
+        data, expires_at = entry
+        try:
+            initial = self.serializer.loads(data)
+        except ValueError:
+            return self.session_class()
+        return self.session_class(initial, sid=sid, loaded_data=data, expires_at=expires_at)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        # Regenerated session: the old ID must stop working
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+            session.previous_sid = None
+
+        # Emptied session: drop it from the store and remove the cookie.
+        if not session:
+            if session.modified:
+                if session.sid:
+                    self.store.delete(session.sid)
+                response.delete_cookie(
+                    name,
+                    domain=domain,
+                    path=path,
+                    secure=secure,
+                    partitioned=partitioned,
+                    samesite=samesite,
+                    httponly=httponly,
+                )
+                response.vary.add("Cookie")
+            return
+
+        ttl = self._ttl(app)
+        now = time.time()
+        is_new = session.sid is None
+        if is_new:
+            session.sid = secrets.token_urlsafe(32)
+
+        # Lazy write: only when the content changed, or to slide the expiry
+        # forward once less than half of the TTL is left.
+        data = self.serializer.dumps(dict(session)) if (session.modified or is_new) else session.loaded_data
+        needs_refresh = session.expires_at - now < ttl / 2
+        if is_new or data != session.loaded_data or needs_refresh:
+            self.store.set(session.sid, data, now + ttl)
+            session.loaded_data = data
+            session.expires_at = now + ttl
+            self._maybe_cleanup()
+
+        # The cookie value never changes for a given session, so it only needs
+        # to be (re)sent when it is new or carries a sliding expiry date.
+        if not (is_new or (session.permanent and needs_refresh)):
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode(),
+            expires=self.get_expiration_time(app, session),
+            httponly=httponly,
+            domain=domain,
+            path=path,
+            secure=secure,
+            partitioned=partitioned,
+            samesite=samesite,
+        )
+        response.vary.add("Cookie")
+
+    def _maybe_cleanup(self):
+        self._writes += 1
+        if self._writes % self.cleanup_every == 0:
+            try:
+                self.store.cleanup_expired()
+            except sqlite3.Error as e:
+                print(f"SESSION WARNING: Failed to clean up expired sessions: {e}", flush=True)
+
+
+def init_session_backend(app):
+    """
+    Installs the session backend selected by the SESSION_BACKEND setting.
+
+    - "sqlite" (default): `SQLiteSessionStore` at SESSION_SQLITE_PATH.
+    - "memory": `MemorySessionStore`.
+    - "cookie": keep Flask's built-in signed-cookie sessions.
+    """
+    backend = (app.config.get("SESSION_BACKEND") or "sqlite").lower()
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        store = MemorySessionStore()
+    elif backend == "sqlite":
+        store = SQLiteSessionStore(app.config.get("SESSION_SQLITE_PATH", "sessions.db"))
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND: {backend}")
+    app.session_interface = ServerSideSessionInterface(store)
+    return store
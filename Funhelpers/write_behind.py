@@ -0,0 +1,197 @@
+"""
+Write-behind queue with group commit.
+
+When a whole class finishes a quiz at once, every request used to do its own
+synchronous write before the results page could render. `WriteBehindQueue`
+takes the write off the request thread: records are queued, and a single
+writer thread collects them for up to `flush_interval` seconds (or
+`max_batch` records) and hands each batch to a per-kind handler, which can
+commit it in one transaction.
+
+- One writer thread means writes never race each other.
+- Queued records stay readable through `get_pending(key)` until their batch
+  has been written (read-your-writes).
+- A failed batch is retried with exponential backoff. A batch that still
+  fails is handed to the `spool` callback (e.g. appended to a file and
+  replayed later) instead of being dropped; `stats()` counts retries,
+  spooled and lost records.
+- `flush()` waits for everything queued so far; `close()` flushes and stops
+  the writer, and runs automatically at interpreter exit.
+"""
+import atexit
+import queue
+import threading
+import time
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """
+    Single-writer, group-commit queue.
+
+    Args:
+        handlers (dict[str, callable]): Record kind -> function called with the
+            list of payloads of that kind in one batch, in submission order.
+            It either raises (nothing was written) or returns the payloads
+            that could not be written (None or empty if all were).
+        flush_interval (float): Longest time (seconds) a record waits for its
+            batch to fill up.
+        max_batch (int): Largest number of records written in one batch.
+        name (str): Name of the writer thread.
+        retries (int): How many times the failed payloads of a batch are retried.
+        retry_delay (float): Wait (seconds) before the first retry; doubled
+            before each further one.
+        spool (callable | None): Called with (kind, payloads) for the payloads
+            that still fail after the retries. If it is None or raises, they
+            are lost (and counted as such).
+    """
+
+    def __init__(self, handlers, flush_interval=0.005, max_batch=64, name="write-behind",
+                 retries=3, retry_delay=0.05, spool=None):
+        self.handlers = handlers
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.name = name
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.spool = spool
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self.batches = 0
+        self.records = 0
+        self.retried = 0
+        self.failed = 0
+        self.spooled = 0
+        self.lost = 0
+        atexit.register(self.close)
+
+    def submit(self, kind, payload, key=None):
+        """
+        Queues one record.
+
+        Args:
+            kind (str): Which handler writes it.
+            payload: The record passed to the handler.
+            key (str | None): If given, the payload is returned by
+                `get_pending(key)` until it has been written.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"No write-behind handler for {kind!r}")
+        with self._lock:
+            if key is not None:
+                self._pending[key] = payload
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        self._queue.put((kind, key, payload))
+
+    def get_pending(self, key):
+        """Return the queued payload for `key`, or None if it is not waiting to be written."""
+        return self._pending.get(key)
+
+    def stats(self):
+        """
+        Returns the writer's counters.
+
+        Returns:
+            dict: 'batches' and 'records' written, 'retried' (retry attempts),
+            'failed' (records that failed every attempt), of which 'spooled'
+            and 'lost', and 'queued' (records not written yet).
+        """
+        return {
+            'batches': self.batches,
+            'records': self.records,
+            'retried': self.retried,
+            'failed': self.failed,
+            'spooled': self.spooled,
+            'lost': self.lost,
+            'queued': self._queue.unfinished_tasks,
+        }
+
+    def flush(self):
+        """Block until every record queued so far has been written."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _collect(self):
+        """Wait for one record, then gather more until the batch is full or the interval ends."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stop = batch[-1] is _STOP
+            records = [item for item in batch if item is not _STOP]
+            try:
+                self._write(records)
+            finally:
+                with self._lock:
+                    for _, key, payload in records:
+                        if key is not None and self._pending.get(key) is payload:
+                            del self._pending[key]
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, records):
+        by_kind = {}
+        for kind, _, payload in records:
+            by_kind.setdefault(kind, []).append(payload)
+        for kind, payloads in by_kind.items():
+            failed = self._write_with_retries(kind, payloads)
+            if failed:
+                self._give_up(kind, failed)
+        if records:
+            self.batches += 1
+            self.records += len(records)
+
+    def _write_with_retries(self, kind, payloads):
+        """Writes `payloads`, retrying the failed ones with backoff; returns those that never succeeded."""
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+                self.retried += 1
+            try:
+                payloads = list(self.handlers[kind](payloads) or ())
+                error = None
+            except Exception as e:
+                error = e
+            if not payloads:
+                return []
+            print(f"ERROR: Write-behind batch of {len(payloads)} {kind} records failed "
+                  f"(attempt {attempt + 1} of {self.retries + 1}): {error or 'not written'}", flush=True)
+        return payloads
+
+    def _give_up(self, kind, payloads):
+        self.failed += len(payloads)
+        if self.spool is not None:
+            try:
+                self.spool(kind, payloads)
+                self.spooled += len(payloads)
+                return
+            except Exception as e:
+                print(f"ERROR: Could not spool {len(payloads)} {kind} records: {e}", flush=True)
+        self.lost += len(payloads)
+        print(f"ERROR: Lost {len(payloads)} {kind} records", flush=True)
@@ -1,6 +1,8 @@
 from flask import Blueprint, session, redirect, url_for,current_app
 import requests
 
+from Funhelpers.server_session import regenerate_session
+
 bp_logout = Blueprint('logout', __name__, url_prefix='/logout')
 
 
@@ -10,8 +12,8 @@ def logout():
     Handles the user logout process.
 
     This function revokes the user's Google OAuth2 access token if it exists in the session,
-    clears the Flask session to remove all user-related data, and then redirects the user
-    to the sign-in page.
+    clears the Flask session to remove all user-related data and retires its session ID,
+    and then redirects the user to the sign-in page.
     """
     # Revoke token if exists
     access_token = session.get('access_token')
@@ -22,6 +24,7 @@ def logout():
 
     # Clear Flask session
     session.clear()
+    regenerate_session()
 
     # Redirect to sign-in or homepage
     return redirect(url_for('signin.signin'))  # or your login route
\ No newline at end of file
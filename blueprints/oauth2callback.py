@@ -1,6 +1,8 @@
 from flask import Blueprint, request, session, redirect, url_for,current_app
 import requests
 
+from Funhelpers.server_session import regenerate_session
+
 bp_oauth2callback = Blueprint('oauth2callback', __name__, url_prefix='/oauth2callback')
 
 
@@ -14,7 +16,8 @@ def oauth2callback():
     and an ID token from the token endpoint.
 
     The obtained tokens and user information (fetched from the userinfo endpoint) are stored
-    in the session. Finally, it redirects the user to the `check_user` blueprint to
+    in the session, under a new session ID so that an ID set before login cannot be
+    reused (session fixation). Finally, it redirects the user to the `check_user` blueprint to
     complete the login or registration process.
     """
     code = request.args.get('code')
@@ -34,6 +37,7 @@ def oauth2callback():
     tokens = response.json()
 
     # Save tokens in session or your database
+    regenerate_session()
     session['access_token'] = tokens.get('access_token')
     session['id_token'] = tokens.get('id_token')
     
@@ -1,180 +1,16 @@
 from flask import Blueprint, render_template, request, session, redirect, url_for, flash, jsonify, current_app
-from DBhelpers import getQuestionIDsForYear, getQuestionFromQid
-from Funhelpers.quiz_helpers import calculate_score
+from DBreadQuiz import getQuestionIDsForYear
+from Funhelpers.answer_codec import decode_answers
+from Funhelpers.quiz_helpers import calculate_score, get_compiled_question, get_compiled_questions
 from Funhelpers.quiz_storage import (
     save_quiz_result,
     save_quiz_history_for_user,
     # get_quiz_result,
-    cleanup_expired_results
 )
-from urllib.parse import urljoin
+from werkzeug.http import parse_accept_header
+import gzip
 import json
 
-def split_top_level_commas_with_quotes(s: str):
-    """
-    Splits a string by top-level commas, ignoring commas within curly braces and single quotes.
-
-    This function is designed to parse comma-separated fields that may contain nested
-    structures (e.g., JSON-like objects) or string literals. It correctly handles nested
-    braces and quoted sections, ensuring that only commas at the top level are used as
-    delimiters.
-
-    Args:
-        s (str): The string to be split.
-
-    Returns:
-        list[str]: A list of strings, representing the split parts of the input string.
-    """
-    parts = []
-    buf = []
-    depth = 0          # { } nesting
-    in_quote = False   # single quotes '
-    i = 0
-    while i < len(s):
-        ch = s[i]
-        if ch == "'" and not in_quote:
-            in_quote = True
-            buf.append(ch)
-        elif ch == "'" and in_quote:
-            in_quote = False
-            buf.append(ch)
-        elif ch == '{' and not in_quote:
-            depth += 1
-            buf.append(ch)
-        elif ch == '}' and not in_quote:
-            depth = max(0, depth - 1)
-            buf.append(ch)
-        elif ch == ',' and not in_quote and depth == 0:
-            parts.append(''.join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-        i += 1
-    if buf:
-        parts.append(''.join(buf).strip())
-    return parts
-
-def split_top_level_commas(s: str):
-    """
-    Splits a string by top-level commas, ignoring commas within curly braces.
-
-    This utility function is used to parse comma-separated strings that may contain
-    nested structures enclosed in curly braces, such as simple object representations.
-    It only splits by commas that are not inside any level of brace nesting.
-
-    Args:
-        s (str): The string to be split.
-
-    Returns:
-        list[str]: A list of strings, representing the split parts of the input string.
-    """
-    parts = []
-    buf = []
-    depth = 0  # tracks nesting of { }
-    for ch in s:
-        if ch == '{':
-            depth += 1
-            buf.append(ch)
-        elif ch == '}':
-            depth = max(0, depth - 1)
-            buf.append(ch)
-        elif ch == ',' and depth == 0:
-            parts.append(''.join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-    if buf:
-        parts.append(''.join(buf).strip())
-    return parts
-
-def make_url_dev(rel: str) -> str:
-    """
-    Generates a URL for a quiz asset in a development environment.
-
-    This helper function constructs a local URL for serving quiz assets from the
-    'quiz-time' folder during development. It returns an empty string if the
-    relative path is empty.
-
-    Args:
-        rel (str): The relative path to the asset.
-
-    Returns:
-        str: The development URL for the asset.
-    """
-    if not rel:
-        return ""
-    # url = f"/quiz-time/{rel}"
-    url = f"/{rel}"
-    return url
-
-def make_url_prod(rel: str) -> str:
-    """
-    Generates a production-ready URL for a quiz asset.
-
-    This function constructs an absolute URL for serving quiz assets from a production
-    environment, such as a CDN or a dedicated web server. It retrieves the base URL
-    from the application's configuration ('QUIZ_ASSETS_PROD_URL'). If the base URL
-    is not set, it falls back to the development URL structure.
-
-    Args:
-        rel (str): The relative path to the asset.
-
-    Returns:
-        str: The absolute production URL for the asset.
-    """
-    prod_base = current_app.config.get('QUIZ_ASSETS_PROD_URL', '')
-    if not prod_base:
-        return make_url_dev(rel)
-    return urljoin(prod_base, rel.lstrip('/'))
-
-def make_url(rel: str) -> str:
-    """
-    Creates an environment-aware URL for a quiz asset.
-
-    This function acts as a dispatcher, generating the appropriate URL for an asset based
-    on the application's current environment, which is determined by the
-    'QUIZ_ASSETS_SOURCE' configuration variable. It will call either `make_url_prod` for
-    'prod' environments or `make_url_dev` for any other case.
-
-    Args:
-        rel (str): The relative path to the asset.
-
-    Returns:
-        str: The full URL (either local or remote) for the asset, or an empty string
-             if the relative path is empty.
-    """
-    if not rel:
-        return ""
-    source = current_app.config.get('QUIZ_ASSETS_SOURCE', 'dev').lower()
-    return make_url_prod(rel) if source == 'prod' else make_url_dev(rel)
-
-
-def parse_possible_answers(field: str):
-    """
-    Parses a string of comma-separated possible answers for a quiz question.
-
-    This function takes a raw string from the database, which contains the possible
-    answers for a question, and processes it into a list of clean, individual answer
-    options. It uses `split_top_level_commas_with_quotes` to correctly handle answers
-    that may contain commas or other special characters. It also strips leading/trailing
-    whitespace and removes any surrounding single quotes from each answer.
-
-    Args:
-        field (str): The raw string containing the possible answers.
-
-    Returns:
-        list[str]: A list of cleaned answer strings.
-    """
-    items = split_top_level_commas_with_quotes(field)
-    # strip outer single quotes if present
-    cleaned = []
-    for x in items:
-        x = x.strip()
-        if len(x) >= 2 and x[0] == "'" and x[-1] == "'":
-            x = x[1:-1]
-        cleaned.append(x.strip())
-    return cleaned
-
 quiz_bp = Blueprint('quiz', __name__)
 
 @quiz_bp.route('/quiz-config')
@@ -218,20 +54,20 @@ def start_quiz():
     Initializes a new quiz session based on user-selected configuration.
 
     This function serves as the entry point for starting a quiz. It performs the following steps:
-    1.  Cleans up any expired, anonymously saved quiz results.
-    2.  Retrieves quiz configuration settings (year, number of exercises, etc.) from the
+    1.  Retrieves quiz configuration settings (year, number of exercises, etc.) from the
         request's query parameters, with default values as fallbacks.
-    3.  Validates the provided configuration, flashing an error and redirecting if the
+    2.  Validates the provided configuration, flashing an error and redirecting if the
         parameters are invalid.
-    4.  Auto-adjusts the `current_year_percent` for certain edge-case years (e.g., year 5
+    3.  Auto-adjusts the `current_year_percent` for certain edge-case years (e.g., year 5
         or years under construction).
-    5.  Stores the final, validated configuration in the user's session.
-    6.  Fetches the list of question IDs for the configured quiz from the database.
-    7.  Initializes the quiz state in the session (question IDs, current question index, etc.).
-    8.  Redirects the user to the first question of the quiz.
+    4.  Stores the final, validated configuration in the user's session.
+    5.  Fetches the list of question IDs for the configured quiz from the database.
+    6.  Initializes the quiz state in the session (question IDs, current question index, etc.).
+    7.  Redirects the user to the first question of the quiz.
+
+    Expired anonymous results are cleaned up by the maintenance scheduler
+    (`Funhelpers.maintenance`), not here.
     """
-    cleanup_expired_results()
-    
     # Get configuration from query parameters or use defaults
     year = request.args.get('year', 8, type=int)
     num_exercises = request.args.get('num_exercises', 20, type=int)
@@ -291,13 +127,14 @@ def question(question_num):
     1.  Validates that a quiz session is active; otherwise, redirects to the config page.
     2.  Checks if the requested `question_num` is within the valid range of the current quiz.
     3.  Retrieves the question's unique ID from the session's list of question IDs.
-    4.  Fetches the full question data from the database using the ID.
-    5.  Processes the raw question data:
+    4.  Fetches the compiled question using the ID. It is served from the in-process
+        question cache once warm, and was processed once when it was first loaded:
         - Parses the possible answer options.
         - Unescapes characters for special formatting like LaTeX.
         - Constructs additional instructions for 'composed' problems.
-    6.  Renders the 'quiz_question.html' template with the processed data.
-    7.  Embeds the rendered content into the main 'index.html' layout.
+    5.  Renders the 'quiz_question.html' template with the compiled question
+        (see `_render_question_content`, also used by `quiz_step`).
+    6.  Embeds the rendered content into the main 'index.html' layout.
 
     Args:
         question_num (int): The zero-based index of the question in the current quiz.
@@ -317,84 +154,115 @@ def question(question_num):
         flash('Pergunta não encontrada.', 'error')
         return redirect(url_for('quiz.quiz_config'))
     
-    # Fetch the actual question data by ID
-    qid = question_ids[question_num]
-    # print(qid)
-    question_data = getQuestionFromQid(qid)
-    # print(question_data)
-    # print()
-
-    if not question_data:
+    content_html = _render_question_content(question_ids, question_num)
+    if content_html is None:
         flash('Erro ao carregar pergunta.', 'error')
         return redirect(url_for('quiz.quiz_config'))
-    
-    question_path = f"{question_data['ano']}/{question_data['nome_tema']}/{question_data['aula_title']}/{question_data['num_aula']}/{question_data['uuid']}"
-    imageName = question_data['imagem']#.replace('ano','anos/ano').replace('aula',f'tema{question_data['num_tema']}/aula').replace('.jpg','.png')
 
-    # image_url = make_url(imageName) if question_data['imagem'] else ""
-    image_url = imageName
-    # print("147",image_url)
+    # user = session.get('user', None)
+    user = session and session.get("metadata")
 
+    return render_template(
+        'index.html',
+        admin_email=current_app.config.get('ADMIN_EMAIL', ''),
+        user=user,
+        metadata={},
+        page_title=_question_page_title(question_num, len(question_ids)),
+        title=_question_title(question_num, len(question_ids)),
+        main_content=content_html
+    )
 
-    possible_answers = [s.strip() for s in parse_possible_answers(question_data['possible_answers'])] if question_data['possible_answers'] else []
-    scoring_system = [s.strip() for s in question_data['scoring_system'].split(',')] if question_data['scoring_system'] else []
+def _question_page_title(question_num, total_questions):
+    return f'Quiz - Pergunta {question_num + 1}/{total_questions}'
 
-    # Fix: unescape double backslashes for LaTeX
-    if question_data['formatting'] == 'latex':
-        possible_answers = [opt.replace('\\\\', '\\') for opt in possible_answers]
+def _question_title(question_num, total_questions):
+    return f'Quiz - Pergunta {question_num + 1} de {total_questions}'
 
-    composed_instruction = None
-    if question_data['type_of_problem'] == 'composed':
-        composed_instruction = f"Responder apenas à {question_data['question_number']}ª pergunta"
-        if question_data['titulo']:
-            composed_instruction += question_data['titulo']
-    
-    note = question_data['nota']
-
-    # print("------------------------------",note)
-    # Convert to dictionary
-    current_question = {
-        'db_id': question_data['rowid'],
-        'uuid': question_data['uuid'],
-        'question_path': question_path,
-        'image_url': image_url,
-        # 'title': question_data['titulo'],
-        'note': note,
-        'is_multiple_choice': bool(question_data['is_multiple_choice']),
-        'type_of_answer': question_data['formatting'],
-        'options': possible_answers,
-        'scoring': scoring_system,
-        'type_of_problem': question_data['type_of_problem'],
-        'question_number': question_data['question_number'],
-        'composed_instruction': composed_instruction
-        # print(question['question_number'],question['type_of_problem'])
+def _render_question_content(question_ids, question_num):
+    """
+    Renders the 'quiz_question.html' fragment for one question of the current quiz.
 
-    }
-    
-    user_answers = session.get('user_answers', {})
-    current_answer = user_answers.get(str(question_num), [])
-    # user = session.get('user', None)
-    user = session and session.get("metadata")
+    Shared by the full-page `question` view and the `quiz_step` JSON endpoint.
 
+    Args:
+        question_ids (list): The quiz's question IDs from the session.
+        question_num (int): The zero-based index of the question (already validated).
 
+    Returns:
+        str | None: The rendered fragment, or None if the question could not be loaded.
+    """
+    # Fetch the compiled question (options, scoring and LaTeX already parsed)
+    current_question = get_compiled_question(question_ids[question_num])
+    if not current_question:
+        return None
 
-    content_html = render_template(
+    user_answers = session.get('user_answers', {})
+    current_answer = user_answers.get(str(question_num), [])
+
+    return render_template(
         'content/quiz_question.html',
         question=current_question,
         question_num=question_num,
         total_questions=len(question_ids),
         current_answer=current_answer
     )
-    
-    return render_template(
-        'index.html',
-        admin_email=current_app.config.get('ADMIN_EMAIL', ''),
-        user=user,
-        metadata={},
-        page_title=f'Quiz - Pergunta {question_num + 1}/{len(question_ids)}',
-        title=f'Quiz - Pergunta {question_num + 1} de {len(question_ids)}',
-        main_content=content_html
-    )
+
+def _option_index(value):
+    """An answer's option index as an int, or None if it is not a non-negative integer."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value if value >= 0 else None
+    if isinstance(value, str) and value.isascii() and value.isdigit() and len(value) <= 4:
+        return int(value)
+    return None
+
+def _store_answers(answers, question_ids):
+    """
+    Stores a batch of answers in the session.
+
+    Every answer must be a list of option indexes of its question (integers,
+    or strings of digits, below the question's number of options); they are
+    stored as strings, without duplicates.
+
+    Args:
+        answers (dict): Question index -> list of selected option indexes.
+        question_ids (list): The quiz's question IDs from the session.
+
+    Returns:
+        bool: False if any entry was malformed (nothing is stored in that case).
+    """
+    parsed = {}
+    for question_num, answer_data in answers.items():
+        try:
+            question_num = int(question_num)
+        except (TypeError, ValueError):
+            return False
+        if not 0 <= question_num < len(question_ids) or not isinstance(answer_data, list):
+            return False
+        indexes = [_option_index(a) for a in answer_data]
+        if None in indexes:
+            return False
+        parsed[question_num] = indexes
+
+    if not parsed:
+        return True
+    questions, missing_qids = get_compiled_questions([question_ids[n] for n in parsed])
+    if missing_qids:
+        return False
+
+    cleaned = {}
+    for (question_num, indexes), question in zip(parsed.items(), questions):
+        n_options = max(len(question.options), len(question.scoring))
+        if any(idx >= n_options for idx in indexes):
+            return False
+        cleaned[str(question_num)] = [str(idx) for idx in dict.fromkeys(indexes)]
+
+    user_answers = session.get('user_answers', {})
+    user_answers.update(cleaned)
+    session['user_answers'] = user_answers
+    session.modified = True
+    return True
 
 @quiz_bp.route('/quiz/submit', methods=['POST'])
 def submit_answer():
@@ -415,15 +283,10 @@ def submit_answer():
     if 'question_ids' not in session:  # ✓ CHANGED
         return jsonify({'error': 'Sessão de quiz não encontrada'}), 400
     
-    question_num = int(request.form.get('question_num'))
-    answer_data = request.form.getlist('answer')
-    
-    if 'user_answers' not in session:
-        session['user_answers'] = {}
-    
-    session['user_answers'][str(question_num)] = answer_data
-    session.modified = True
-    
+    answers = {request.form.get('question_num'): request.form.getlist('answer')}
+    if not _store_answers(answers, session['question_ids']):
+        return jsonify({'error': 'Respostas inválidas'}), 400
+
     return jsonify({'success': True})
 
 @quiz_bp.route('/quiz/navigate', methods=['POST'])
@@ -464,6 +327,144 @@ def navigate():
     
     return jsonify({'error': 'Ação inválida'}), 400
 
+@quiz_bp.route('/quiz/step', methods=['POST'])
+def quiz_step():
+    """
+    Stores answers and moves to another question in a single round trip.
+
+    Replaces the submit + navigate + page load sequence of the quiz player. The JSON
+    body carries every answer the player has buffered since its last call and the
+    navigation action:
+
+        {"answers": {"3": ["1"], "4": ["0", "2"]},
+         "current_question": 4,
+         "action": "next" | "previous" | "finish" | "goto" | "save",
+         "target": 7}
+
+    'save' only stores the answers (used when the page is being left). 'goto' jumps
+    to `target`. Moving past the last question, or 'finish', ends the quiz.
+
+    Returns:
+        JSON with either {'redirect': <results url>} or the next question as
+        {'question_num', 'html', 'title', 'page_title', 'url'}, where 'html' is the
+        rendered 'quiz_question.html' fragment to swap in place.
+    """
+    if 'question_ids' not in session:
+        return jsonify({'error': 'Sessão de quiz não encontrada'}), 400
+
+    payload = request.get_json(silent=True) or {}
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Pedido inválido'}), 400
+    question_ids = session['question_ids']
+    total_questions = len(question_ids)
+
+    answers = payload.get('answers') or {}
+    if not isinstance(answers, dict) or not _store_answers(answers, question_ids):
+        return jsonify({'error': 'Respostas inválidas'}), 400
+
+    action = payload.get('action')
+    try:
+        current_question = int(payload.get('current_question', 0))
+        target = int(payload.get('target', current_question))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Pergunta inválida'}), 400
+
+    if action == 'save':
+        return jsonify({'success': True})
+    elif action == 'next':
+        target = current_question + 1
+    elif action == 'previous':
+        target = max(0, current_question - 1)
+    elif action == 'finish':
+        target = total_questions
+    elif action != 'goto':
+        return jsonify({'error': 'Ação inválida'}), 400
+
+    if target >= total_questions:
+        return jsonify({'redirect': url_for('quiz.results', source='quiz')})
+    if target < 0:
+        return jsonify({'error': 'Pergunta inválida'}), 400
+
+    content_html = _render_question_content(question_ids, target)
+    if content_html is None:
+        return jsonify({'error': 'Erro ao carregar pergunta.'}), 500
+
+    return jsonify({
+        'question_num': target,
+        'html': content_html,
+        'title': _question_title(target, total_questions),
+        'page_title': _question_page_title(target, total_questions),
+        'url': url_for('quiz.question', question_num=target),
+    })
+
+@quiz_bp.route('/quiz/bundle')
+def quiz_bundle():
+    """
+    Returns every question of the current quiz attempt in one JSON payload.
+
+    With the bundle the player renders and navigates between questions locally and
+    only talks to the server again to post all answers to `/results`, so a quiz
+    costs two requests whatever its length. Each question carries the parsed options,
+    image URLs and formatting flags (`CompiledQuestion.as_client_dict`) but never its
+    scoring. The body is gzip-compressed when the client accepts it.
+
+    Returns:
+        JSON {'total_questions', 'questions': [...], 'answers': {...}}, where
+        'answers' holds what is already stored in the session, or a 400 error if
+        there is no quiz in progress.
+    """
+    if 'question_ids' not in session:
+        return jsonify({'error': 'Sessão de quiz não encontrada'}), 400
+
+    questions, missing_qids = get_compiled_questions(session['question_ids'])
+    if missing_qids:
+        # The bundle's indexes must match the session's question order
+        print(f"WARNING: Quiz bundle has missing question IDs: {missing_qids}", flush=True)
+        return jsonify({'error': 'Erro ao carregar perguntas.'}), 500
+
+    payload = json.dumps({
+        'total_questions': len(questions),
+        'questions': [q.as_client_dict() for q in questions],
+        'answers': session.get('user_answers', {}),
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    response = current_app.response_class(payload, mimetype='application/json')
+    if parse_accept_header(request.headers.get('Accept-Encoding'))['gzip']:
+        response.set_data(gzip.compress(payload, compresslevel=6))
+        response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+@quiz_bp.route('/results', methods=['POST'])
+def submit_results():
+    """
+    Stores all answers of a quiz at once and shows the results.
+
+    Used by the bundle-based player, which keeps the answers client-side until the
+    end. Accepts either a JSON body {"answers": {"0": ["1"], ...}} or a form field
+    'answers' holding the same object as a JSON string, then redirects (303) to
+    the regular `results` page.
+    """
+    if 'question_ids' not in session:
+        flash('Erro: Dados do quiz não encontrados. Por favor, inicie um novo quiz.', 'error')
+        return redirect(url_for('quiz.quiz_config'))
+
+    payload = request.get_json(silent=True)
+    if payload is None:
+        try:
+            payload = {'answers': json.loads(request.form.get('answers') or '{}')}
+        except ValueError:
+            payload = None
+    answers = payload.get('answers') if isinstance(payload, dict) else None
+
+    if not isinstance(answers, dict) or not _store_answers(answers, session['question_ids']):
+        flash('Erro: Respostas inválidas.', 'error')
+        return redirect(url_for('quiz.question', question_num=0))
+
+    session.setdefault('user_answers', {})
+    return redirect(url_for('quiz.results', source=request.args.get('source', 'quiz')), code=303)
+
 @quiz_bp.route('/results', methods=['GET'])
 def results():
     """
@@ -471,17 +472,16 @@ def results():
 
     This function orchestrates the end of the quiz process. It performs these steps:
     1.  Validates that the necessary quiz data (question IDs, user answers) exists in the session.
-    2.  Fetches the full data for each question from the database.
-    3.  Normalizes the question data into a consistent view model, ensuring that essential keys
-        like 'image_url' and 'options' are always present to prevent template errors.
-    4.  Calculates the user's score by passing the normalized questions and user answers to the
+    2.  Fetches the compiled question for every ID (`CompiledQuestion` objects, so options,
+        scoring and image URLs are already parsed and normalized).
+    3.  Calculates the user's score by passing the compiled questions and user answers to the
         `calculate_score` helper function.
-    5.  Handles both authenticated and anonymous users:
+    4.  Handles both authenticated and anonymous users:
         - If the user is not authenticated, it saves the quiz results to temporary storage
           and generates a unique UUID for them to view later.
-    6.  Renders the 'content/quiz_results.html' template, passing in the score, the list of
+    5.  Renders the 'content/quiz_results.html' template, passing in the score, the list of
         questions, user answers, and authentication status.
-    7.  Embeds the rendered content into the main 'index.html' layout.
+    6.  Embeds the rendered content into the main 'index.html' layout.
 
     Returns:
         A rendered HTML page with the quiz results, or a redirect if the session is invalid.
@@ -496,52 +496,15 @@ def results():
     quiz_config = session.get('quiz_config', {})
     source = request.args.get('source', 'unknown')
 
-    # 2) Load raw questions (sqlite3.Row) and convert to dict
-    raw_questions = []
-    for qid in question_ids:
-        q_row = getQuestionFromQid(qid)
-        if q_row:
-            raw_questions.append(dict(q_row))  # convert Row -> dict
-
-    # 3) Normalize each question into a consistent view model
-    #    - Ensure image_url exists
-    #    - Keep original imagem in case template wants a fallback
-    #    - Keep options/scoring as raw strings (your calculate_score already knows how to read them)
-    questions_fixed = []
-    for q in raw_questions:
-        q_fixed = dict(q)
-
-        # Guarantee image_url is present; DB now holds full path in 'imagem'
-        img = q_fixed.get('imagem', '') or ''
-        q_fixed['image_url'] = img
-
-        # Ensure required keys exist to avoid template KeyErrors
-        q_fixed.setdefault('type_of_answer', q_fixed.get('formatting', 'text'))
-        q_fixed.setdefault('is_multiple_choice', bool(q_fixed.get('is_multiple_choice', 0)))
-        q_fixed.setdefault('options', q_fixed.get('possible_answers', ''))
-        q_fixed.setdefault('scoring', q_fixed.get('scoring_system', ''))
-        q_fixed.setdefault('title', q_fixed.get('titulo'))
-        q_fixed.setdefault('note', q_fixed.get('nota'))
-
-        questions_fixed.append(q_fixed)
-
-    # print(questions_fixed)
-
-    # 4) Score using the normalized list (order preserved)
-    quiz_results = calculate_score(questions_fixed, user_answers)
-
-    # After: quiz_results = calculate_score(questions_fixed, user_answers)
-
-    if isinstance(quiz_results, dict) and quiz_results.get('question_results'):
-        qr0 = quiz_results['question_results'][0]
-        q0 = qr0.get('question', {})
-        # print('RESULTS FIRST IMG:', q0)
-    else:
-        # print('RESULTS payload has no question_results or is not a dict:', type(quiz_results))
-        pass
-    
+    # 2) Load compiled questions (one query for any that are not cached yet)
+    questions, missing_qids = get_compiled_questions(question_ids)
+    if missing_qids:
+        print(f"WARNING: Quiz results skipped missing question IDs: {missing_qids}", flush=True)
 
-    # 5) Auth and optional persistence
+    # 3) Score the compiled questions directly (order preserved)
+    quiz_results = calculate_score(questions, user_answers)
+
+    # 4) Auth and optional persistence
     email = session.get('metadata', {}).get('email', '') if session.get('metadata') else ''
     is_authenticated = bool(email)
     quiz_uuid = None
@@ -556,11 +519,11 @@ def results():
     # user = session.get('user')
     user = session and session.get("metadata")
 
-    # 6) Render the results content
+    # 5) Render the results content
     content_html = render_template(
         'content/quiz_results.html',
         results=quiz_results,
-        questions=questions_fixed,         # pass normalized list to template
+        questions=questions,
         user_answers=user_answers,
         quiz_uuid=quiz_uuid,
         is_authenticated=is_authenticated,
@@ -569,7 +532,7 @@ def results():
         config=quiz_config
     )
 
-    # 7) Wrap in main layout
+    # 6) Wrap in main layout
     return render_template(
         'index.html',
         admin_email=current_app.config.get('ADMIN_EMAIL', ''),
@@ -604,7 +567,7 @@ def view_quiz_result(quiz_uuid):
         A rendered HTML page with the quiz results, or a redirect if the result is not found.
     """
     from Funhelpers.quiz_storage import get_quiz_result as get_anonymous_quiz_result
-    from DBhelpers import getQuestionFromQid, get_quiz_history_by_uuid
+    from DBhelpers import get_quiz_history_by_uuid
     
     email = session.get('metadata', {}).get('email') if session.get('metadata') else ''
     is_authenticated = bool(email)
@@ -630,41 +593,37 @@ def view_quiz_result(quiz_uuid):
 
     # The key for answers is 'answers' for both DB and anonymous results now
     answers = quiz_data.get('answers', {})
-    timestamp = quiz_data['quiz_date']
+    timestamp = quiz_data.get('quiz_date') or quiz_data.get('timestamp')
     
     # Pass an empty dictionary for config when viewing from profile, as it's not needed for the requested button logic
     config = {}
 
     # Fetch full questions. The keys in 'answers' are question IDs (rowid).
-    questions = []
     answers_by_index = {}  # Rebuild as {index: [options]} for calculate_score
     
-    # Sort by question ID to maintain a consistent order
-    # print("answers:",answers)
-    answers = json.loads(answers)
-    sorted_qids = sorted([int(k) for k in answers.keys()])
-
-    for idx, qid in enumerate(sorted_qids):
-        question = getQuestionFromQid(qid)
-        if question:
-            questions.append(question)
-            answers_by_index[str(idx)] = answers[str(qid)]
+    # Binary, legacy JSON or already-decoded answers; decoded in question ID order
+    answers = decode_answers(answers)
+    sorted_qids = [int(k) for k in answers]
+
+    questions, missing_qids = get_compiled_questions(sorted_qids)
+    if missing_qids:
+        print(f"WARNING: Quiz {quiz_uuid} references missing question IDs: {missing_qids}", flush=True)
+    for idx, question in enumerate(questions):
+        answers_by_index[str(idx)] = answers[str(question.db_id)]
     
     if not questions:
         flash('Não foi possível carregar as perguntas do quiz.', 'error')
         return redirect(url_for('quiz.quiz_config'))
     
     # Calculate results
-    # Convert sqlite3.Row to dict for calculate_score
-    questions_as_dicts = [dict(q) for q in questions]
-    quiz_results = calculate_score(questions_as_dicts, answers_by_index)
+    quiz_results = calculate_score(questions, answers_by_index)
     
     user = session.get("metadata")
     
     content_html = render_template(
         'content/quiz_results.html',
         results=quiz_results,
-        questions=questions_as_dicts,
+        questions=questions,
         user_answers=answers_by_index,
         quiz_uuid=quiz_uuid,
         is_authenticated=is_authenticated,
@@ -6,10 +6,34 @@ Handles both development (local files) and production (CDN/remote URLs)
 from flask import Blueprint, send_from_directory, abort
 import os
 
+from Funhelpers.asset_manifest import ASSETS_ROOT, HASH_LENGTH, asset_manifest
+from Funhelpers.compression import skip_runtime_compression
+from Funhelpers.image_variants import VARIANT_FORMATS, VARIANTS_DIR, responsive_image
+from Funhelpers.quiz_helpers import make_url
+
 quiz_assets_bp = Blueprint('quiz_assets', __name__, url_prefix='')
 
-# Get the root directory where quiz-time folder is located
-ASSETS_ROOT = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'quiz-time')
+# Fingerprinted URLs change whenever the file does, so browsers may keep them forever
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@quiz_assets_bp.before_request
+def send_files_as_they_are():
+    """Quiz assets are images and files sent as stored: no gzip at runtime."""
+    skip_runtime_compression()
+
+
+@quiz_assets_bp.app_template_filter('asset_url')
+def asset_url_filter(rel):
+    """Jinja filter: URL of a quiz asset, fingerprinted when it is in the asset manifest."""
+    return make_url(rel)
+
+
+@quiz_assets_bp.app_template_global('responsive_image')
+def responsive_image_global(rel):
+    """Jinja global: srcset/dimensions of an image's pre-generated variants, or None."""
+    return responsive_image(rel)
+
 
 @quiz_assets_bp.route('/quiz-time/<path:filename>')
 def serve_quiz_asset(filename):
@@ -21,6 +45,9 @@ def serve_quiz_asset(filename):
     sequences ('..'). If a traversal attempt is detected, it aborts the request with a 404
     error.
 
+    Assets listed in the asset manifest get their SHA-256 as a strong ETag, so a browser
+    revalidating its copy (If-None-Match) gets a 304 without the file being sent again.
+
     Args:
         filename (str): The path to the asset within the 'quiz-time' directory.
 
@@ -32,4 +59,57 @@ def serve_quiz_asset(filename):
     if safe.startswith('..'):
         abort(404)
     # print(f"DEBUG: Serving quiz asset: {filename} from {ASSETS_ROOT}")
-    return send_from_directory(ASSETS_ROOT, safe)
+    entry = asset_manifest.current(safe.replace(os.sep, '/'))
+    response = send_from_directory(ASSETS_ROOT, safe, etag=entry['sha256'] if entry else True, max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@quiz_assets_bp.route(f'/quiz-time/<string(length={HASH_LENGTH}):digest>/<path:filename>')
+def serve_fingerprinted_quiz_asset(digest, filename):
+    """
+    Serves a quiz asset requested by its fingerprinted URL ('/quiz-time/<hash>/<path>').
+
+    If `digest` is the current content hash of `filename` (see
+    `Funhelpers.asset_manifest.fingerprinted_path`), the file is sent with a one-year,
+    immutable Cache-Control. Otherwise the request is handled as a plain asset path:
+    an outdated hash gets the current file (revalidated like a bare path), and a
+    12-character folder name is just part of the path.
+
+    Args:
+        digest (str): The content hash from the URL.
+        filename (str): The path to the asset within the 'quiz-time' directory.
+    """
+    safe = os.path.normpath(filename)
+    if safe.startswith('..'):
+        abort(404)
+    entry = asset_manifest.current(safe.replace(os.sep, '/'))
+    if entry is None:
+        if asset_manifest.get(safe.replace(os.sep, '/')) is None:
+            return serve_quiz_asset(f"{digest}/{filename}")
+        return serve_quiz_asset(filename)
+    if entry['hash'] != digest:
+        return serve_quiz_asset(filename)
+    response = send_from_directory(ASSETS_ROOT, safe, etag=entry['sha256'], max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+@quiz_assets_bp.route(f'/image-cache/<string(length={HASH_LENGTH}):digest>/<int:width>.<fmt>')
+def serve_image_variant(digest, width, fmt):
+    """
+    Serves a pre-generated image variant (see `Funhelpers.image_variants`).
+
+    Variants live under the content hash of their source image, so they never
+    change and are sent with a one-year, immutable Cache-Control.
+
+    Args:
+        digest (str): Content hash of the source image.
+        width (int): Variant width in pixels.
+        fmt (str): 'webp' or 'png'.
+    """
+    if fmt not in VARIANT_FORMATS or not digest.isalnum():
+        abort(404)
+    response = send_from_directory(os.path.join(VARIANTS_DIR, digest), f'{width}.{fmt}', max_age=31536000)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
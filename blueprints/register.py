@@ -20,7 +20,6 @@ from DBhelpers import (
     getRegistrationToken,
     getRegistrationTokenByEmailOrIP,
     deleteRegistrationToken,
-    deleteExpiredRegistrationTokens,
     isIpBlacklisted,
 )
 import re
@@ -29,13 +28,31 @@ import re
 bp_register = Blueprint("register", __name__, url_prefix="/register")
 
 
+def _has_pending_registration(email, ip_addr):
+    """
+    True if the email or IP already has a registration token that has not expired.
+
+    Expired tokens are deleted by the maintenance scheduler, not on each
+    request, so one can still be in the table here; it is ignored, as
+    `confirm_token` would reject it (the token carries its own timestamp).
+    """
+    found = getRegistrationTokenByEmailOrIP(email, ip_addr)
+    if not found:
+        return False
+    rows = found if isinstance(found, (list, tuple)) else [found]
+    for row in rows:
+        token = row.get("token") if isinstance(row, dict) else None
+        if token is None or confirm_token(token):
+            return True
+    return False
+
+
 @bp_register.route("/", methods=["GET", "POST"])
 def request_confirmation():
     """
     Handles the initial step of user registration by requesting email confirmation.
     """
     if request.method == "POST":
-        deleteExpiredRegistrationTokens()
         email = request.form.get("email")
 
         if email:
@@ -61,7 +78,7 @@ def request_confirmation():
             flash("Este endereço de email não poderá receber mais pedidos.")
             return redirect(url_for("register.request_confirmation"))
 
-        if getRegistrationTokenByEmailOrIP(email, ip_addr):
+        if _has_pending_registration(email, ip_addr):
             flash("Este ip/email já fez pedido de uma conta nova.")
             return redirect(url_for("register.request_confirmation"))
 
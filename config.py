@@ -89,6 +89,36 @@ class Config:
     LOCAL_MAIL_RELAY_KEY = _get("LOCAL_MAIL_RELAY_KEY", "/home/ec2-user/.ssh/ec2_internal")
     LOCAL_MAIL_RELAY_USER = _get("LOCAL_MAIL_RELAY_USER", "ec2-user")
 
+    # Server-side sessions: "sqlite" (default), "memory" or "cookie" (Flask's signed cookie)
+    SESSION_BACKEND = _get("SESSION_BACKEND", "sqlite")
+    SESSION_SQLITE_PATH = _get("SESSION_SQLITE_PATH", "sessions.db")
+
+    # Background housekeeping (Funhelpers/maintenance.py); intervals in seconds
+    MAINTENANCE_RESULTS_INTERVAL = int(_get("MAINTENANCE_RESULTS_INTERVAL", "300"))
+    MAINTENANCE_TOKENS_INTERVAL = int(_get("MAINTENANCE_TOKENS_INTERVAL", "900"))
+    MAINTENANCE_SPOOL_INTERVAL = int(_get("MAINTENANCE_SPOOL_INTERVAL", "60"))
+    # Question cache hit/miss/eviction counters are logged by every worker
+    MAINTENANCE_CACHE_STATS_INTERVAL = int(_get("MAINTENANCE_CACHE_STATS_INTERVAL", "3600"))
+    MAINTENANCE_LOCK_DIR = _get("MAINTENANCE_LOCK_DIR")
+    # Start the scheduler on the first request (server.py also starts it at boot)
+    MAINTENANCE_AUTOSTART = (_get("MAINTENANCE_AUTOSTART", "True") == "True")
+
+    # Anonymous quiz results (Funhelpers/quiz_storage.py): "sqlite" or "segments"
+    QUIZ_RESULTS_BACKEND = _get("QUIZ_RESULTS_BACKEND", "sqlite").lower()
+    # Queue quiz saves and group-commit them from one writer thread; interval in ms
+    QUIZ_WRITE_BEHIND = (_get("QUIZ_WRITE_BEHIND", "True") not in ("False", "0"))
+    QUIZ_WRITE_BEHIND_INTERVAL_MS = float(_get("QUIZ_WRITE_BEHIND_INTERVAL_MS", "5"))
+    QUIZ_WRITE_BEHIND_BATCH = int(_get("QUIZ_WRITE_BEHIND_BATCH", "64"))
+    QUIZ_WRITE_BEHIND_RETRIES = int(_get("QUIZ_WRITE_BEHIND_RETRIES", "3"))
+
+    # On-the-fly gzip of dynamic HTML/JSON (Funhelpers/compression.py); min size in bytes, level 1-9
+    COMPRESS_RESPONSES = (_get("COMPRESS_RESPONSES", "True") == "True")
+    COMPRESSION_MIN_SIZE = int(_get("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_LEVEL = int(_get("COMPRESSION_LEVEL", "6"))
+
+    # Serve the minified CSS bundles (flask build-css-bundles) instead of the @import chain; off in debug mode
+    USE_CSS_BUNDLES = (_get("USE_CSS_BUNDLES", "True") == "True")
+
     # Optional secondary secret items
     SECURITY_PASSWORD_SALT = _get("SECURITY_PASSWORD_SALT")
 
@@ -159,6 +189,9 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     DEBUG = True
+    SESSION_BACKEND = "memory"
+    MAINTENANCE_AUTOSTART = False
+    QUIZ_WRITE_BEHIND = False
 
 
 config = {
@@ -3,8 +3,14 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../mysql')))
 
+import click
 from flask import Flask, redirect, render_template, request
 from Funhelpers import mail
+from Funhelpers.server_session import init_session_backend
+from Funhelpers.maintenance import init_maintenance
+from Funhelpers.compression import init_compression
+from Funhelpers.css_bundles import init_css_bundles
+from Funhelpers.math_assets import init_math
 from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -31,6 +37,9 @@ def create_app(config_name=None):
     from config import config
     app.config.from_object(config[config_name])
     app.config["PREFERRED_URL_SCHEME"] = "https"
+
+    # Keep session data server-side; the cookie only carries a signed session ID
+    init_session_backend(app)
     
     # Initialize Rate Limiter
     limiter = Limiter(
@@ -41,6 +50,18 @@ def create_app(config_name=None):
         default_limits_exempt_when=lambda: request.path.startswith('/static/') or request.method != 'GET'
     )
     
+    # Housekeeping jobs (expired results/tokens); started by server.py
+    init_maintenance(app)
+
+    # Precompressed static files and gzip of large HTML/JSON responses
+    init_compression(app)
+
+    # url_for('static') of the entry stylesheets resolves to their hashed bundles
+    init_css_bundles(app)
+
+    # KaTeX is loaded only by pages that call use_math(), from static/vendor
+    init_math(app)
+
     # Initialize Flask-Mail via the extension pattern to avoid assigning new attributes on Flask
     mail.init_app(app)
     # print("Mail state after init_app:", mail.state)
@@ -125,6 +146,118 @@ def send_email_command():
     except Exception as e:
         print(f"Error sending email via CLI: {e}", file=sys.stderr, flush=True)
         sys.exit(1)
+
+@app.cli.command("run-maintenance")
+@click.argument("jobs", nargs=-1)
+def run_maintenance_command(jobs):
+    """Run maintenance jobs now (all of them if none are named)."""
+    scheduler = app.extensions['maintenance']
+    unknown = [name for name in jobs if name not in scheduler.jobs]
+    if unknown:
+        print(f"Unknown maintenance jobs: {', '.join(unknown)}. Available: {', '.join(scheduler.jobs)}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    for name in jobs or scheduler.jobs:
+        ran = scheduler.run_job(name)
+        stats = scheduler.stats()[name]
+        if not ran:
+            print(f"{name}: skipped (already running)", flush=True)
+        elif stats['last_error']:
+            print(f"{name}: failed: {stats['last_error']}", flush=True)
+        else:
+            print(f"{name}: {stats['last_result']} ({stats['max_seconds'] * 1000:.1f} ms)", flush=True)
+    from Funhelpers.quiz_storage import get_result_writer
+    writer = get_result_writer().stats()
+    print("write-behind: " + ", ".join(f"{key} {value}" for key, value in writer.items()), flush=True)
+
+@app.cli.command("rescore-quiz-history")
+@click.argument("emails", nargs=-1)
+@click.option("--emails-file", type=click.File("r"), help="Read more emails from this file, one per line ('-' for stdin).")
+@click.option("--all", "show_all", is_flag=True, help="List every quiz, not only those whose score changed.")
+def rescore_quiz_history_command(emails, emails_file, show_all):
+    """Re-score users' stored quizzes against the current scoring_system and print them as CSV."""
+    import csv
+    from DBhelpers import get_quiz_history_for_user
+    from Funhelpers.quiz_helpers import rescore_user_histories
+    if emails_file:
+        emails += tuple(line.strip() for line in emails_file if line.strip())
+    emails = list(dict.fromkeys(emails))
+    rescored = rescore_user_histories(emails, get_quiz_history_for_user)
+    changed = [
+        row for row in rescored
+        if row['stored_percentage'] is None or round(float(row['stored_percentage']), 1) != row['percentage']
+    ]
+    fields = ['email', 'q_uuid', 'stored_percentage', 'percentage', 'total_points', 'max_possible_points',
+              'n_correct', 'n_wrong', 'n_skip', 'total_questions']
+    writer = csv.DictWriter(sys.stdout, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rescored if show_all else changed)
+    print(f"Re-scored {len(rescored)} quizzes of {len(emails)} users; {len(changed)} changed", file=sys.stderr, flush=True)
+
+@app.cli.command("reload-quiz-bank")
+@click.option("--force", is_flag=True, help="Rebuild every table from scratch and skip the shrinkage check.")
+def reload_quiz_bank_command(force):
+    """Rebuild quiz.db from the quiz-time CSVs and swap it in without downtime (recompiling quiz.bank if there is one)."""
+    import DBloadQuiz
+    try:
+        swapped = DBloadQuiz.rebuild_quiz_bank(force=force)
+    except ValueError as e:
+        print(f"New quiz bank rejected, keeping the current one: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    if swapped:
+        print("Quiz bank swapped in; running servers pick it up on their next request", flush=True)
+
+@app.cli.command("compile-quiz-bank")
+def compile_quiz_bank_command():
+    """Compile quiz-time/ into quiz.bank, the read-only bank the server maps instead of quiz.db."""
+    import DBloadQuiz
+    try:
+        DBloadQuiz.compile_quiz_bank()
+    except ValueError as e:
+        print(f"Quiz bank not compiled: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+
+@app.cli.command("build-asset-manifest")
+def build_asset_manifest_command():
+    """Hash the quiz-time assets so their URLs can be fingerprinted and cached forever."""
+    from Funhelpers.asset_manifest import MANIFEST_PATH, build_asset_manifest
+    n_assets, n_hashed = build_asset_manifest()
+    print(f"Asset manifest: {n_assets} assets ({n_hashed} hashed) -> {MANIFEST_PATH}", flush=True)
+
+@app.cli.command("build-image-variants")
+def build_image_variants_command():
+    """Generate resized WebP/PNG variants of new or changed images (after build-asset-manifest)."""
+    from Funhelpers.asset_manifest import build_asset_manifest
+    from Funhelpers.image_variants import VARIANTS_DIR, build_image_variants
+    build_asset_manifest()
+    n_images, n_processed = build_image_variants()
+    print(f"Image variants: {n_images} images ({n_processed} processed) -> {VARIANTS_DIR}", flush=True)
+
+@app.cli.command("build-css-bundles")
+def build_css_bundles_command():
+    """Bundle and minify the entry stylesheets (resolving @import) into hashed files under static/dist."""
+    from Funhelpers.css_bundles import build_css_bundles
+    for entry, bundle in build_css_bundles(app.static_folder).items():
+        print(f"CSS bundle: {entry} -> {bundle}", flush=True)
+
+@app.cli.command("install-math-assets")
+@click.option("--tarball", type=click.Path(exists=True, dir_okay=False), help="Use a local copy of the KaTeX npm package instead of downloading it.")
+def install_math_assets_command(tarball):
+    """Download (or unpack) the pinned KaTeX release into static/vendor."""
+    from Funhelpers.math_assets import KATEX_VERSION, MATH_ASSETS_DIR, install_math_assets
+    try:
+        n_files = install_math_assets(tarball)
+    except (OSError, ValueError) as e:
+        print(f"KaTeX {KATEX_VERSION} not installed: {e}", file=sys.stderr, flush=True)
+        sys.exit(1)
+    print(f"KaTeX {KATEX_VERSION}: {n_files} files -> {MATH_ASSETS_DIR}", flush=True)
+
+@app.cli.command("precompress-static")
+def precompress_static_command():
+    """Write .gz/.br siblings of new or changed static text files (CSS, JS, SVG...)."""
+    from Funhelpers.compression import precompress_static
+    n_files, n_written = precompress_static(app.static_folder)
+    print(f"Precompressed static: {n_files} files ({n_written} siblings written) -> {app.static_folder}", flush=True)
+
 app.wsgi_app = ProxyFix(
     app.wsgi_app,
     x_for=1,      # Number of values to trust in X-Forwarded-For
@@ -136,6 +269,7 @@ app.wsgi_app = ProxyFix(
 
 
 if __name__ == '__main__':
+    app.extensions['maintenance'].start()
     app.run()
 
 # with app.app_context():
@@ -82,10 +82,15 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.getcwd(), '../mysql')));\
 from DBhelpers import DBbaseline;\
 import DBloadQuiz;\
 DBbaseline.setup_mysql_database(app_name=\"explicolivais\");\
-DBloadQuiz.loadQanswers();\
-DBloadQuiz.loadQlinks();\
-DBloadQuiz.loadQtemas();\
-DBloadQuiz.loadQaulas();\
+DBloadQuiz.rebuild_quiz_bank();\
+from Funhelpers.asset_manifest import build_asset_manifest;\
+build_asset_manifest();\
+from Funhelpers.image_variants import build_image_variants;\
+build_image_variants();\
+from Funhelpers.css_bundles import build_css_bundles;\
+build_css_bundles();\
+from Funhelpers.compression import precompress_static;\
+precompress_static();\
 "
 
 echo -e "   ✅ Tables are now up and running"
@@ -6,6 +6,11 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../mysql')))
 from DBhelpers import DBbaseline
 import DBloadQuiz
+import DBreadQuiz
+from Funhelpers.asset_manifest import build_asset_manifest
+from Funhelpers.image_variants import build_image_variants
+from Funhelpers.css_bundles import build_css_bundles
+from Funhelpers.compression import precompress_static
 
 import os
 import logging
@@ -16,10 +21,14 @@ logging.getLogger('waitress.queue').setLevel(logging.ERROR)
 
 if __name__ == '__main__':
     DBbaseline.setup_mysql_database(app_name="explicolivais");
-    DBloadQuiz.loadQanswers();
-    DBloadQuiz.loadQlinks();
-    DBloadQuiz.loadQtemas();
-    DBloadQuiz.loadQaulas();
+    # Also recompiles quiz.bank (flask compile-quiz-bank) if its sources changed
+    DBloadQuiz.ensure_quiz_bank()
+    build_asset_manifest()
+    build_image_variants()
+    build_css_bundles(app.static_folder)
+    precompress_static(app.static_folder)
+    DBreadQuiz.question_index.refresh()
+    app.extensions['maintenance'].start()
     
     # For production use waitress to serve the app
     print("🚀 Starting Explicolivais Waitress Server on port 8080...", flush=True)
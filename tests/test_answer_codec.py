@@ -0,0 +1,116 @@
+import base64
+import json
+
+import pytest
+
+from Funhelpers.answer_codec import (
+    FORMAT_VERSION,
+    MAX_OPTION_INDEX,
+    TEXT_PREFIX,
+    decode_answers,
+    encode_answers,
+    encode_answers_text,
+)
+
+ANSWERS = {
+    "1234": ["0"],
+    "1235": ["2", "3"],
+    "7": ["1"],
+    "1000000": ["0", "5", "63"],
+    "1236": [],
+}
+
+
+def test_binary_round_trip_sorts_by_qid():
+    decoded = decode_answers(encode_answers(ANSWERS))
+    assert decoded == {qid: ANSWERS[qid] for qid in sorted(ANSWERS, key=int)}
+    assert list(decoded) == sorted(ANSWERS, key=int)
+
+
+def test_text_round_trip():
+    text = encode_answers_text(ANSWERS)
+    assert text.startswith(TEXT_PREFIX)
+    assert text.isascii() and '=' not in text
+    assert decode_answers(text) == decode_answers(encode_answers(ANSWERS))
+
+
+def test_binary_is_smaller_than_json():
+    answers = {str(1000 + i): [str(i % 4)] for i in range(100)}
+    assert len(encode_answers_text(answers)) < len(json.dumps(answers)) / 3
+
+
+def test_option_order_and_duplicates_are_not_kept():
+    assert decode_answers(encode_answers({"5": ["3", "1", "3"]})) == {"5": ["1", "3"]}
+
+
+@pytest.mark.parametrize("value", [
+    encode_answers(ANSWERS),
+    bytearray(encode_answers(ANSWERS)),
+    memoryview(encode_answers(ANSWERS)),
+])
+def test_decodes_binary_buffers(value):
+    assert decode_answers(value) == decode_answers(encode_answers(ANSWERS))
+
+
+def test_legacy_json_text():
+    legacy = json.dumps({"12": ["1", "2"], "3": "0", "100": [4]})
+    assert decode_answers(legacy) == {"3": ["0"], "12": ["1", "2"], "100": ["4"]}
+
+
+def test_legacy_json_bytes_and_dict():
+    legacy = {"12": ["1"], "3": ["0"]}
+    assert decode_answers(json.dumps(legacy).encode('utf-8')) == {"3": ["0"], "12": ["1"]}
+    assert decode_answers(legacy) == {"3": ["0"], "12": ["1"]}
+
+
+def test_legacy_json_matches_new_encoding():
+    legacy = json.dumps(ANSWERS)
+    assert decode_answers(legacy) == decode_answers(encode_answers_text(ANSWERS))
+
+
+@pytest.mark.parametrize("value", [None, "", "{}", b""])
+def test_empty_values(value):
+    assert decode_answers(value) == {}
+
+
+def test_bare_string_answers_are_single_options():
+    assert decode_answers(encode_answers({"9": "2"})) == {"9": ["2"]}
+
+
+def test_non_integer_answers_fall_back_to_json():
+    answers = {"q1": ["a"], "2": ["1"]}
+    text = encode_answers_text(answers)
+    assert not text.startswith(TEXT_PREFIX)
+    assert decode_answers(text) == {"2": ["1"], "q1": ["a"]}
+
+
+@pytest.mark.parametrize("answers", [
+    {"-1": ["0"]},
+    {"1": ["-2"]},
+    {"x": ["0"]},
+    {"1": [str(MAX_OPTION_INDEX + 1)]},
+    {"1": ["3000000"]},
+])
+def test_encode_rejects_invalid(answers):
+    with pytest.raises(ValueError):
+        encode_answers(answers)
+
+
+def test_unknown_version_is_rejected():
+    data = bytes([FORMAT_VERSION + 1]) + encode_answers(ANSWERS)[1:]
+    with pytest.raises(ValueError):
+        decode_answers(TEXT_PREFIX + base64.urlsafe_b64encode(data).decode('ascii'))
+
+
+def test_huge_option_index_falls_back_to_json():
+    answers = {"1": ["3000000"], "2": [str(MAX_OPTION_INDEX)]}
+    text = encode_answers_text(answers)
+    assert not text.startswith(TEXT_PREFIX)
+    assert len(text) < 100
+    assert decode_answers(text) == answers
+
+
+def test_overlong_varint_is_rejected():
+    data = bytes([FORMAT_VERSION, 1, 1]) + b'\xff' * 20 + b'\x01'
+    with pytest.raises(ValueError):
+        decode_answers(data)
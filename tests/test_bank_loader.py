@@ -0,0 +1,161 @@
+import csv
+import os
+import sqlite3
+
+import pytest
+
+import DBloadQuiz
+
+RESPONSE_COLUMNS = [
+    'ano', 'num_tema', 'num_aula', 'uuid', 'question_number', 'titulo', 'nota',
+    'possible_answers', 'scoring_system', 'formatting', 'is_multiple_choice', 'type_of_problem',
+]
+
+
+def _response(uuid, number, titulo='T'):
+    return [5, 1, 1, uuid, number, titulo, '', "Não sei, '\\frac{1,2}', b", '0,1,-0.5', 'latex', 0, 'single']
+
+
+def _write_csv(path, header, rows):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    """A two-file quiz-time bank in a scratch working directory; returns the answer files."""
+    monkeypatch.chdir(tmp_path)
+    files = []
+    for aula in (1, 2):
+        path = os.path.join('quiz-time', 'anos', 'ano5', 'tema1', f'aula{aula}', f'an{aula}.csv')
+        rows = [_response(f'u{aula}-{i}', i + 1) for i in range(5)]
+        for row in rows:
+            row[2] = aula
+        _write_csv(path, RESPONSE_COLUMNS, rows)
+        files.append(path)
+    uuids = [f'u{aula}-{i}' for aula in (1, 2) for i in range(5)]
+    _write_csv(os.path.join('quiz-time', 'links.csv'), ['uuid', 'imagem'], [[u, f'img/{u}.png'] for u in uuids])
+    _write_csv(os.path.join('quiz-time', 'temas.csv'), ['ano', 'num_tema', 'nome_tema'], [[5, 1, 'Tema']])
+    _write_csv(os.path.join('quiz-time', 'aulas.csv'), ['ano', 'num_tema', 'num_aula', 'aula_title'],
+               [[5, 1, 1, 'Aula 1'], [5, 1, 2, 'Aula 2']])
+    return files
+
+
+def _ids(db_path='quiz.db'):
+    conn = sqlite3.connect(db_path)
+    try:
+        return {uuid: rowid for rowid, uuid in conn.execute('SELECT rowid, uuid FROM responses')}
+    finally:
+        conn.close()
+
+
+def _edit(path, edit):
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    edit(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_rebuild_loads_every_table(bank):
+    assert DBloadQuiz.rebuild_quiz_bank('quiz.db') is True
+    conn = sqlite3.connect('quiz.db')
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0] == 10
+        assert conn.execute(f'SELECT COUNT(*) FROM "{DBloadQuiz.QUESTIONS_VIEW}"').fetchone()[0] == 10
+        assert conn.execute(
+            f'SELECT nome_tema, aula_title, imagem FROM "{DBloadQuiz.QUESTIONS_VIEW}" WHERE uuid = ?', ('u2-0',)
+        ).fetchone() == ('Tema', 'Aula 2', 'img/u2-0.png')
+    finally:
+        conn.close()
+    assert DBloadQuiz.rebuild_quiz_bank('quiz.db') is False
+
+
+def test_question_ids_survive_edits_and_forced_rebuilds(bank):
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    before = _ids()
+
+    def edit(rows):
+        rows[1][5] = 'T2'
+        rows.insert(1, _response('new', 9))
+
+    _edit(bank[0], edit)
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    after = _ids()
+    assert all(after[uuid] == qid for uuid, qid in before.items())
+    assert after['new'] == max(before.values()) + 1
+
+    DBloadQuiz.rebuild_quiz_bank('quiz.db', force=True)
+    assert _ids() == after
+
+    _edit(bank[0], lambda rows: rows.pop(1))
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    assert 'new' not in _ids()
+    _edit(bank[0], lambda rows: rows.insert(1, _response('new', 9)))
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    assert _ids()['new'] == after['new']
+
+
+def test_rejected_bank_keeps_the_live_one(bank):
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    before = _ids()
+    _edit(bank[0], lambda rows: rows.__delitem__(slice(1, None)))
+    _edit(bank[1], lambda rows: rows.__delitem__(slice(1, None)))
+    with pytest.raises(ValueError):
+        DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    assert _ids() == before
+    assert not os.path.exists('quiz.db.new')
+
+
+def test_failed_load_into_live_database_rolls_back(bank, monkeypatch):
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    conn = sqlite3.connect('quiz.db')
+    conn.execute(f"DELETE FROM {DBloadQuiz.MANIFEST_TABLE} WHERE table_name = 'temas'")
+    conn.commit()
+    conn.close()
+
+    def fail(*args, **kwargs):
+        raise RuntimeError('insert failed')
+
+    monkeypatch.setattr(DBloadQuiz, '_insert_rows', fail)
+    with pytest.raises(RuntimeError):
+        DBloadQuiz.loadQcsvFiles(DBloadQuiz._bank_sources()['temas'], 'quiz.db', 'temas')
+    conn = sqlite3.connect('quiz.db')
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM temas').fetchone()[0] == 1
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] != 'off'
+    finally:
+        conn.close()
+
+
+def test_stale_compiled_bank_is_recompiled(bank):
+    DBloadQuiz.compile_quiz_bank('quiz.db')
+    assert DBloadQuiz.compiled_bank_up_to_date('quiz.db')
+
+    _edit(bank[1], lambda rows: rows.append(_response('late', 7)))
+    assert not DBloadQuiz.compiled_bank_up_to_date('quiz.db')
+    DBloadQuiz.rebuild_quiz_bank('quiz.db')
+    assert DBloadQuiz.compiled_bank_up_to_date('quiz.db')
+    conn = sqlite3.connect('quiz.bank')
+    try:
+        assert conn.execute("SELECT qid FROM questions WHERE uuid = 'late'").fetchone()[0] == _ids()['late']
+    finally:
+        conn.close()
+
+
+def test_touched_sources_are_hashed_once(bank, monkeypatch):
+    DBloadQuiz.compile_quiz_bank('quiz.db')
+    for path in bank:
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert DBloadQuiz.ensure_quiz_bank('quiz.db') is False
+
+    def fail(path):
+        raise AssertionError(f'{path} hashed again')
+
+    monkeypatch.setattr(DBloadQuiz, '_file_hash', fail)
+    assert DBloadQuiz.ensure_quiz_bank('quiz.db') is False
+    assert DBloadQuiz.compiled_bank_up_to_date('quiz.db')
@@ -0,0 +1,71 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+from blueprints import quiz_assets
+from Funhelpers.compression import init_compression, precompress_static
+
+CSS = b'body { color: red; }\n' * 200
+PAGE = '<p>' + 'quiz ' * 1000 + '</p>'
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    static = tmp_path / 'static'
+    static.mkdir()
+    (static / 'packed.css').write_bytes(CSS)
+    (static / 'stale.css').write_bytes(CSS)
+    precompress_static(str(static))
+    (static / 'late.css').write_bytes(CSS)
+    os.utime(static / 'stale.css', ns=(0, (static / 'stale.css.gz').stat().st_mtime_ns + 10**9))
+
+    assets = tmp_path / 'quiz-time'
+    assets.mkdir()
+    (assets / 'notes.txt').write_bytes(CSS)
+    monkeypatch.setattr(quiz_assets, 'ASSETS_ROOT', str(assets))
+    monkeypatch.setattr(quiz_assets.asset_manifest, 'current', lambda key: None)
+
+    app = Flask(__name__, static_folder=str(static))
+    app.register_blueprint(quiz_assets.quiz_assets_bp)
+
+    @app.route('/page')
+    def page():
+        response = app.response_class(PAGE, mimetype='text/html')
+        response.set_etag('page-v1')
+        return response
+
+    init_compression(app)
+    return app
+
+
+def _get(app, path, encoding='gzip, br'):
+    return app.test_client().get(path, headers={'Accept-Encoding': encoding})
+
+
+def test_dynamic_responses_are_gzipped_with_a_weak_etag(app):
+    response = _get(app, '/page')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'] == 'W/"page-v1"'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data).decode() == PAGE
+
+
+def test_identity_response_keeps_its_strong_etag(app):
+    response = _get(app, '/page', encoding='identity')
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['ETag'] == '"page-v1"'
+
+
+def test_static_file_is_sent_from_its_sibling(app):
+    response = _get(app, '/static/packed.css', encoding='gzip')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == CSS
+
+
+@pytest.mark.parametrize('path', ['/static/late.css', '/static/stale.css', '/quiz-time/notes.txt'])
+def test_files_without_fresh_sibling_are_not_compressed_at_runtime(app, path):
+    response = _get(app, path, encoding='gzip')
+    assert 'Content-Encoding' not in response.headers
+    assert response.data == CSS
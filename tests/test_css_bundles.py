@@ -0,0 +1,136 @@
+import json
+import os
+import re
+
+import pytest
+from flask import Flask, url_for
+
+from Funhelpers import css_bundles
+from Funhelpers.css_bundles import build_css_bundles, init_css_bundles, minify_css, resolve_imports
+
+STYLE = """\
+@import url("https://fonts.example.com/css?family=Inter");
+/* The cascade: @import 'ignored.css'; */
+@import 'base.css' layer(base);
+@import url(layout/layout.css) layer;
+@import "dark.css" screen and (prefers-color-scheme: dark);
+body { background: url('img/bg.png'); }
+"""
+LAYOUT = """\
+@import 'grid.css';
+.menu a { background: url("../img/menu.svg") ; }
+"""
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    styles = tmp_path / 'static' / 'styles'
+    (styles / 'layout').mkdir(parents=True)
+    (styles / 'style.css').write_text(STYLE)
+    (styles / 'base.css').write_text('html { font-family: "Inter", sans-serif; }\n')
+    (styles / 'layout' / 'layout.css').write_text(LAYOUT)
+    (styles / 'layout' / 'grid.css').write_text('.grid { width: calc(100% - 2rem); }\n')
+    (styles / 'dark.css').write_text(':root { --bg: #000; }\n')
+    (styles / 'theme-switcher.css').write_text('.toggle > span { color: red; }\n')
+    return tmp_path / 'static'
+
+
+def test_resolve_imports_inlines_layers_and_media(static_dir):
+    styles = static_dir / 'styles'
+    css, sources = resolve_imports(str(styles / 'style.css'), str(static_dir / 'dist'))
+
+    assert css.startswith('@import url("https://fonts.example.com/css?family=Inter");')
+    assert 'ignored.css' not in css
+    assert '@layer base {\nhtml { font-family: "Inter", sans-serif; }' in css
+    assert re.search(r'@layer\s*\{\n\.grid', css)
+    assert '@media screen and (prefers-color-scheme: dark) {\n:root { --bg: #000; }' in css
+    assert "url('../styles/img/bg.png')" in css
+    assert 'url("../styles/img/menu.svg")' in css
+    assert sorted(os.path.relpath(path, styles) for path in sources) == [
+        'base.css', 'dark.css',
+        os.path.join('layout', 'grid.css'), os.path.join('layout', 'layout.css'),
+        'style.css',
+    ]
+
+
+def test_resolve_imports_rejects_cycles(tmp_path):
+    (tmp_path / 'a.css').write_text("@import 'b.css';\n")
+    (tmp_path / 'b.css').write_text("@import 'a.css';\n")
+    with pytest.raises(ValueError, match='cycle'):
+        resolve_imports(str(tmp_path / 'a.css'), str(tmp_path))
+
+
+def test_minify_keeps_strings_and_descendant_selectors():
+    css = '/* c */ .menu  a ,\n.x > .y {\n  content: "a  ;  b" ;\n  width: calc(100% - 2rem);\n}\n'
+    assert minify_css(css) == '.menu a,.x>.y{content:"a  ;  b";width:calc(100% - 2rem)}'
+
+
+def test_build_css_bundles_writes_hashed_bundles_and_manifest(static_dir):
+    bundles = build_css_bundles(str(static_dir))
+    assert set(bundles) == {'styles/style.css', 'styles/theme-switcher.css'}
+    style = static_dir / bundles['styles/style.css']
+    assert bundles['styles/style.css'].startswith('dist/style.')
+    assert '\n' not in style.read_text()
+    assert '@layer base{html{font-family:"Inter",sans-serif}}' in style.read_text()
+
+    manifest = json.loads((static_dir / 'dist' / 'manifest.json').read_text())
+    assert manifest['version'] == css_bundles.MANIFEST_VERSION
+    assert manifest['bundles'] == bundles
+    assert manifest['sources']['styles/theme-switcher.css'] == ['styles/theme-switcher.css']
+    assert 'styles/layout/grid.css' in manifest['sources']['styles/style.css']
+
+
+def test_rebuild_replaces_changed_bundles(static_dir):
+    old = build_css_bundles(str(static_dir))
+    assert build_css_bundles(str(static_dir)) == old
+
+    (static_dir / 'styles' / 'dark.css').write_text(':root { --bg: #111; }\n')
+    new = build_css_bundles(str(static_dir))
+    assert new['styles/style.css'] != old['styles/style.css']
+    assert new['styles/theme-switcher.css'] == old['styles/theme-switcher.css']
+    assert not (static_dir / old['styles/style.css']).exists()
+    assert sorted(os.listdir(static_dir / 'dist')) == sorted(
+        [os.path.basename(path) for path in new.values()] + ['manifest.json']
+    )
+
+
+def _app(static_dir, debug=False, use_bundles=True):
+    app = Flask(__name__, static_folder=str(static_dir))
+    app.debug = debug
+    app.config.update(USE_CSS_BUNDLES=use_bundles, SERVER_NAME='localhost')
+    init_css_bundles(app)
+    return app
+
+
+def _style_url(app):
+    with app.app_context():
+        return url_for('static', filename='styles/style.css')
+
+
+def test_url_for_points_at_the_bundle(static_dir):
+    bundles = build_css_bundles(str(static_dir))
+    app = _app(static_dir)
+    assert _style_url(app) == f"http://localhost/static/{bundles['styles/style.css']}"
+    with app.app_context():
+        assert url_for('static', filename='styles/base.css').endswith('/static/styles/base.css')
+
+    response = app.test_client().get(f"/static/{bundles['styles/style.css']}")
+    assert response.headers['Cache-Control'] == css_bundles.IMMUTABLE_CACHE_CONTROL
+    response.close()
+    response = app.test_client().get('/static/styles/style.css')
+    assert response.headers.get('Cache-Control') != css_bundles.IMMUTABLE_CACHE_CONTROL
+    response.close()
+
+
+@pytest.mark.parametrize('options', [{'debug': True}, {'use_bundles': False}])
+def test_unbundled_in_debug_or_when_disabled(static_dir, options):
+    build_css_bundles(str(static_dir))
+    assert _style_url(_app(static_dir, **options)) == 'http://localhost/static/styles/style.css'
+
+
+def test_unbundled_until_bundles_are_built(static_dir, monkeypatch):
+    monkeypatch.setattr(css_bundles, 'MANIFEST_CHECK_INTERVAL', 0)
+    app = _app(static_dir)
+    assert _style_url(app) == 'http://localhost/static/styles/style.css'
+    bundles = build_css_bundles(str(static_dir))
+    assert _style_url(app) == f"http://localhost/static/{bundles['styles/style.css']}"
@@ -0,0 +1,52 @@
+import pytest
+
+from Funhelpers.option_tokenizer import (
+    parse_possible_answers,
+    split_top_level_commas,
+    split_top_level_commas_with_quotes,
+)
+from tools.bench_option_tokenizer import PAIRS, fuzz_fields
+
+# Shapes found in the 'possible_answers' column, plus the edge cases the
+# original per-character parser defined
+FIELDS = [
+    "",
+    ",",
+    "a",
+    "a,b,c",
+    " a , b ,c ",
+    "a,b,",
+    "a,,b",
+    "Não sei, 1, 2, 3",
+    "Não sei, '\\frac{1,2}', 'b', c",
+    "'a,b', c",
+    "'a', 'b'",
+    "\\frac{1}{2}, \\sqrt{4,5}",
+    "{a,{b,c}},d",
+    "{a,b",
+    "a},b",
+    "'unterminated, quote",
+    "x'y,z",
+    "'{', '}'",
+    "$\\{1,2,3\\}$, $\\emptyset$",
+    "''",
+    "' a ', b",
+]
+
+
+@pytest.mark.parametrize("field", FIELDS)
+@pytest.mark.parametrize("legacy,fast", PAIRS, ids=lambda f: f.__name__)
+def test_matches_legacy_parser(legacy, fast, field):
+    assert fast(field) == legacy(field)
+
+
+@pytest.mark.parametrize("legacy,fast", PAIRS, ids=lambda f: f.__name__)
+def test_matches_legacy_parser_on_fuzzed_fields(legacy, fast):
+    mismatches = [field for field in fuzz_fields(5000) if fast(field) != legacy(field)]
+    assert mismatches == []
+
+
+def test_commas_inside_braces_and_quotes_do_not_split():
+    assert parse_possible_answers("Não sei, '\\frac{1,2}', 'b', c") == ["Não sei", "\\frac{1,2}", "b", "c"]
+    assert split_top_level_commas("\\frac{1,2}, 3") == ["\\frac{1,2}", "3"]
+    assert split_top_level_commas_with_quotes("'a,b', c") == ["'a,b'", "c"]
@@ -0,0 +1,26 @@
+import DBreadQuiz
+from Funhelpers.maintenance import MaintenanceScheduler
+
+
+def _fake_rows(qids, db_path=None):
+    return [{'rowid': qid} for qid in qids if qid < 100], [qid for qid in qids if qid >= 100]
+
+
+def test_cache_counters_are_logged(monkeypatch, capsys):
+    monkeypatch.setattr(DBreadQuiz, 'getQuestionsFromQids', _fake_rows)
+    monkeypatch.setattr(DBreadQuiz, 'check_bank_file', lambda db_path: False)
+    cache = DBreadQuiz.QuestionCache(name='test_questions', maxsize=2)
+    cache.get_many([1, 2, 3, 100])
+    cache.get_many([3])
+
+    stats = DBreadQuiz.log_question_cache_stats()['test_questions']
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['size']) == (1, 4, 1, 2)
+    assert 'Question cache test_questions' in capsys.readouterr().out
+
+
+def test_stats_job_runs_without_the_process_lock(tmp_path, monkeypatch):
+    scheduler = MaintenanceScheduler(lock_dir=str(tmp_path))
+    scheduler.add_job('stats', lambda: 1, interval=60, process_lock=False)
+    monkeypatch.setattr(scheduler, '_acquire_process_lock', lambda name: False)
+    assert scheduler.run_job('stats')
+    assert scheduler.stats()['stats']['last_result'] == 1
@@ -0,0 +1,162 @@
+import csv
+import os
+
+import pytest
+
+from Funhelpers.quiz_results_store import SegmentLogResultStore, SQLiteResultStore, migrate_csv_results
+
+CUTOFF = '2025-11-03 19:00:00'
+
+
+@pytest.fixture(params=['sqlite', 'segments'])
+def open_store(request, tmp_path):
+    """Opens the store under test; call it again to simulate a restart."""
+    if request.param == 'sqlite':
+        return lambda: SQLiteResultStore(str(tmp_path / 'quiz_results.db'))
+    return lambda: SegmentLogResultStore(str(tmp_path / 'segments'))
+
+
+def test_add_get_and_expiry_filter(open_store):
+    store = open_store()
+    store.add('a', '2025-11-03 20:00:00', '~AQ')
+    store.add_many([('b', '2025-11-03 20:30:00', '{"1": ["2"]}'), ('old', '2025-11-03 18:59:59', '~AA')])
+    assert store.get('a', CUTOFF) == ('a', '2025-11-03 20:00:00', '~AQ')
+    assert tuple(store.get('b', CUTOFF)) == ('b', '2025-11-03 20:30:00', '{"1": ["2"]}')
+    assert store.get('old', CUTOFF) is None
+    assert store.get('missing', CUTOFF) is None
+    assert [tuple(row) for row in store.list_live(CUTOFF)] == [
+        ('a', '2025-11-03 20:00:00'), ('b', '2025-11-03 20:30:00'),
+    ]
+
+
+def test_results_survive_a_restart(open_store):
+    store = open_store()
+    store.add_many([('a', '2025-11-03 20:00:00', '~AQ'), ('b', '2025-11-03 21:00:00', '~AA')])
+    store.add('a', '2025-11-03 20:10:00', '~Ag')
+    store = open_store()
+    assert tuple(store.get('a', CUTOFF)) == ('a', '2025-11-03 20:10:00', '~Ag')
+    assert tuple(store.get('b', CUTOFF)) == ('b', '2025-11-03 21:00:00', '~AA')
+
+
+def test_deleted_result_stays_deleted_after_a_restart(open_store):
+    store = open_store()
+    store.add_many([('a', '2025-11-03 20:00:00', '~AQ'), ('b', '2025-11-03 20:00:01', '~AA')])
+    assert store.delete('a') is True
+    assert store.delete('a') is False
+    assert store.get('a', CUTOFF) is None
+
+    store = open_store()
+    assert store.get('a', CUTOFF) is None
+    assert store.delete('a') is False
+    assert [row[0] for row in store.list_live(CUTOFF)] == ['b']
+
+
+def test_delete_expired(open_store):
+    store = open_store()
+    store.add_many([
+        ('old', '2025-11-03 17:30:00', '~AQ'),
+        ('edge', '2025-11-03 18:59:59', '~AQ'),
+        ('live', '2025-11-03 19:30:00', '~AQ'),
+    ])
+    assert store.delete_expired('2025-11-03 19:00:00') == 2
+    assert store.get('live', '') is not None
+    assert store.get('old', '') is None
+    assert open_store().get('edge', '') is None
+
+
+def _segment_files(tmp_path):
+    return sorted(os.listdir(tmp_path / 'segments'))
+
+
+def test_segments_are_hourly_files(tmp_path):
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    store.add_many([('a', '2025-11-03 20:00:00', '~AQ'), ('b', '2025-11-03 21:59:59', '~AQ')])
+    assert _segment_files(tmp_path) == ['2025-11-03_20.log', '2025-11-03_21.log']
+
+
+def test_tombstone_expires_with_its_result(tmp_path):
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    store.add('a', '2025-11-03 20:00:00', '~AQ')
+    store.add('b', '2025-11-03 21:00:00', '~AQ')
+    store.delete('a')
+    assert (tmp_path / 'segments' / '2025-11-03_21.log').read_text().count('\n') == 1
+    store.delete_expired('2025-11-03 21:00:00')
+    assert _segment_files(tmp_path) == ['2025-11-03_21.log']
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    store.add_many([('a', '2025-11-03 20:00:00', '~AQ'), ('b', '2025-11-03 20:00:01', '~AA')])
+    path = tmp_path / 'segments' / '2025-11-03_20.log'
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    assert store.get('a', CUTOFF) == ('a', '2025-11-03 20:00:00', '~AQ')
+    assert store.get('b', CUTOFF) is None
+
+    # The next append to the torn segment is readable, now and after a restart
+    store.add('c', '2025-11-03 20:30:00', '~Ag')
+    assert store.get('c', CUTOFF) == ('c', '2025-11-03 20:30:00', '~Ag')
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    assert store.get('a', CUTOFF) == ('a', '2025-11-03 20:00:00', '~AQ')
+    assert store.get('c', CUTOFF) == ('c', '2025-11-03 20:30:00', '~Ag')
+
+
+def test_expiry_drops_the_segment_being_written(tmp_path):
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    store.add_many([('a', '2025-11-03 17:00:00', '~AQ'), ('b', '2025-11-03 17:59:59', '~AA')])
+    assert store._writer[0] == '2025-11-03_17'
+
+    assert store.delete_expired(CUTOFF) == 2
+    assert store._writer is None
+    assert _segment_files(tmp_path) == []
+    assert store.get('a', '') is None
+    assert store.list_live('') == []
+
+    # Appends after the drop go to a fresh file, not to the unlinked one
+    store.add('c', '2025-11-03 17:30:00', '~Ag')
+    store.add('d', '2025-11-03 20:00:00', '~Ag')
+    assert _segment_files(tmp_path) == ['2025-11-03_17.log', '2025-11-03_20.log']
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    assert [row[0] for row in store.list_live('')] == ['c', 'd']
+
+
+def test_get_after_concurrent_expiry_returns_none(tmp_path):
+    store = SegmentLogResultStore(str(tmp_path / 'segments'))
+    store.add('a', '2025-11-03 20:00:00', '~AQ')
+    os.remove(tmp_path / 'segments' / '2025-11-03_20.log')
+    assert store.get('a', CUTOFF) is None
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['quiz_uuid', 'timestamp', 'answers'])
+        writer.writerows(rows)
+
+
+def test_migrate_csv_results(tmp_path, open_store):
+    csv_path = tmp_path / 'quiz_results.csv'
+    _write_csv(csv_path, [
+        ('a', '2025-11-03 20:00:00', '{"1": ["2"]}'),
+        ('bad', '2025-11-03 20:00:01', '{"1": ['),
+        ('', '2025-11-03 20:00:02', '{}'),
+        ('no-timestamp', '', '{}'),
+        ('empty', '2025-11-03 20:00:03', ''),
+    ])
+    store = open_store()
+    assert migrate_csv_results(str(csv_path), store) == 2
+    assert tuple(store.get('a', CUTOFF)) == ('a', '2025-11-03 20:00:00', '{"1": ["2"]}')
+    assert tuple(store.get('empty', CUTOFF)) == ('empty', '2025-11-03 20:00:03', '{}')
+    assert store.get('bad', CUTOFF) is None
+    assert not csv_path.exists()
+    assert (tmp_path / 'quiz_results.csv.migrated').exists()
+
+    # Runs only once
+    assert migrate_csv_results(str(csv_path), store) == 0
+
+
+def test_migrate_without_csv(tmp_path):
+    store = SQLiteResultStore(str(tmp_path / 'quiz_results.db'))
+    assert migrate_csv_results(str(tmp_path / 'quiz_results.csv'), store) == 0
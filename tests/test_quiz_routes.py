@@ -0,0 +1,116 @@
+import json
+
+import pytest
+from flask import Flask
+
+from blueprints import quiz
+
+QUESTION_IDS = [11, 12, 13]
+
+
+class FakeQuestion:
+    def __init__(self, n_options):
+        self.options = tuple(f'opção {i}' for i in range(n_options))
+        self.scoring = (0.0,) + (1.0,) * (n_options - 1)
+
+
+BANK = {11: FakeQuestion(3), 12: FakeQuestion(4), 13: FakeQuestion(2)}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def get_compiled_questions(qids):
+        return [BANK[qid] for qid in qids if qid in BANK], [qid for qid in qids if qid not in BANK]
+
+    monkeypatch.setattr(quiz, 'get_compiled_questions', get_compiled_questions)
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.register_blueprint(quiz.quiz_bp)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['question_ids'] = QUESTION_IDS
+        sess['user_answers'] = {'0': ['1']}
+    return client
+
+
+def _stored_answers(client):
+    with client.session_transaction() as sess:
+        return sess['user_answers']
+
+
+def _step(client, answers):
+    return client.post('/quiz/step', json={'answers': answers, 'current_question': 0, 'action': 'save'})
+
+
+def _submit(client, answers):
+    return client.post('/results', json={'answers': answers})
+
+
+def test_step_stores_valid_answers(client):
+    response = _step(client, {'1': ['3', 1, '3'], '2': []})
+    assert response.status_code == 200
+    assert _stored_answers(client) == {'0': ['1'], '1': ['3', '1'], '2': []}
+
+
+def test_results_stores_valid_answers(client):
+    response = _submit(client, {'0': ['2'], '2': ['1']})
+    assert response.status_code == 303
+    assert response.headers['Location'].startswith('/results')
+    assert _stored_answers(client) == {'0': ['2'], '2': ['1']}
+
+
+def test_results_accepts_the_form_field(client):
+    response = client.post('/results', data={'answers': json.dumps({'1': ['2']})})
+    assert response.status_code == 303
+    assert _stored_answers(client)['1'] == ['2']
+
+
+MALFORMED = [
+    {'0': '1'},
+    {'0': ['x']},
+    {'0': ['-1']},
+    {'0': [-1]},
+    {'0': [1.5]},
+    {'0': [True]},
+    {'0': [None]},
+    {'0': [['1']]},
+    {'0': [' 1']},
+    {'0': ['١']},
+    {'x': ['1']},
+    {'3': ['1']},
+    {'-1': ['1']},
+]
+OUT_OF_RANGE = [
+    {'0': ['3']},
+    {'2': ['0', '2']},
+    {'1': [3000000]},
+    {'1': ['3000000']},
+    {'1': ['9' * 5000]},
+]
+
+
+@pytest.mark.parametrize('answers', MALFORMED + OUT_OF_RANGE)
+def test_step_rejects_invalid_answers(client, answers):
+    response = _step(client, {'1': ['1'], **answers})
+    assert response.status_code == 400
+    assert _stored_answers(client) == {'0': ['1']}
+
+
+@pytest.mark.parametrize('answers', MALFORMED + OUT_OF_RANGE)
+def test_results_rejects_invalid_answers(client, answers):
+    response = _submit(client, {'1': ['1'], **answers})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/quiz/0')
+    assert _stored_answers(client) == {'0': ['1']}
+
+
+@pytest.mark.parametrize('body', [{'answers': ['1']}, {'answers': 'x'}, ['1']])
+def test_step_rejects_malformed_bodies(client, body):
+    assert client.post('/quiz/step', json=body).status_code == 400
+
+
+def test_answers_to_missing_questions_are_rejected(client, monkeypatch):
+    monkeypatch.delitem(BANK, 12)
+    assert _step(client, {'1': ['1']}).status_code == 400
+    assert _submit(client, {'1': ['1']}).status_code == 302
+    assert _stored_answers(client) == {'0': ['1']}
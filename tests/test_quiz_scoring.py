@@ -0,0 +1,134 @@
+import random
+
+import pytest
+
+from Funhelpers.quiz_scoring import (
+    ScoringTable,
+    max_points_for,
+    score_question,
+    score_quiz,
+    score_quizzes,
+    to_scoring,
+)
+
+np = pytest.importorskip("numpy")
+
+
+def test_to_scoring():
+    assert to_scoring("0, 1, -0.5") == (0.0, 1.0, -0.5)
+    assert to_scoring(["1", "x", None, 2]) == (1.0, 0.0, 0.0, 2.0)
+    assert to_scoring("") == ()
+
+
+def test_max_points_counts_positive_scores_only():
+    assert max_points_for((0, 1, -0.5, 0.5)) == 1.5
+
+
+@pytest.mark.parametrize("answer,expected", [
+    ([], (0, 'skipped')),
+    (['0'], (0, 'skipped')),
+    (['1'], (1.0, 'correct')),
+    (['2'], (-0.5, 'wrong')),
+    (['0', '2'], (-0.5, 'wrong')),
+    (['1', '3'], (1.5, 'correct')),
+    (['9', 'x'], (0, 'wrong')),
+    (['1', '1'], (1.0, 'correct')),
+    (['2', '1', '2'], (0.5, 'correct')),
+])
+def test_score_question(answer, expected):
+    assert score_question((0, 1, -0.5, 0.5), answer) == expected
+
+
+def test_score_quiz_totals():
+    scorings = [(0, 1, -0.5), (0, 0, 2), (0, 1, 1)]
+    result = score_quiz(scorings, {'0': ['1'], '1': ['1'], '2': ['0']})
+    assert result['total_points'] == 1
+    assert result['max_possible_points'] == 5
+    assert result['percentage'] == pytest.approx(20)
+    assert (result['n_correct'], result['n_wrong'], result['n_skip']) == (1, 1, 1)
+    assert result['outcomes'] == [(1, 'correct'), (0, 'wrong'), (0, 'skipped')]
+
+
+def _random_bank(rng, n_questions=50):
+    return {
+        1000 + qid: tuple(rng.choice((0, 0, 1, -0.5, 0.5, 2)) for _ in range(rng.randint(2, 6)))
+        for qid in range(n_questions)
+    }
+
+
+def _random_answer(rng, n_options):
+    kind = rng.random()
+    if kind < 0.15:
+        return []
+    if kind < 0.3:
+        return ['0']
+    picks = [str(i) for i in rng.sample(range(n_options + 1), rng.randint(1, min(3, n_options)))]
+    return picks + picks[:1] if kind > 0.9 else picks
+
+
+def test_batch_matches_scalar_scoring():
+    rng = random.Random(42)
+    bank = _random_bank(rng)
+    table = ScoringTable(bank)
+    qids = list(bank)
+    quizzes = []
+    for _ in range(200):
+        chosen = rng.sample(qids, rng.randint(1, 20))
+        quizzes.append({str(qid): _random_answer(rng, len(bank[qid])) for qid in chosen})
+
+    batch = score_quizzes(quizzes, table)
+    for i, quiz in enumerate(quizzes):
+        scorings = [bank[int(qid)] for qid in quiz]
+        scalar = score_quiz(scorings, {str(j): answer for j, answer in enumerate(quiz.values())})
+        for key in ('total_points', 'max_possible_points', 'percentage'):
+            assert batch[key][i] == pytest.approx(scalar[key]), key
+        for key in ('n_correct', 'n_wrong', 'n_skip', 'total_questions'):
+            assert batch[key][i] == scalar[key], key
+
+
+def test_batch_and_scalar_count_duplicate_options_once():
+    table = ScoringTable({1: (0, 1, -0.5), 2: (0, 2)})
+    quiz = {'1': ['1', '1', '2', '2'], '2': ['1', '01', 1]}
+    batch = score_quizzes([quiz], table)
+    scalar = score_quiz([(0, 1, -0.5), (0, 2)], {'0': quiz['1'], '1': quiz['2']})
+    assert scalar['total_points'] == batch['total_points'][0] == 2.5
+
+
+def test_batch_skips_unknown_questions():
+    table = ScoringTable({1: (0, 1)})
+    result = score_quizzes([{'1': ['1'], '2': ['1']}], table)
+    assert result['total_questions'][0] == 1
+    assert result['total_points'][0] == 1
+
+
+class FakeQuestion:
+    def __init__(self, db_id, scoring):
+        self.db_id = db_id
+        self.scoring = scoring
+
+
+def test_rescore_user_histories(monkeypatch):
+    from Funhelpers import quiz_helpers
+    from Funhelpers.answer_codec import encode_answers_text
+
+    bank = {10: FakeQuestion(10, (0, 1, -0.5)), 11: FakeQuestion(11, (0, 0, 2))}
+
+    def get_compiled_questions(qids):
+        return [bank[qid] for qid in qids if qid in bank], [qid for qid in qids if qid not in bank]
+
+    monkeypatch.setattr(quiz_helpers, 'get_compiled_questions', get_compiled_questions)
+    histories = {
+        'a@b.pt': [
+            {'q_uuid': 'q1', 'score_perc': 33.3, 'answers': encode_answers_text({'10': ['1'], '11': ['1']})},
+            {'q_uuid': 'q2', 'score_perc': 0.0, 'answers': {'11': ['0']}},
+        ],
+        'c@d.pt': [{'q_uuid': 'q3', 'score_perc': 50.0, 'answers': '{"10": ["2"], "12": ["1"]}'}],
+        'e@f.pt': 'ERROR: no such user',
+    }
+
+    rows = quiz_helpers.rescore_user_histories(histories, histories.get)
+    assert [(row['email'], row['q_uuid']) for row in rows] == [('a@b.pt', 'q1'), ('a@b.pt', 'q2'), ('c@d.pt', 'q3')]
+    assert [row['stored_percentage'] for row in rows] == [33.3, 0.0, 50.0]
+    assert [row['percentage'] for row in rows] == [33.3, 0.0, -50.0]
+    assert [row['total_questions'] for row in rows] == [2, 1, 1]
+    assert (rows[0]['n_correct'], rows[0]['n_wrong'], rows[1]['n_skip']) == (1, 1, 1)
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+from flask import Flask
+
+from blueprints import register
+from Funhelpers.registration_token import generate_token
+
+
+NOW = time.time()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', SECURITY_PASSWORD_SALT='salt')
+    with app.app_context():
+        yield app
+
+
+def _lookup(monkeypatch, found):
+    monkeypatch.setattr(register, 'getRegistrationTokenByEmailOrIP', lambda email, ip: found)
+
+
+def test_live_token_blocks_a_new_request(app, monkeypatch):
+    _lookup(monkeypatch, {'token': generate_token('a@b.pt'), 'email': 'a@b.pt'})
+    assert register._has_pending_registration('a@b.pt', '1.2.3.4')
+
+
+def test_expired_token_does_not_block(app, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(time, 'time', lambda: NOW - 2 * 3600)
+        token = generate_token('a@b.pt')
+    _lookup(monkeypatch, [{'token': token, 'email': 'a@b.pt'}])
+    assert not register._has_pending_registration('a@b.pt', '1.2.3.4')
+
+
+@pytest.mark.parametrize('found', [None, [], ()])
+def test_no_token(app, monkeypatch, found):
+    _lookup(monkeypatch, found)
+    assert not register._has_pending_registration('a@b.pt', '1.2.3.4')
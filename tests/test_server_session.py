@@ -0,0 +1,174 @@
+from datetime import timedelta
+
+import pytest
+from flask import Flask, session
+
+from Funhelpers import server_session
+from Funhelpers.server_session import MemorySessionStore, regenerate_session, init_session_backend
+
+TTL = 3600
+
+
+class CountingStore(MemorySessionStore):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def set(self, sid, data, expires_at):
+        self.writes += 1
+        super().set(sid, data, expires_at)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(server_session.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def app(clock):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.config.update(SESSION_BACKEND='memory', PERMANENT_SESSION_LIFETIME=timedelta(seconds=TTL))
+    init_session_backend(app)
+    app.session_interface.store = CountingStore()
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return ''
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '')
+
+    @app.route('/login')
+    def login():
+        regenerate_session()
+        session['user'] = 'ana@example.com'
+        return ''
+
+    return app
+
+
+@pytest.fixture
+def store(app):
+    return app.session_interface.store
+
+
+def _sid(client):
+    cookie = client.get_cookie('session')
+    return cookie.value.rsplit('.', 1)[0] if cookie else None
+
+
+def test_session_data_stays_on_the_server(app, store):
+    client = app.test_client()
+    client.get('/set/segredo')
+    assert 'segredo' not in client.get_cookie('session').value
+    assert store.get(_sid(client)) is not None
+    assert client.get('/get').text == 'segredo'
+
+
+def _flip_signature(value):
+    sid, signature = value.rsplit('.', 1)
+    return f"{sid}.{'A' if signature[0] != 'A' else 'B'}{signature[1:]}"
+
+
+@pytest.mark.parametrize('forge', [
+    lambda value: value.rsplit('.', 1)[0],
+    lambda value: _flip_signature(value),
+    lambda value: 'x' + value,
+])
+def test_unsigned_or_tampered_cookie_is_rejected(app, store, forge):
+    client = app.test_client()
+    client.get('/set/segredo')
+    client.set_cookie('session', forge(client.get_cookie('session').value))
+    assert client.get('/get').text == ''
+
+
+def test_cookie_signed_with_another_key_is_rejected(app):
+    client = app.test_client()
+    client.get('/set/segredo')
+    app.secret_key = 'other'
+    assert client.get('/get').text == ''
+
+
+def test_unchanged_session_is_not_written(app, store):
+    client = app.test_client()
+    client.get('/set/segredo')
+    assert store.writes == 1
+    client.get('/get')
+    client.get('/set/segredo')
+    assert store.writes == 1
+    response = client.get('/get')
+    assert 'Set-Cookie' not in response.headers
+    client.get('/set/outro')
+    assert store.writes == 2
+
+
+def test_requests_without_session_write_nothing(app, store):
+    client = app.test_client()
+    response = client.get('/get')
+    assert 'Set-Cookie' not in response.headers
+    assert store.writes == 0
+
+
+def test_expiry_slides_once_half_the_ttl_is_left(app, store, clock):
+    client = app.test_client()
+    client.get('/set/segredo')
+    sid = _sid(client)
+    assert store.get(sid)[1] == clock[0] + TTL
+
+    clock[0] += TTL / 2 - 1
+    client.get('/get')
+    assert store.writes == 1
+
+    clock[0] += 2
+    client.get('/get')
+    assert store.writes == 2
+    assert store.get(sid)[1] == clock[0] + TTL
+    assert _sid(client) == sid
+
+
+def test_expired_session_is_dropped(app, store, clock):
+    client = app.test_client()
+    client.get('/set/segredo')
+    clock[0] += TTL + 1
+    assert client.get('/get').text == ''
+
+
+def test_regenerate_session_drops_the_old_id(app, store):
+    client = app.test_client()
+    client.get('/set/segredo')
+    old_sid = _sid(client)
+
+    client.get('/login')
+    new_sid = _sid(client)
+    assert new_sid != old_sid
+    assert store.get(old_sid) is None
+    assert store.get(new_sid) is not None
+    assert client.get('/get').text == 'segredo'
+
+
+def test_planted_id_is_not_authenticated(app, store):
+    attacker = app.test_client()
+    attacker.get('/set/planted')
+    planted = attacker.get_cookie('session').value
+
+    victim = app.test_client()
+    victim.set_cookie('session', planted)
+    victim.get('/login')
+    assert victim.get_cookie('session').value != planted
+    assert attacker.get('/get').text == ''
+
+
+def test_sqlite_store_round_trip(tmp_path, clock):
+    store = server_session.SQLiteSessionStore(str(tmp_path / 'sessions.db'))
+    store.set('a', '{}', clock[0] + 10)
+    store.set('b', '{}', clock[0] - 1)
+    assert store.get('a') == ('{}', clock[0] + 10)
+    assert store.get('b') is None
+    assert store.cleanup_expired() == 1
+    store.delete('a')
+    assert store.get('a') is None
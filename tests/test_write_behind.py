@@ -0,0 +1,211 @@
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from Funhelpers import quiz_storage
+from Funhelpers.answer_codec import encode_answers_text
+from Funhelpers.quiz_results_store import TIMESTAMP_FORMAT
+from Funhelpers.write_behind import WriteBehindQueue
+
+ANSWERS = {'1': ['2'], '5': []}
+
+
+class FlakyHandler:
+    """Fails the first `failures` calls, then writes everything."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+        self.written = []
+
+    def __call__(self, payloads):
+        self.calls.append(list(payloads))
+        if len(self.calls) <= self.failures:
+            raise OSError('database is locked')
+        self.written.extend(payloads)
+
+
+def _queue(handler, spool=None, retries=2):
+    return WriteBehindQueue({'row': handler}, retries=retries, retry_delay=0, spool=spool)
+
+
+def _stats(writer, *names):
+    stats = writer.stats()
+    return {name: stats[name] for name in names}
+
+
+def test_failing_batch_is_retried_until_it_is_written():
+    handler = FlakyHandler(failures=2)
+    writer = _queue(handler)
+    writer.submit('row', 'a')
+    writer.submit('row', 'b')
+    writer.close()
+    assert handler.written == ['a', 'b']
+    assert len(handler.calls) == 3
+    assert _stats(writer, 'records', 'retried', 'failed', 'spooled', 'lost', 'queued') == {
+        'records': 2, 'retried': 2, 'failed': 0, 'spooled': 0, 'lost': 0, 'queued': 0,
+    }
+
+
+def test_only_the_payloads_that_failed_are_retried():
+    calls = []
+
+    def handler(payloads):
+        calls.append(list(payloads))
+        return [p for p in payloads if p == 'b' and len(calls) == 1]
+
+    writer = _queue(handler)
+    for payload in 'abc':
+        writer.submit('row', payload)
+    writer.close()
+    assert calls == [['a', 'b', 'c'], ['b']]
+    assert _stats(writer, 'retried', 'failed') == {'retried': 1, 'failed': 0}
+
+
+def test_batch_failing_every_retry_is_spooled():
+    handler = FlakyHandler(failures=10)
+    spooled = []
+    writer = _queue(handler, spool=lambda kind, payloads: spooled.append((kind, payloads)))
+    writer.submit('row', 'a', key='a')
+    writer.submit('row', 'b')
+    writer.close()
+    assert len(handler.calls) == 3
+    assert spooled == [('row', ['a', 'b'])]
+    assert writer.get_pending('a') is None
+    assert _stats(writer, 'records', 'retried', 'failed', 'spooled', 'lost') == {
+        'records': 2, 'retried': 2, 'failed': 2, 'spooled': 2, 'lost': 0,
+    }
+
+
+@pytest.mark.parametrize('spool', [None, lambda kind, payloads: 1 / 0])
+def test_batch_is_lost_without_a_working_spool(spool):
+    writer = _queue(FlakyHandler(failures=10), spool=spool, retries=0)
+    writer.submit('row', 'a')
+    writer.close()
+    assert _stats(writer, 'retried', 'failed', 'spooled', 'lost') == {
+        'retried': 0, 'failed': 1, 'spooled': 0, 'lost': 1,
+    }
+
+
+def test_pending_payload_is_readable_until_written():
+    release = threading.Event()
+    written = []
+
+    def handler(payloads):
+        release.wait(5)
+        written.extend(payloads)
+
+    writer = _queue(handler)
+    writer.submit('row', 'a', key='k')
+    assert writer.get_pending('k') == 'a'
+    release.set()
+    writer.flush()
+    assert writer.get_pending('k') is None
+    assert written == ['a']
+    writer.close()
+
+
+def test_unknown_kind_is_rejected():
+    with pytest.raises(ValueError):
+        _queue(FlakyHandler(failures=0)).submit('other', 'a')
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """quiz_storage with its results directory, spool and store in tmp_path."""
+    monkeypatch.setattr(quiz_storage, 'QUIZ_RESULTS_DIR', str(tmp_path))
+    monkeypatch.setattr(quiz_storage, 'LEGACY_CSV_PATH', str(tmp_path / 'quiz_results.csv'))
+    monkeypatch.setattr(quiz_storage, 'SPOOL_PATH', str(tmp_path / 'spool.jsonl'))
+    monkeypatch.setattr(quiz_storage, '_store', None)
+    monkeypatch.setattr(quiz_storage, '_writer', None)
+    yield quiz_storage
+    if quiz_storage._writer is not None:
+        quiz_storage._writer.close()
+
+
+class BrokenStore:
+    def add_many(self, rows):
+        raise OSError('disk full')
+
+    def get(self, quiz_uuid, newer_than):
+        return None
+
+
+def _row(quiz_uuid, answers=ANSWERS, age=timedelta(0)):
+    return quiz_uuid, (datetime.now() - age).strftime(TIMESTAMP_FORMAT), encode_answers_text(answers)
+
+
+def _answers(storage, quiz_uuid):
+    result = storage.get_quiz_result(quiz_uuid)
+    return result and result['answers_by_question_number']
+
+
+def test_failed_save_is_spooled_and_replayed_on_restart(storage, monkeypatch):
+    app = Flask(__name__)
+    app.config.update(QUIZ_WRITE_BEHIND=True, QUIZ_WRITE_BEHIND_RETRIES=1)
+    monkeypatch.setattr(storage, '_store', BrokenStore())
+    with app.app_context():
+        quiz_uuid = storage.save_quiz_result({'0': ['2'], '1': []}, [(1,), (5,)])
+        storage._flush_writes()
+        assert storage.get_result_writer().stats()['spooled'] == 1
+
+    with open(storage.SPOOL_PATH, encoding='utf-8') as f:
+        assert [json.loads(line)['payload'][0] for line in f] == [quiz_uuid]
+    # Still readable while it waits in the spool
+    assert _answers(storage, quiz_uuid) == ANSWERS
+
+    # Restart: a fresh store, and the maintenance job replays the spool
+    storage._writer.close()
+    monkeypatch.setattr(storage, '_writer', None)
+    monkeypatch.setattr(storage, '_store', None)
+    assert storage.replay_spooled_writes() == 1
+    assert not os.path.exists(storage.SPOOL_PATH)
+    assert storage.get_results_store().get(quiz_uuid, '') is not None
+    assert _answers(storage, quiz_uuid) == ANSWERS
+    assert storage.replay_spooled_writes() == 0
+
+
+def test_replay_puts_failing_saves_back_in_the_spool(storage, monkeypatch):
+    storage._spool_writes('anonymous', [_row('a')])
+    monkeypatch.setattr(storage, '_store', BrokenStore())
+    assert storage.replay_spooled_writes() == 0
+    assert _answers(storage, 'a') == ANSWERS
+    assert not os.path.exists(storage.SPOOL_PATH + '.replaying')
+
+
+def test_replay_writes_spooled_histories(storage, monkeypatch):
+    saved = []
+    monkeypatch.setattr(sys.modules['DBhelpers'], 'save_quiz_history', lambda **kwargs: saved.append(kwargs),
+                        raising=False)
+    kwargs = {'email': 'ana@example.com', 'results': {'percentage': 50}, 'quiz_config': {}}
+    storage._spool_writes('history', [(None, kwargs)])
+    assert storage.replay_spooled_writes() == 1
+    assert saved == [kwargs]
+
+
+def test_lookup_prefers_pending_then_store_then_spool(storage):
+    release = threading.Event()
+
+    def write_later(rows):
+        release.wait(5)
+
+    storage._writer = WriteBehindQueue({'anonymous': write_later}, retry_delay=0)
+    storage.get_results_store().add_many([_row('pending', {'1': ['1']}), _row('stored', {'1': ['1']})])
+    storage._spool_writes('anonymous', [_row('stored', {'1': ['3']}), _row('spooled', {'1': ['3']})])
+    storage._writer.submit('anonymous', _row('pending', {'1': ['2']}), key='pending')
+
+    assert _answers(storage, 'pending') == {'1': ['2']}
+    assert _answers(storage, 'stored') == {'1': ['1']}
+    assert _answers(storage, 'spooled') == {'1': ['3']}
+    assert storage.get_quiz_result('missing') is None
+    release.set()
+
+
+def test_expired_result_is_not_returned(storage):
+    storage.get_results_store().add_many([_row('old', age=timedelta(hours=2))])
+    assert storage.get_quiz_result('old') is None
@@ -0,0 +1,11 @@
+"""
+Benchmarks and checks run by hand from the project root, e.g.
+`python -m tools.bench_option_tokenizer`. Not imported by the app.
+
+Like server.py, puts the DBhelpers checkout ('../mysql') on the import path,
+since importing `Funhelpers` pulls in the app's helpers.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'mysql')))
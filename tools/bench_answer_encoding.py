@@ -0,0 +1,121 @@
+"""
+Size and decode-time benchmark for `Funhelpers.answer_codec`.
+
+Compares the legacy JSON text with the binary format (`encode_answers`) and
+its text form (`encode_answers_text`) over stored anonymous results
+(quiz_results/quiz_results.db and the legacy CSV, when present), topped up with
+synthetic histories drawn from the quiz bank so the numbers are meaningful on
+a fresh checkout. Every history is round-tripped and checked.
+
+Usage:
+    python -m tools.bench_answer_encoding [--synthetic N] [--repeat N]
+
+Run it from the project root (next to quiz.db and quiz_results/).
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import timeit
+
+from Funhelpers.answer_codec import decode_answers, encode_answers, encode_answers_text
+
+RESULTS_DIR = 'quiz_results'
+QUIZ_SIZES = (20, 40, 60, 80, 100)
+
+
+def load_stored_histories():
+    """Answers of every stored anonymous result (any stored format), decoded."""
+    histories = []
+    db_path = os.path.join(RESULTS_DIR, 'quiz_results.db')
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        for (answers,) in conn.execute("SELECT answers FROM quiz_results"):
+            histories.append(decode_answers(answers))
+        conn.close()
+    for name in ('quiz_results.csv', 'quiz_results.csv.migrated'):
+        path = os.path.join(RESULTS_DIR, name)
+        if os.path.exists(path):
+            with open(path, newline='', encoding='utf-8') as f:
+                histories.extend(decode_answers(row.get('answers')) for row in csv.DictReader(f))
+    return [h for h in histories if h]
+
+
+def load_bank_qids():
+    if not os.path.exists('quiz.db'):
+        return []
+    conn = sqlite3.connect('quiz.db')
+    try:
+        return [rowid for (rowid,) in conn.execute("SELECT rowid FROM responses")]
+    except sqlite3.Error:
+        return []
+    finally:
+        conn.close()
+
+
+def synthetic_histories(n, qids, seed=1234):
+    """Quizzes like the ones the app stores: mostly single answers, some skips and multi-selects."""
+    rng = random.Random(seed)
+    qids = qids or list(range(1, 5000))
+    histories = []
+    for _ in range(n):
+        picked = rng.sample(qids, min(rng.choice(QUIZ_SIZES), len(qids)))
+        answers = {}
+        for qid in picked:
+            roll = rng.random()
+            if roll < 0.2:
+                answers[str(qid)] = ['0']
+            elif roll < 0.9:
+                answers[str(qid)] = [str(rng.randint(1, 5))]
+            else:
+                answers[str(qid)] = sorted({str(rng.randint(1, 6)) for _ in range(3)}, key=int)
+        histories.append(answers)
+    return histories
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--synthetic", type=int, default=2000, help="synthetic histories to add")
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per format")
+    args = parser.parse_args()
+
+    stored = load_stored_histories()
+    histories = stored + synthetic_histories(args.synthetic, load_bank_qids())
+    print(f"Histories: {len(stored)} stored + {len(histories) - len(stored)} synthetic")
+    if not histories:
+        print("Nothing to measure.")
+        return
+
+    as_json = [json.dumps(h) for h in histories]
+    as_binary = [encode_answers(h) for h in histories]
+    as_text = [encode_answers_text(h) for h in histories]
+
+    for history, data, text in zip(histories, as_binary, as_text):
+        expected = decode_answers(history)
+        if decode_answers(data) != expected or decode_answers(text) != expected:
+            print(f"ROUND-TRIP MISMATCH: {history!r}", file=sys.stderr)
+            sys.exit(1)
+    print("Round-trip check passed")
+
+    n_questions = sum(len(h) for h in histories)
+    formats = (
+        ('legacy JSON', as_json, lambda v: len(v.encode('utf-8'))),
+        ('binary', as_binary, len),
+        ('binary as text', as_text, len),
+    )
+    baseline = None
+    for name, values, size_of in formats:
+        total = sum(size_of(v) for v in values)
+        seconds = min(timeit.repeat(lambda: [decode_answers(v) for v in values], number=1, repeat=args.repeat))
+        baseline = baseline or (total, seconds)
+        print(
+            f"{name:<15} {total / len(values):8.1f} B/quiz  {total / n_questions:5.2f} B/question  "
+            f"({total / baseline[0]:5.1%} of JSON)   decode {seconds / len(values) * 1e6:7.2f} us/quiz"
+        )
+
+
+if __name__ == '__main__':
+    main()
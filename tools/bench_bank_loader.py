@@ -0,0 +1,103 @@
+"""
+Wall-time and peak-RSS benchmark of the `DBloadQuiz` CSV parsers.
+
+Loads the whole quiz bank (every table, from scratch) into a scratch database
+once per parser (QUIZ_BANK_PARSER=csv and =pandas), each run in a fresh
+interpreter so import time and memory are measured the way a process start
+sees them. Both databases are then compared row by row.
+
+Usage:
+    python -m tools.bench_bank_loader [--repeat N]
+
+Run it from the project root, next to the 'quiz-time' folder (the same
+working directory the `DBloadQuiz` loaders use).
+"""
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+
+PARSERS = ('csv', 'pandas')
+
+
+def child(db_path):
+    """Runs in the measured interpreter: imports the loader and loads every table."""
+    import resource
+    import time
+
+    t0 = time.perf_counter()
+    import DBloadQuiz
+    imported = time.perf_counter() - t0
+    for table, pattern in DBloadQuiz._bank_sources().items():
+        DBloadQuiz.loadQcsvFiles(pattern, db_path, table, scratch=True)
+    total = time.perf_counter() - t0
+    # ru_maxrss is in KiB on Linux; pool workers (pandas) count as children
+    print(json.dumps({
+        'import': imported,
+        'total': total,
+        'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'children_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }))
+
+
+def run(parser, db_path):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    env = dict(os.environ, QUIZ_BANK_PARSER=parser)
+    out = subprocess.run(
+        [sys.executable, '-m', 'tools.bench_bank_loader', '--child', db_path],
+        env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def table_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = [t for (t,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                  if t != 'bank_manifest']
+        return {t: sorted(map(repr, conn.execute(f'SELECT * FROM "{t}"'))) for t in tables}
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3, help="runs per parser (best is reported)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name in PARSERS:
+            db_path = os.path.join(tmp, f'{name}.db')
+            try:
+                runs = [run(name, db_path) for _ in range(args.repeat)]
+            except subprocess.CalledProcessError as e:
+                print(f"{name:<7} failed: {e.stderr.strip().splitlines()[-1:]}")
+                continue
+            results[name] = table_rows(db_path)
+            best = min(runs, key=lambda r: r['total'])
+            print(
+                f"{name:<7} total {best['total'] * 1000:8.1f} ms  (import {best['import'] * 1000:6.1f} ms)  "
+                f"peak RSS {best['rss_kb'] / 1024:7.1f} MiB  (pool workers {best['children_rss_kb'] / 1024:6.1f} MiB)"
+            )
+
+    if len(results) == len(PARSERS):
+        csv_rows, pandas_rows = results['csv'], results['pandas']
+        same_tables = csv_rows.keys() == pandas_rows.keys()
+        counts_match = same_tables and all(len(csv_rows[t]) == len(pandas_rows[t]) for t in csv_rows)
+        print(f"Row counts {'match' if counts_match else 'DIFFER'}; "
+              f"{sum(csv_rows[t] == pandas_rows[t] for t in csv_rows if t in pandas_rows)}"
+              f"/{len(csv_rows)} tables identical")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""
+Differential check and micro-benchmark for `Funhelpers.option_tokenizer`.
+
+Runs the shared tokenizer and the original per-character implementation (kept
+below as the reference) over every field of every quiz-time CSV, fails if any
+output differs, and then times both on the 'possible_answers' column.
+
+Usage:
+    python -m tools.bench_option_tokenizer [--repeat N] [--fuzz N]
+
+Run it from the project root, next to the 'quiz-time' folder (the same
+working directory the `DBloadQuiz` loaders use).
+"""
+import argparse
+import csv
+import random
+import sys
+import timeit
+from glob import glob
+from pathlib import Path
+
+from Funhelpers.option_tokenizer import (
+    parse_possible_answers,
+    split_top_level_commas,
+    split_top_level_commas_with_quotes,
+)
+
+
+def legacy_split_top_level_commas_with_quotes(s: str):
+    """The original per-character splitter from blueprints/quiz.py."""
+    parts = []
+    buf = []
+    depth = 0          # { } nesting
+    in_quote = False   # single quotes '
+    i = 0
+    while i < len(s):
+        ch = s[i]
+        if ch == "'" and not in_quote:
+            in_quote = True
+            buf.append(ch)
+        elif ch == "'" and in_quote:
+            in_quote = False
+            buf.append(ch)
+        elif ch == '{' and not in_quote:
+            depth += 1
+            buf.append(ch)
+        elif ch == '}' and not in_quote:
+            depth = max(0, depth - 1)
+            buf.append(ch)
+        elif ch == ',' and not in_quote and depth == 0:
+            parts.append(''.join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    if buf:
+        parts.append(''.join(buf).strip())
+    return parts
+
+
+def legacy_split_top_level_commas(s: str):
+    """The original brace-only splitter from blueprints/quiz.py."""
+    parts = []
+    buf = []
+    depth = 0  # tracks nesting of { }
+    for ch in s:
+        if ch == '{':
+            depth += 1
+            buf.append(ch)
+        elif ch == '}':
+            depth = max(0, depth - 1)
+            buf.append(ch)
+        elif ch == ',' and depth == 0:
+            parts.append(''.join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+    if buf:
+        parts.append(''.join(buf).strip())
+    return parts
+
+
+def legacy_parse_possible_answers(field: str):
+    """The original option parser from blueprints/quiz.py and quiz_helpers.py."""
+    items = legacy_split_top_level_commas_with_quotes(field)
+    cleaned = []
+    for x in items:
+        x = x.strip()
+        if len(x) >= 2 and x[0] == "'" and x[-1] == "'":
+            x = x[1:-1]
+        cleaned.append(x.strip())
+    return cleaned
+
+
+PAIRS = (
+    (legacy_split_top_level_commas_with_quotes, split_top_level_commas_with_quotes),
+    (legacy_split_top_level_commas, split_top_level_commas),
+    (legacy_parse_possible_answers, parse_possible_answers),
+)
+
+
+def load_bank_fields():
+    """
+    Reads every quiz-time answer CSV.
+
+    Returns:
+        tuple[list[str], list[str]]: Every non-empty cell of every file, and
+        the 'possible_answers' cells only.
+    """
+    base = Path().resolve()
+    pattern = str(base / "quiz-time" / "anos" / "ano*" / "*" / "*" / "an*.csv")
+    all_fields = []
+    answer_fields = []
+    for path in sorted(glob(pattern)):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                for column, value in row.items():
+                    if not value:
+                        continue
+                    all_fields.append(value)
+                    if column == 'possible_answers':
+                        answer_fields.append(value)
+    return all_fields, answer_fields
+
+
+def fuzz_fields(n, seed=1234):
+    """Random strings built from the characters the tokenizer cares about."""
+    rng = random.Random(seed)
+    alphabet = "ab ,,{}{}''\\x1"
+    return [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 24))) for _ in range(n)]
+
+
+def check(fields):
+    """Return the (function name, field) pairs where the outputs differ."""
+    mismatches = []
+    for field in fields:
+        for legacy, fast in PAIRS:
+            if legacy(field) != fast(field):
+                mismatches.append((fast.__name__, field))
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="timing rounds per implementation")
+    parser.add_argument("--fuzz", type=int, default=20000, help="extra random fields to cross-check")
+    args = parser.parse_args()
+
+    all_fields, answer_fields = load_bank_fields()
+    print(f"Bank: {len(all_fields)} fields, {len(answer_fields)} possible_answers fields")
+
+    mismatches = check(all_fields + fuzz_fields(args.fuzz))
+    if mismatches:
+        for name, field in mismatches[:20]:
+            print(f"MISMATCH {name}: {field!r}")
+        print(f"{len(mismatches)} mismatches", file=sys.stderr)
+        sys.exit(1)
+    print(f"Differential check passed ({len(all_fields)} bank fields, {args.fuzz} fuzzed fields)")
+
+    fields = answer_fields or all_fields
+    if not fields:
+        print("No quiz-time CSVs found; nothing to time.")
+        return
+
+    for legacy, fast in PAIRS:
+        t_legacy = min(timeit.repeat(lambda: [legacy(f) for f in fields], number=1, repeat=args.repeat))
+        t_fast = min(timeit.repeat(lambda: [fast(f) for f in fields], number=1, repeat=args.repeat))
+        print(
+            f"{fast.__name__:<36} legacy {t_legacy * 1000:8.2f} ms   "
+            f"new {t_fast * 1000:8.2f} ms   speedup x{t_legacy / t_fast:.1f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+EXPLAIN QUERY PLAN check for the question-bank lookups.
+
+Runs `EXPLAIN QUERY PLAN` for every lookup the app makes against the quiz
+bank (by rowid, by uuid, by year/tema/aula) and fails if any of them plans a
+full table scan, so a missing or unusable index is caught before it reaches
+production. quiz.db is checked, and quiz.bank as well when it exists.
+
+Usage:
+    python -m tools.check_query_plans [--db quiz.db]
+
+Run it from the project root after loading the bank (e.g. `flask reload-quiz-bank`).
+Exits with status 1 if any plan contains a full scan.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from DBreadQuiz import (
+    COMPILED_QUESTION_SELECT,
+    QUESTION_SELECT,
+    QUESTIONS_VIEW,
+    QUIZ_DB_PATH,
+    VIEW_QUESTION_SELECT,
+    compiled_bank_path,
+)
+
+
+def lookups(select, table):
+    """(name, sql, params) of every lookup against one question table."""
+    return [
+        ("by rowid", f"{select} WHERE r.rowid IN (?, ?, ?)", (1, 2, 3)),
+        ("by uuid", f"SELECT rowid FROM {table} WHERE uuid = ?", ("x",)),
+        ("by year", f"SELECT rowid FROM {table} WHERE ano = ?", (5,)),
+        ("by year/tema/aula", f"SELECT rowid FROM {table} WHERE ano = ? AND num_tema = ? AND num_aula = ?", (5, 1, 1)),
+    ]
+
+
+def full_scans(conn, sql, params):
+    """Plan lines that read a whole table (scanning a covering index is fine for these)."""
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+    return plan, [line for line in plan if line.startswith("SCAN") and "COVERING INDEX" not in line]
+
+
+def check(path, checks):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    failed = False
+    try:
+        for name, sql, params in checks:
+            try:
+                plan, scans = full_scans(conn, sql, params)
+            except sqlite3.OperationalError as e:
+                print(f"SKIP {path} {name}: {e}")
+                continue
+            status = "FAIL" if scans else "ok  "
+            print(f"{status} {path} {name}: {' | '.join(plan)}")
+            failed = failed or bool(scans)
+    finally:
+        conn.close()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default=QUIZ_DB_PATH, help="quiz database to check")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"{args.db} not found; load the bank first", file=sys.stderr)
+        sys.exit(1)
+
+    failed = check(args.db, lookups(VIEW_QUESTION_SELECT, QUESTIONS_VIEW) + [
+        # Fallback for banks loaded before questions_view: every join must use an index
+        ("joined by rowid", f"{QUESTION_SELECT} WHERE r.rowid IN (?, ?, ?)", (1, 2, 3)),
+    ])
+    compiled = compiled_bank_path(args.db)
+    if os.path.exists(compiled):
+        failed = check(compiled, lookups(COMPILED_QUESTION_SELECT, "questions")) or failed
+
+    if failed:
+        print("Full table scans found; add or fix the indexes in DBloadQuiz", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()